@@ -1,7 +1,12 @@
 from django.contrib import admin
 from api2.models import Transaction, Budget
+from api2.utils.bulk_transactions import bulk_delete_transactions
 
 
 @admin.register(Transaction, Budget)
 class BudgetAdmin(admin.ModelAdmin):
-    pass
+    def delete_queryset(self, request, queryset):
+        if queryset.model is Transaction:
+            bulk_delete_transactions(queryset)
+        else:
+            super().delete_queryset(request, queryset)
@@ -0,0 +1,38 @@
+from budget.utils.migrations import CustomMigration
+
+
+class SetMonthlyIncomeMonth(CustomMigration):
+    """
+    Marks the monthly income added before Transaction.monthly_income_month
+    existed, recognized by its description, so it is not added again. Only the
+    first one of a budget in a month is marked, a budget has one at most
+    """
+
+    def forward(self):
+        Transaction = self.get_model("api2", "Transaction")
+
+        marked = set()
+        ids_by_month = {}
+        for pk, budget_id, date in (
+            Transaction.objects.using(self.db)
+            .filter(
+                description="Monthly Income",
+                income=True,
+                prediction=False,
+                budget__isnull=False,
+            )
+            .order_by("id")
+            .values_list("id", "budget_id", "date")
+        ):
+            month = date.replace(day=1)
+            if (budget_id, month) not in marked:
+                marked.add((budget_id, month))
+                ids_by_month.setdefault(month, []).append(pk)
+
+        for month, ids in ids_by_month.items():
+            Transaction.objects.using(self.db).filter(pk__in=ids).update(
+                monthly_income_month=month
+            )
+
+    def reverse(self):
+        pass
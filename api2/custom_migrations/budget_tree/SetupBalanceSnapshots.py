@@ -0,0 +1,53 @@
+from collections import defaultdict
+
+from django.db.models import Count, Q, Sum
+
+from budget.utils.migrations import CustomMigration
+
+
+class SetupBalanceSnapshots(CustomMigration):
+    def forward(self):
+        Transaction = self.get_model("api2", "Transaction")
+        DailyBalanceSnapshot = self.get_model("api2", "DailyBalanceSnapshot")
+
+        days = (
+            Transaction.objects.using(self.db)
+            .filter(budget__isnull=False)
+            .order_by()
+            .values("budget", "budget__user", "prediction", "date")
+            .annotate(
+                income_total=Sum("amount", filter=Q(income=True)),
+                outcome_total=Sum("amount", filter=Q(income=False, transfer=False)),
+                transfer_total=Sum("amount", filter=Q(transfer=True)),
+                delta_total=Sum("amount"),
+                count_total=Count("id"),
+            )
+            .order_by("budget", "prediction", "date")
+        )
+
+        closing_balances = defaultdict(int)
+        snapshots = []
+        for day in days:
+            key = (day["budget"], day["prediction"])
+            closing_balances[key] += day["delta_total"]
+            snapshots.append(
+                DailyBalanceSnapshot(
+                    user_id=day["budget__user"],
+                    budget_id=day["budget"],
+                    date=day["date"],
+                    prediction=day["prediction"],
+                    income=day["income_total"] or 0,
+                    outcome=day["outcome_total"] or 0,
+                    transfer=day["transfer_total"] or 0,
+                    delta=day["delta_total"],
+                    count=day["count_total"],
+                    closing_balance=closing_balances[key],
+                )
+            )
+
+        DailyBalanceSnapshot.objects.using(self.db).bulk_create(
+            snapshots, batch_size=500
+        )
+
+    def reverse(self):
+        pass
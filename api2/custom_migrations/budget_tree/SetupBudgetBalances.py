@@ -0,0 +1,41 @@
+from collections import defaultdict
+
+from django.db.models import Sum
+
+from budget.utils.migrations import CustomMigration
+
+
+class SetupBudgetBalances(CustomMigration):
+    def forward(self):
+        Budget = self.get_model("api2", "Budget")
+        Transaction = self.get_model("api2", "Transaction")
+
+        budgets = {budget.id: budget for budget in Budget.objects.using(self.db).all()}
+        own_balances = (
+            Transaction.objects.using(self.db)
+            .filter(prediction=False, budget__isnull=False)
+            .order_by()
+            .values("budget")
+            .annotate(total=Sum("amount"))
+        )
+
+        subtree_balances = defaultdict(int)
+        for row in own_balances:
+            budgets[row["budget"]].own_balance = row["total"]
+
+            visited = set()
+            budget = budgets.get(row["budget"])
+            while budget is not None and budget.id not in visited:
+                subtree_balances[budget.id] += row["total"]
+                visited.add(budget.id)
+                budget = budgets.get(budget.parent_id)
+
+        for budget in budgets.values():
+            budget.subtree_balance = subtree_balances[budget.id]
+
+        Budget.objects.using(self.db).bulk_update(
+            budgets.values(), ["own_balance", "subtree_balance"], batch_size=500
+        )
+
+    def reverse(self):
+        pass
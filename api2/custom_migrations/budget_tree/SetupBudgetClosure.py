@@ -0,0 +1,28 @@
+from budget.utils.migrations import CustomMigration
+
+
+class SetupBudgetClosure(CustomMigration):
+    def forward(self):
+        Budget = self.get_model("api2", "Budget")
+        BudgetClosure = self.get_model("api2", "BudgetClosure")
+
+        parents = dict(Budget.objects.using(self.db).values_list("id", "parent_id"))
+        links = []
+        for budget_id in parents:
+            visited = set()
+            ancestor_id = budget_id
+            while ancestor_id is not None and ancestor_id not in visited:
+                links.append(
+                    BudgetClosure(
+                        ancestor_id=ancestor_id,
+                        descendant_id=budget_id,
+                        depth=len(visited),
+                    )
+                )
+                visited.add(ancestor_id)
+                ancestor_id = parents.get(ancestor_id)
+
+        BudgetClosure.objects.using(self.db).bulk_create(links, batch_size=500)
+
+    def reverse(self):
+        pass
@@ -0,0 +1,47 @@
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+from budget.utils.migrations import CustomMigration
+
+
+class SetupMonthlyRollups(CustomMigration):
+    def forward(self):
+        Transaction = self.get_model("api2", "Transaction")
+        MonthlyRollup = self.get_model("api2", "MonthlyRollup")
+
+        transactions = (
+            Transaction.objects.using(self.db).filter(budget__isnull=False).order_by()
+        )
+        keys = ("budget", "budget__user", "income", "transfer", "prediction")
+        totals = {"total": Sum("amount"), "total_count": Count("id")}
+
+        untagged = transactions.values(*keys, rollup_month=TruncMonth("date")).annotate(
+            **totals
+        )
+        tagged = (
+            transactions.filter(tags__isnull=False)
+            .values(*keys, "tags", rollup_month=TruncMonth("date"))
+            .annotate(**totals)
+        )
+
+        MonthlyRollup.objects.using(self.db).bulk_create(
+            [
+                MonthlyRollup(
+                    user_id=row["budget__user"],
+                    budget_id=row["budget"],
+                    tag_id=row.get("tags"),
+                    month=row["rollup_month"],
+                    income=row["income"],
+                    transfer=row["transfer"],
+                    prediction=row["prediction"],
+                    amount=row["total"],
+                    count=row["total_count"],
+                )
+                for rows in (untagged, tagged)
+                for row in rows
+            ],
+            batch_size=500,
+        )
+
+    def reverse(self):
+        pass
@@ -0,0 +1,52 @@
+import arrow
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from api2.models import Budget
+from api2.utils.balance_snapshots import rebuild_balance_snapshots
+
+
+class Command(BaseCommand):
+    help = """
+    Recalculates the daily balance snapshots of every budget from its transactions
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=str, help="Only rebuild this username")
+        parser.add_argument(
+            "--since",
+            type=str,
+            help="Only rebuild snapshots from this date onwards (YYYY-MM-DD)",
+        )
+
+    @staticmethod
+    def get_user(username):
+        if not username:
+            return None
+
+        try:
+            return User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f'User "{username}" does not exist')
+
+    @staticmethod
+    def get_since(since):
+        if not since:
+            return None
+
+        try:
+            return arrow.get(since, "YYYY-MM-DD").date()
+        except arrow.parser.ParserError:
+            raise CommandError(f'Invalid date "{since}", expected YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options.get("user"))
+        budgets = (
+            Budget.objects.all() if user is None else Budget.objects.filter(user=user)
+        )
+
+        created = rebuild_balance_snapshots(
+            budgets, since=self.get_since(options.get("since"))
+        )
+
+        self.stdout.write(self.style.SUCCESS(f"DONE: {created} snapshots"))
@@ -6,6 +6,7 @@ from django.core.management.base import BaseCommand, CommandError
 from oauth2_provider.models import Application
 
 from api2.models import User, Budget, Transaction, Tag
+from api2.utils.budget_stats import update_budget_stats
 from budget.utils.test import BudgetTestCase
 from cron.jobs.daily.update_tag_stats import UpdateTagStats
 
@@ -148,8 +149,7 @@ class Command(BaseCommand):
 
     @staticmethod
     def _calculate_income_outcome():
-        for budget in Budget.objects.all():
-            budget.calculate_income_outcome(save=True)
+        update_budget_stats(fields=("income_per_month", "outcome_per_month"))
 
     @staticmethod
     def _update_tag_rankings():
@@ -0,0 +1,51 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from api2.utils.budget_balance import (
+    find_stale_budget_balances,
+    rebuild_budget_balances,
+)
+
+
+class Command(BaseCommand):
+    help = """
+    Recalculates the stored balance of every budget from its transactions
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only report budgets with incorrect balances, do not fix them",
+        )
+        parser.add_argument("--user", type=str, help="Only check this username")
+
+    @staticmethod
+    def get_user(username):
+        if not username:
+            return None
+
+        try:
+            return User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f'User "{username}" does not exist')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options.get("user"))
+
+        if options.get("verify"):
+            stale_budgets = find_stale_budget_balances(user)
+        else:
+            stale_budgets = rebuild_budget_balances(user)
+
+        for budget in stale_budgets:
+            self.stdout.write(
+                f'{"STALE" if options.get("verify") else "REBUILT"} budget '
+                f'{budget.id} "{budget.name}": own_balance={budget.own_balance} '
+                f"subtree_balance={budget.subtree_balance}"
+            )
+
+        if options.get("verify") and stale_budgets:
+            raise CommandError(f"{len(stale_budgets)} budget balances are incorrect")
+
+        self.stdout.write(self.style.SUCCESS("DONE"))
@@ -0,0 +1,34 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from api2.models import Budget
+from api2.utils.monthly_rollups import rebuild_monthly_rollups
+
+
+class Command(BaseCommand):
+    help = """
+    Recalculates the monthly rollups of every budget from its transactions
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=str, help="Only rebuild this username")
+
+    @staticmethod
+    def get_user(username):
+        if not username:
+            return None
+
+        try:
+            return User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f'User "{username}" does not exist')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options.get("user"))
+        budgets = (
+            Budget.objects.all() if user is None else Budget.objects.filter(user=user)
+        )
+
+        created = rebuild_monthly_rollups(budgets)
+
+        self.stdout.write(self.style.SUCCESS(f"DONE: {created} rollups"))
@@ -0,0 +1,36 @@
+# Generated by Django 4.0.10 on 2026-10-18 18:58
+
+from django.db import migrations, models
+
+from api2.custom_migrations.budget_tree.SetupBudgetBalances import (
+    SetupBudgetBalances,
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api2", "0027_alter_budget_name"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="budget",
+            name="own_balance",
+            field=models.IntegerField(
+                default=0,
+                editable=False,
+                help_text="Sum of the non prediction transactions in this budget",
+            ),
+        ),
+        migrations.AddField(
+            model_name="budget",
+            name="subtree_balance",
+            field=models.IntegerField(
+                default=0,
+                editable=False,
+                help_text="own_balance of this budget plus the subtree_balance of its children",
+            ),
+        ),
+        SetupBudgetBalances.get_operation(),
+    ]
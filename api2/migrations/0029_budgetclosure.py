@@ -0,0 +1,56 @@
+# Generated by Django 4.0.10 on 2026-10-18 19:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from api2.custom_migrations.budget_tree.SetupBudgetClosure import SetupBudgetClosure
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api2", "0028_budget_own_balance_budget_subtree_balance"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BudgetClosure",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "depth",
+                    models.IntegerField(
+                        help_text="Number of levels between the two budgets"
+                    ),
+                ),
+                (
+                    "ancestor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="descendant_links",
+                        to="api2.budget",
+                    ),
+                ),
+                (
+                    "descendant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ancestor_links",
+                        to="api2.budget",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("ancestor", "descendant")},
+            },
+        ),
+        SetupBudgetClosure.get_operation(),
+    ]
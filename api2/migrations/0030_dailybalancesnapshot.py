@@ -0,0 +1,78 @@
+# Generated by Django 4.0.10 on 2026-10-18 19:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from api2.custom_migrations.budget_tree.SetupBalanceSnapshots import (
+    SetupBalanceSnapshots,
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("api2", "0029_budgetclosure"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyBalanceSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("prediction", models.BooleanField(default=False)),
+                ("income", models.IntegerField(default=0)),
+                (
+                    "outcome",
+                    models.IntegerField(
+                        default=0,
+                        help_text="Sum of transactions that are not income or transfers",
+                    ),
+                ),
+                ("transfer", models.IntegerField(default=0)),
+                (
+                    "delta",
+                    models.IntegerField(default=0, help_text="Sum of all transactions"),
+                ),
+                (
+                    "count",
+                    models.IntegerField(default=0, help_text="Number of transactions"),
+                ),
+                (
+                    "closing_balance",
+                    models.IntegerField(
+                        default=0,
+                        help_text="Sum of all transactions up to and including this day",
+                    ),
+                ),
+                (
+                    "budget",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="api2.budget"
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("budget", "prediction", "date")},
+            },
+        ),
+        SetupBalanceSnapshots.get_operation(),
+    ]
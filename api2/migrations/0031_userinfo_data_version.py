@@ -0,0 +1,31 @@
+# Generated by Django 4.0.10 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api2", "0030_dailybalancesnapshot"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userinfo",
+            name="data_modified",
+            field=models.DateTimeField(
+                editable=False,
+                help_text="When data_version was last incremented",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="userinfo",
+            name="data_version",
+            field=models.IntegerField(
+                default=0,
+                editable=False,
+                help_text="Incremented whenever a transaction, budget or tag of the user changes",
+            ),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 4.0.10 on 2026-10-18 19:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from api2.custom_migrations.budget_tree.SetupMonthlyRollups import SetupMonthlyRollups
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("api2", "0031_userinfo_data_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MonthlyRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("month", models.DateField(help_text="First day of the month")),
+                ("income", models.BooleanField()),
+                ("transfer", models.BooleanField()),
+                ("prediction", models.BooleanField()),
+                (
+                    "amount",
+                    models.IntegerField(default=0, help_text="Sum of the transactions"),
+                ),
+                (
+                    "count",
+                    models.IntegerField(default=0, help_text="Number of transactions"),
+                ),
+                (
+                    "budget",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="api2.budget"
+                    ),
+                ),
+                (
+                    "tag",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="api2.tag",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {
+                    ("budget", "tag", "month", "income", "transfer", "prediction")
+                },
+            },
+        ),
+        SetupMonthlyRollups.get_operation(),
+    ]
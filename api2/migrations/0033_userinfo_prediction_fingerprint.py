@@ -0,0 +1,23 @@
+# Generated by Django 4.0.10 on 2026-10-18 19:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api2", "0032_monthlyrollup"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userinfo",
+            name="prediction_fingerprint",
+            field=models.CharField(
+                editable=False,
+                help_text="calculate_prediction_fingerprint when predictions were last created",
+                max_length=64,
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.0.10 on 2026-10-18 19:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api2", "0033_userinfo_prediction_fingerprint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userinfo",
+            name="predicted_from",
+            field=models.DateField(
+                editable=False,
+                help_text="First day of the predictions when they were last fully created",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="userinfo",
+            name="predicted_until",
+            field=models.DateField(
+                editable=False,
+                help_text="Day after the last day predictions were created for",
+                null=True,
+            ),
+        ),
+    ]
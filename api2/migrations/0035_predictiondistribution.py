@@ -0,0 +1,63 @@
+# Generated by Django 4.0.10 on 2026-10-18 19:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("api2", "0034_userinfo_prediction_window"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PredictionDistribution",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "distribution",
+                    models.JSONField(
+                        help_text="Transactions per day and the probabilities of each budget and tag"
+                    ),
+                ),
+                (
+                    "income_schedule",
+                    models.JSONField(
+                        help_text="Income transactions repeated every number of days from schedule_start"
+                    ),
+                ),
+                (
+                    "seed",
+                    models.IntegerField(help_text="Seed of the sampled transactions"),
+                ),
+                (
+                    "schedule_start",
+                    models.DateField(help_text="Day the distribution was created for"),
+                ),
+                ("start", models.DateField(help_text="First day to predict")),
+                (
+                    "end",
+                    models.DateField(help_text="Day after the last day to predict"),
+                ),
+                ("modified", models.DateTimeField(auto_now=True)),
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+    ]
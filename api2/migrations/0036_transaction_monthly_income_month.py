@@ -0,0 +1,33 @@
+# Generated by Django 4.0.10 on 2026-10-18 21:29
+
+from django.db import migrations, models
+
+from api2.custom_migrations.budget_tree.SetMonthlyIncomeMonth import (
+    SetMonthlyIncomeMonth,
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api2", "0035_predictiondistribution"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="transaction",
+            name="monthly_income_month",
+            field=models.DateField(db_index=True, editable=False, null=True),
+        ),
+        SetMonthlyIncomeMonth.get_operation(),
+        migrations.AddConstraint(
+            model_name="transaction",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(
+                    ("monthly_income_month__isnull", False), ("prediction", False)
+                ),
+                fields=("budget", "monthly_income_month"),
+                name="unique_monthly_income",
+            ),
+        ),
+    ]
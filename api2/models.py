@@ -2,7 +2,7 @@ import hashlib
 import arrow
 from django.contrib.auth.models import User
 from django.db import models
-from django.db.models import Sum
+from django.db.models import Count, Max, Sum
 
 
 class Budget(models.Model):
@@ -19,23 +19,38 @@ class Budget(models.Model):
     parent = models.ForeignKey("self", on_delete=models.SET_NULL, null=True)
     is_node = models.BooleanField(default=False)
 
+    # Ledger, maintained by api2.utils.budget_balance
+    own_balance = models.IntegerField(
+        default=0,
+        editable=False,
+        help_text="Sum of the non prediction transactions in this budget",
+    )
+    subtree_balance = models.IntegerField(
+        default=0,
+        editable=False,
+        help_text="own_balance of this budget plus the subtree_balance of its children",
+    )
+    LEDGER_FIELDS = ("own_balance", "subtree_balance")
+
     class Meta:
         unique_together = ("name", "user")
         ordering = ["-rank", "name"]
 
-    def balance(self) -> int:
-        # the current balance is equal to the sum of all transactions plus the initial balance
-        balance = 0
-        transactions = Transaction.objects.filter(budget=self, prediction=False)
-        children = Budget.objects.filter(parent=self)
-
-        for trans in transactions:
-            balance += trans.amount
-
-        for child in children:
-            balance += child.balance()
+    def save(self, *args, **kwargs):
+        # The ledger is updated atomically in the database whenever a transaction
+        # changes, so never write back a possibly stale in memory copy of it
+        if not self._state.adding and not args and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.LEDGER_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
-        return balance
+    def balance(self) -> int:
+        # the current balance is equal to the sum of all transactions in this budget and its children
+        self.refresh_from_db(fields=self.LEDGER_FIELDS)
+        return self.subtree_balance
 
     def calculate_income_outcome(self, time_period=6, save=False):
         def get_amount_per_month(total):
@@ -68,6 +83,29 @@ class Budget(models.Model):
         return self.name
 
 
+class BudgetClosure(models.Model):
+    """
+    Ancestor/descendant index for the budget tree, maintained by api2.utils.budget_tree
+
+    There is one row for every budget and each of its ancestors, as well as one
+    row pairing every budget with itself at depth 0
+    """
+
+    ancestor = models.ForeignKey(
+        Budget, on_delete=models.CASCADE, related_name="descendant_links"
+    )
+    descendant = models.ForeignKey(
+        Budget, on_delete=models.CASCADE, related_name="ancestor_links"
+    )
+    depth = models.IntegerField(help_text="Number of levels between the two budgets")
+
+    class Meta:
+        unique_together = ("ancestor", "descendant")
+
+    def __str__(self) -> str:
+        return f"<BudgetClosure: {self.ancestor_id} -> {self.descendant_id} ({self.depth})>"
+
+
 class Tag(models.Model):
     name = models.CharField(max_length=30, db_index=True)
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
@@ -111,6 +149,20 @@ class Transaction(models.Model):
         default=False,
         help_text="Signifies this transaction is only an estimate and that it actually does not exist",
     )
+    # First day of the month this is the monthly income of its budget for, so
+    # the monthly income is only added once a month however it is edited
+    monthly_income_month = models.DateField(null=True, editable=False, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["budget", "monthly_income_month"],
+                condition=models.Q(
+                    prediction=False, monthly_income_month__isnull=False
+                ),
+                name="unique_monthly_income",
+            )
+        ]
 
     def pretty_amount(self):
         return str(self.amount)
@@ -119,6 +171,73 @@ class Transaction(models.Model):
         return f"{self.budget.name}_{self.date}_{self.amount}"
 
 
+class DailyBalanceSnapshot(models.Model):
+    """
+    Totals of the transactions in a budget for one day, maintained by
+    api2.utils.balance_snapshots
+
+    Rows only exist for days that have transactions. Predictions are kept
+    in their own rows so they can be included or left out
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True)
+    budget = models.ForeignKey(Budget, on_delete=models.CASCADE)
+    date = models.DateField()
+    prediction = models.BooleanField(default=False)
+
+    income = models.IntegerField(default=0)
+    outcome = models.IntegerField(
+        default=0, help_text="Sum of transactions that are not income or transfers"
+    )
+    transfer = models.IntegerField(default=0)
+    delta = models.IntegerField(default=0, help_text="Sum of all transactions")
+    count = models.IntegerField(default=0, help_text="Number of transactions")
+    closing_balance = models.IntegerField(
+        default=0, help_text="Sum of all transactions up to and including this day"
+    )
+
+    class Meta:
+        unique_together = ("budget", "prediction", "date")
+
+    def __str__(self) -> str:
+        return f"<DailyBalanceSnapshot: {self.budget_id} {self.date} {self.closing_balance}>"
+
+
+class MonthlyRollup(models.Model):
+    """
+    Sum and count of the transactions in a budget for one calendar month,
+    maintained by api2.utils.monthly_rollups
+
+    Rows without a tag include every transaction, rows with a tag only the
+    transactions with that tag. So a transaction with two tags is counted in
+    three rows
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True)
+    budget = models.ForeignKey(Budget, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, null=True)
+    month = models.DateField(help_text="First day of the month")
+    income = models.BooleanField()
+    transfer = models.BooleanField()
+    prediction = models.BooleanField()
+
+    amount = models.IntegerField(default=0, help_text="Sum of the transactions")
+    count = models.IntegerField(default=0, help_text="Number of transactions")
+
+    class Meta:
+        unique_together = (
+            "budget",
+            "tag",
+            "month",
+            "income",
+            "transfer",
+            "prediction",
+        )
+
+    def __str__(self) -> str:
+        return f"<MonthlyRollup: {self.budget_id} {self.tag_id} {self.month} {self.amount}>"
+
+
 class UserInfo(models.Model):
     user = models.OneToOneField(User, on_delete=models.SET_NULL, null=True)
     expected_monthly_net_income = models.IntegerField(default=0)
@@ -136,10 +255,61 @@ class UserInfo(models.Model):
         null=True, help_text="Date to stop predicting transactions for"
     )
 
+    # Maintained by api2.utils.data_version
+    data_version = models.IntegerField(
+        default=0,
+        editable=False,
+        help_text="Incremented whenever a transaction, budget or tag of the user changes",
+    )
+    data_modified = models.DateTimeField(
+        null=True,
+        editable=False,
+        help_text="When data_version was last incremented",
+    )
+    DATA_VERSION_FIELDS = ("data_version", "data_modified")
+
+    # Maintained by cron.jobs.daily.create_predictions
+    prediction_fingerprint = models.CharField(
+        max_length=64,
+        null=True,
+        editable=False,
+        help_text="calculate_prediction_fingerprint when predictions were last created",
+    )
+    predicted_from = models.DateField(
+        null=True,
+        editable=False,
+        help_text="First day of the predictions when they were last fully created",
+    )
+    predicted_until = models.DateField(
+        null=True,
+        editable=False,
+        help_text="Day after the last day predictions were created for",
+    )
+    PREDICTION_WINDOW_FIELDS = (
+        "prediction_fingerprint",
+        "predicted_from",
+        "predicted_until",
+    )
+
+    def save(self, *args, **kwargs):
+        # The data version is incremented in the database by signals and the
+        # prediction window by cron, so never write back a possibly stale in
+        # memory copy of them
+        if not self._state.adding and not args and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.DATA_VERSION_FIELDS
+                and field.name not in self.PREDICTION_WINDOW_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     def calculate_prediction_state_hash(self) -> bytes:
+        # predict_end is left out, moving it only extends or trims the end of
+        # the existing predictions
         prediction_settings_fields = [
             self.analyze_start,
-            self.predict_end,
             self.income_frequency_days,
             self.expected_monthly_net_income,
         ]
@@ -149,3 +319,58 @@ class UserInfo(models.Model):
             hash.update(str(field).encode())
 
         return hash.digest()
+
+    def calculate_prediction_fingerprint(self) -> str:
+        """
+        Changes whenever the predictions of the user have to be created again:
+        the prediction settings, the transactions analyzed from analyze_start
+        until today, or the monthly allocations of the budgets
+        """
+        analyzed = Transaction.objects.filter(
+            budget__user=self.user,
+            prediction=False,
+            date__range=(self.analyze_start, arrow.now().date()),
+        )
+        transactions = analyzed.aggregate(
+            last_modified=Max("modified"), count=Count("id")
+        )
+        # Changing the tags of a transaction does not touch its modified date,
+        # a swapped tag creates a new link with a new id
+        tag_links = Transaction.tags.through.objects.filter(
+            transaction__in=analyzed
+        ).aggregate(count=Count("id"), last_id=Max("id"), tag_ids=Sum("tag_id"))
+        allocations = list(
+            Budget.objects.filter(user=self.user)
+            .order_by("id")
+            .values_list("id", "monthly_allocation")
+        )
+
+        hash = hashlib.sha256(self.calculate_prediction_state_hash())
+        for value in (*transactions.values(), *tag_links.values(), allocations):
+            hash.update(str(value).encode())
+
+        return hash.hexdigest()
+
+
+class PredictionDistribution(models.Model):
+    """
+    The probability distribution of the predictor for a user, from which
+    reports synthesize predicted transactions when predictions are not stored
+    as transactions. See reports.virtual_predictions
+    """
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE)
+    distribution = models.JSONField(
+        help_text="Transactions per day and the probabilities of each budget and tag"
+    )
+    income_schedule = models.JSONField(
+        help_text="Income transactions repeated every number of days from schedule_start"
+    )
+    seed = models.IntegerField(help_text="Seed of the sampled transactions")
+    schedule_start = models.DateField(help_text="Day the distribution was created for")
+    start = models.DateField(help_text="First day to predict")
+    end = models.DateField(help_text="Day after the last day to predict")
+    modified = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"<PredictionDistribution: {self.user_id} {self.start} {self.end}>"
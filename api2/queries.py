@@ -1,22 +1,57 @@
-from api2.models import Budget
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Set
 
+from django.db.models import QuerySet, Sum
 
-def get_all_children(budget: Budget):
+from api2.models import Budget, BudgetClosure
+
+
+def get_all_children(budget: Budget) -> QuerySet[Budget]:
     if not budget.is_node:
-        return []
-
-    budget_table = Budget.objects.model._meta.db_table
-    return Budget.objects.raw(
-        f"""
-        WITH RECURSIVE search_tree(id, parent_id) AS (
-                SELECT id, parent_id
-                FROM {budget_table}
-                WHERE parent_id = {budget.id}
-             UNION ALL
-                 SELECT b.id, b.parent_id
-                 FROM {budget_table} as b, search_tree as t
-                 WHERE b.parent_id = t.id
-        )
-    SELECT * FROM search_tree;
+        return Budget.objects.none()
+
+    return Budget.objects.filter(
+        ancestor_links__ancestor=budget, ancestor_links__depth__gt=0
+    )
+
+
+def get_all_ancestors(budget: Budget) -> QuerySet[Budget]:
+    return Budget.objects.filter(
+        descendant_links__descendant=budget, descendant_links__depth__gt=0
+    ).order_by("descendant_links__depth")
+
+
+def get_subtree_ids(budget_ids: Iterable[int]) -> Dict[int, Set[int]]:
+    """
+    Maps each budget id to the ids of itself and all of its children
+    """
+    subtrees: Dict[int, Set[int]] = defaultdict(set)
+    for ancestor_id, descendant_id in BudgetClosure.objects.filter(
+        ancestor_id__in=budget_ids
+    ).values_list("ancestor_id", "descendant_id"):
+        subtrees[ancestor_id].add(descendant_id)
+
+    return subtrees
+
+
+def get_subtree_parents(budgets: QuerySet[Budget]) -> Dict[int, Optional[int]]:
+    """
+    Maps every budget in the subtrees of the budgets to its parent
+    """
+    return dict(
+        Budget.objects.filter(ancestor_links__ancestor__in=budgets)
+        .distinct()
+        .values_list("id", "parent_id")
+    )
+
+
+def get_recursive_monthly_allocations(budgets: QuerySet[Budget]) -> Dict[int, int]:
+    """
+    Sum of the monthly allocation of all children of each budget
     """
+    return dict(
+        BudgetClosure.objects.filter(ancestor__in=budgets, depth__gt=0)
+        .values("ancestor_id")
+        .annotate(total=Sum("descendant__monthly_allocation"))
+        .values_list("ancestor_id", "total")
     )
@@ -64,17 +64,21 @@ class BudgetSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
     @staticmethod
-    def get_balance(obj):
-        return obj.balance()
+    def get_balance(obj: Budget):
+        return obj.subtree_balance
 
     def ensure_monthly_allocation_is_zero_on_node(self):
         pass
 
-    @staticmethod
-    def get_recursive_monthly_allocation(obj: Budget):
+    def get_recursive_monthly_allocation(self, obj: Budget):
         if not obj.is_node:
             return obj.monthly_allocation
 
+        # Views listing many budgets calculate every allocation in one query
+        allocations = self.context.get("recursive_monthly_allocations")
+        if allocations is not None:
+            return allocations.get(obj.id, 0)
+
         children = get_all_children(obj)
         return sum([child.monthly_allocation for child in children])
 
@@ -125,7 +129,7 @@ class TransactionSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Transaction
-        fields = "__all__"
+        exclude = ["monthly_income_month"]
 
     @staticmethod
     def validate(attrs):
@@ -178,4 +182,9 @@ class TransactionSerializer(serializers.ModelSerializer):
 class UserInfoSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserInfo
-        exclude = ["id", "user"]
+        exclude = [
+            "id",
+            "user",
+            *UserInfo.DATA_VERSION_FIELDS,
+            *UserInfo.PREDICTION_WINDOW_FIELDS,
+        ]
@@ -2,11 +2,25 @@ import logging
 
 import arrow
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import (
+    m2m_changed,
+    post_save,
+    pre_save,
+    pre_delete,
+    post_delete,
+)
 from django.dispatch import receiver
 
 from api2.constants import ROOT_BUDGET_NAME, DefaultTags
-from api2.models import UserInfo, Budget, Tag, Transaction
+from api2.models import UserInfo, Budget, PredictionDistribution, Tag, Transaction
+from api2.utils import (
+    budget_balance,
+    budget_tree,
+    data_version,
+    monthly_rollups,
+    transaction_changes,
+)
+from api2.utils.ledger import TransactionState
 
 logger = logging.getLogger(__name__)
 
@@ -47,3 +61,109 @@ def ensure_default_tags(sender, instance: User, **kwargs):
 @receiver(pre_save, sender=Transaction)
 def update_transaction_modified_time(sender, instance: Transaction, **kwargs):
     instance.modified = arrow.now().datetime
+
+
+@receiver(pre_save, sender=Transaction)
+@receiver(pre_delete, sender=Transaction)
+def remember_previous_transaction_state(sender, instance: Transaction, **kwargs):
+    instance._previous_state = TransactionState.load(instance.pk)  # type: ignore
+
+
+@receiver(pre_delete, sender=Transaction)
+def remember_previous_transaction_tags(sender, instance: Transaction, **kwargs):
+    instance._previous_tag_ids = list(  # type: ignore
+        instance.tags.values_list("id", flat=True)
+    )
+
+
+@receiver(post_save, sender=Transaction)
+def apply_transaction_change_on_save(
+    sender, instance: Transaction, created: bool, **kwargs
+):
+    transaction_changes.apply_transaction_change(
+        instance._previous_state,  # type: ignore
+        TransactionState.from_instance(instance),
+        [] if created else instance.tags.values_list("id", flat=True),
+    )
+
+
+@receiver(post_delete, sender=Transaction)
+def apply_transaction_change_on_delete(sender, instance: Transaction, **kwargs):
+    transaction_changes.apply_transaction_change(
+        instance._previous_state, None, instance._previous_tag_ids  # type: ignore
+    )
+
+
+@receiver(m2m_changed, sender=Transaction.tags.through)
+def update_monthly_rollups_on_tags_changed(
+    sender, instance, action: str, reverse: bool, pk_set, **kwargs
+):
+    if action == "post_add":
+        links = monthly_rollups.get_tag_links(instance, reverse, pk_set)
+        monthly_rollups.apply_tag_links(links, 1)
+    elif action in ("pre_remove", "pre_clear"):
+        # Remember which links existed, they are gone after the change
+        instance._removed_tag_links = monthly_rollups.get_tag_links(
+            instance, reverse, pk_set
+        )
+    elif action in ("post_remove", "post_clear"):
+        monthly_rollups.apply_tag_links(instance._removed_tag_links, -1)
+
+
+@receiver(m2m_changed, sender=Transaction.tags.through)
+def bump_transaction_tags_data_version(sender, instance, action: str, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if isinstance(instance, Tag):
+        data_version.bump_data_version([instance.user_id])
+    else:
+        data_version.bump_data_version(
+            data_version.get_budget_user_ids([instance.budget_id])
+        )
+
+
+@receiver(post_save, sender=Budget)
+@receiver(post_delete, sender=Budget)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=PredictionDistribution)
+@receiver(post_delete, sender=PredictionDistribution)
+def bump_data_version(sender, instance, **kwargs):
+    data_version.bump_data_version([instance.user_id])
+
+
+@receiver(pre_save, sender=Budget)
+def remember_previous_budget_parent(sender, instance: Budget, **kwargs):
+    instance._previous_parent_id = (  # type: ignore
+        None
+        if instance._state.adding
+        else Budget.objects.filter(pk=instance.pk)
+        .values_list("parent_id", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Budget)
+def update_budget_tree(sender, instance: Budget, created: bool, **kwargs):
+    if created:
+        budget_tree.add_budget(instance.pk, instance.parent_id)
+    elif instance._previous_parent_id != instance.parent_id:  # type: ignore
+        budget_tree.move_budget(instance.pk, instance.parent_id)
+
+
+@receiver(post_save, sender=Budget)
+def move_budget_balance(sender, instance: Budget, created: bool, **kwargs):
+    previous_parent_id = instance._previous_parent_id  # type: ignore
+    if created or previous_parent_id == instance.parent_id:
+        return
+
+    budget_balance.move_subtree(instance.pk, previous_parent_id, instance.parent_id)
+
+
+@receiver(pre_delete, sender=Budget)
+def remove_budget_from_tree(sender, instance: Budget, **kwargs):
+    # Transactions and children are detached from the budget when it is deleted,
+    # so its whole subtree leaves the balance of the budgets above it
+    budget_balance.remove_subtree(instance.pk)
+    budget_tree.remove_budget(instance.pk)
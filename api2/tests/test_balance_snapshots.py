@@ -0,0 +1,180 @@
+import arrow
+from django.core.management import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api2.management.commands.backfill_balance_snapshots import (
+    Command as BackfillBalanceSnapshotsCommand,
+)
+from api2.models import Budget, DailyBalanceSnapshot, Transaction
+from api2.utils.balance_snapshots import rebuild_balance_snapshots
+from api2.utils.bulk_transactions import bulk_delete_transactions
+from budget.utils.test import BudgetTestCase
+
+SNAPSHOT_FIELDS = (
+    "user_id",
+    "budget_id",
+    "date",
+    "prediction",
+    "income",
+    "outcome",
+    "transfer",
+    "delta",
+    "count",
+    "closing_balance",
+)
+
+
+class TestBalanceSnapshots(BudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.budget = self.generate_budget()
+        self.other_budget = self.generate_budget()
+        self.day = arrow.get(2022, 1, 10)
+
+    def get_snapshots(self):
+        return list(
+            DailyBalanceSnapshot.objects.order_by(
+                "budget", "prediction", "date"
+            ).values_list(*SNAPSHOT_FIELDS)
+        )
+
+    def assertMatchesRebuild(self):
+        snapshots = self.get_snapshots()
+        rebuild_balance_snapshots(Budget.objects.all())
+        self.assertEqual(snapshots, self.get_snapshots())
+
+    def test_create(self):
+        self.generate_transaction(self.budget, date=self.day, amount=10, income=True)
+        self.generate_transaction(self.budget, date=self.day, amount=-3)
+        self.generate_transaction(self.budget, date=self.day.shift(days=-2), amount=5)
+        self.generate_transaction(
+            self.budget, date=self.day, amount=-1, transfer=True, prediction=True
+        )
+
+        snapshot = DailyBalanceSnapshot.objects.get(
+            budget=self.budget, prediction=False, date=self.day.date()
+        )
+        self.assertEqual(
+            (snapshot.income, snapshot.outcome, snapshot.transfer, snapshot.delta),
+            (10, -3, 0, 7),
+        )
+        self.assertEqual(snapshot.closing_balance, 12)
+        self.assertEqual(snapshot.user, self.user)
+        self.assertMatchesRebuild()
+
+    def test_update(self):
+        later = self.generate_transaction(
+            self.budget, date=self.day.shift(days=5), amount=2
+        )
+        trans = self.generate_transaction(self.budget, date=self.day, amount=10)
+
+        trans.amount = 20
+        trans.date = self.day.shift(days=1).date()
+        trans.save()
+        self.assertMatchesRebuild()
+
+        trans.budget = self.other_budget
+        trans.save()
+        self.assertMatchesRebuild()
+
+        trans.prediction = True
+        trans.save()
+        self.assertMatchesRebuild()
+
+        later.delete()
+        self.assertMatchesRebuild()
+        self.assertFalse(DailyBalanceSnapshot.objects.filter(budget=self.budget))
+
+    def test_same_day_edit_updates_later_days_once(self):
+        self.generate_transaction(self.budget, date=self.day.shift(days=5), amount=2)
+        trans = self.generate_transaction(self.budget, date=self.day, amount=10)
+
+        def snapshot_updates(**changes) -> list:
+            for field, value in changes.items():
+                setattr(trans, field, value)
+            with CaptureQueriesContext(connection) as queries:
+                trans.save()
+            self.assertMatchesRebuild()
+            return [
+                query["sql"]
+                for query in queries.captured_queries
+                if query["sql"].startswith('UPDATE "api2_dailybalancesnapshot"')
+            ]
+
+        updates = snapshot_updates(amount=20)
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(len([sql for sql in updates if "closing_balance" in sql]), 1)
+
+        # The closing balances do not change when only the kind changes
+        updates = snapshot_updates(income=True)
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn("closing_balance", updates[0])
+
+    def test_bulk_delete(self):
+        for day in range(5):
+            for budget in (self.budget, self.other_budget):
+                self.generate_transaction(
+                    budget, date=self.day.shift(days=day), amount=day + 1
+                )
+
+        bulk_delete_transactions(
+            Transaction.objects.filter(
+                budget=self.budget, date=self.day.shift(days=2).date()
+            )
+        )
+
+        self.assertMatchesRebuild()
+        self.assertEqual(
+            list(
+                DailyBalanceSnapshot.objects.filter(budget=self.budget)
+                .order_by("date")
+                .values_list("closing_balance", flat=True)
+            ),
+            [1, 3, 7, 12],
+        )
+
+    def test_rebuild_since(self):
+        for day in range(5):
+            self.generate_transaction(
+                self.budget, date=self.day.shift(days=day), amount=day
+            )
+        snapshots = self.get_snapshots()
+        DailyBalanceSnapshot.objects.update(closing_balance=0)
+
+        created = rebuild_balance_snapshots(
+            Budget.objects.all(), since=self.day.shift(days=2).date()
+        )
+
+        self.assertEqual(created, 3)
+        self.assertEqual(self.get_snapshots()[2:], snapshots[2:])
+        self.assertEqual(self.get_snapshots()[0][-1], 0)
+
+
+class TestBackfillBalanceSnapshots(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.budget = cls.generate_budget()
+        cls.generate_transaction(cls.budget, amount=10, date=arrow.get(2022, 1, 1))
+        cls.generate_transaction(cls.budget, amount=20, date=arrow.get(2022, 1, 2))
+
+    def test_backfill(self):
+        DailyBalanceSnapshot.objects.all().delete()
+
+        BackfillBalanceSnapshotsCommand().handle(user=self.user.username)
+
+        self.assertEqual(
+            list(
+                DailyBalanceSnapshot.objects.order_by("date").values_list(
+                    "closing_balance", flat=True
+                )
+            ),
+            [10, 30],
+        )
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(CommandError):
+            BackfillBalanceSnapshotsCommand().handle(user="does not exist")
+        with self.assertRaises(CommandError):
+            BackfillBalanceSnapshotsCommand().handle(since="yesterday")
@@ -0,0 +1,69 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api2.models import Budget, Transaction, UserInfo
+from api2.utils.budget_stats import update_budget_stats
+from budget.utils.test import BudgetTestCase
+
+
+class TestBudgetStats(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.budgets = [cls.generate_budget() for _ in range(3)]
+        for i, budget in enumerate(cls.budgets):
+            for months_ago in range(8):
+                date = cls.now.shift(months=-months_ago, days=-1)
+                cls.generate_transaction(budget, amount=-100 * (i + 1), date=date)
+                cls.generate_transaction(budget, amount=300, date=date, income=True)
+            cls.generate_transaction(
+                budget, amount=-5000, date=cls.now.shift(days=5), prediction=True
+            )
+
+    def test_same_as_per_budget_calculations(self):
+        update_budget_stats(income_outcome_months=3)
+
+        for budget in Budget.objects.all():
+            expected = Budget.objects.get(pk=budget.pk)
+            expected.calculate_income_outcome(time_period=3)
+            self.assertEqual(budget.income_per_month, expected.income_per_month)
+            self.assertEqual(budget.outcome_per_month, expected.outcome_per_month)
+            self.assertEqual(
+                budget.rank,
+                Transaction.objects.filter(
+                    budget=budget,
+                    prediction=False,
+                    date__gte=self.now.shift(months=-6).date(),
+                ).count(),
+            )
+
+    def test_only_updates_fields(self):
+        update_budget_stats(fields=("rank",))
+
+        budget = Budget.objects.get(pk=self.budgets[0].pk)
+        self.assertEqual(budget.rank, 12)
+        self.assertIsNone(budget.income_per_month)
+
+    def test_only_changed_budgets_are_written(self):
+        self.assertEqual(len(update_budget_stats()), len(Budget.objects.all()))
+        data_version = UserInfo.objects.get(user=self.user).data_version
+
+        self.assertEqual(update_budget_stats(), [])
+        self.assertEqual(
+            UserInfo.objects.get(user=self.user).data_version, data_version
+        )
+
+        self.generate_transaction(self.budgets[0], date=self.now)
+        self.assertEqual(update_budget_stats(), [self.budgets[0]])
+
+    def test_query_count_does_not_depend_on_budgets(self):
+        def count_queries() -> int:
+            Budget.objects.update(rank=-1)
+            with CaptureQueriesContext(connection) as queries:
+                update_budget_stats()
+            return len(queries)
+
+        query_count = count_queries()
+        for _ in range(5):
+            self.generate_transaction(self.generate_budget(), date=self.now)
+        self.assertEqual(count_queries(), query_count)
@@ -0,0 +1,195 @@
+import arrow
+from django.contrib.admin.sites import site
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api2.models import Budget, DailyBalanceSnapshot, MonthlyRollup, Transaction
+from api2.utils.balance_snapshots import rebuild_balance_snapshots
+from api2.utils.budget_balance import find_stale_budget_balances
+from api2.utils.bulk_transactions import (
+    bulk_create_transactions,
+    bulk_delete_transactions,
+)
+from api2.utils.data_version import deferred_bumps, get_data_version_info
+from api2.utils.monthly_rollups import rebuild_monthly_rollups
+from budget.utils.test import BudgetTestCase
+
+
+class TestBulkCreateTransactions(BudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.budget = self.generate_budget(parent=self.budget_root)
+        self.tags = [self.generate_tag(), self.generate_tag()]
+        self.day = arrow.get(2022, 1, 10)
+
+        # Existing data the new transactions are added to
+        self.generate_transaction(self.budget, date=self.day, amount=5)
+        self.generate_transaction(
+            self.budget, date=self.day.shift(months=2), amount=7, tags=self.tags
+        )
+        self.generate_transaction(
+            self.budget, date=self.day.shift(months=2), amount=3, prediction=True
+        )
+
+    def get_rows(self):
+        return [
+            (
+                Transaction(
+                    budget=budget,
+                    amount=amount,
+                    date=self.day.shift(days=day).date(),
+                    prediction=prediction,
+                ),
+                tags,
+            )
+            for day, (budget, amount, prediction, tags) in enumerate(
+                [
+                    (self.budget, -10, False, self.tags),
+                    (self.budget, -20, True, self.tags[:1]),
+                    (self.budget_root, 30, False, []),
+                    (self.budget, -40, True, []),
+                ]
+                * 10
+            )
+        ]
+
+    def assertMatchesRebuild(self, model, rebuild):
+        def get_rows():
+            return sorted(
+                model.objects.values_list(
+                    *(field.attname for field in model._meta.concrete_fields[1:])
+                ),
+                key=lambda row: tuple(str(value) for value in row),
+            )
+
+        rows = get_rows()
+        rebuild(Budget.objects.all())
+        self.assertEqual(rows, get_rows())
+
+    def test_bulk_create_transactions(self):
+        data_version, _ = get_data_version_info(self.user)
+
+        transactions = bulk_create_transactions(self.get_rows(), batch_size=15)
+
+        self.assertLengthEqual(transactions, 40)
+        self.assertEqual(
+            list(Transaction.objects.filter(amount=-10).values_list("id", flat=True)),
+            [trans.id for trans in transactions if trans.amount == -10],
+        )
+        self.assertEqual(
+            Transaction.tags.through.objects.filter(
+                transaction__in=transactions
+            ).count(),
+            30,
+        )
+
+        self.assertEqual(find_stale_budget_balances(self.user), [])
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.own_balance, 5 + 7 - 100)
+        self.assertMatchesRebuild(DailyBalanceSnapshot, rebuild_balance_snapshots)
+        self.assertMatchesRebuild(MonthlyRollup, rebuild_monthly_rollups)
+        self.assertEqual(get_data_version_info(self.user)[0], data_version + 1)
+
+    def test_query_count_does_not_depend_on_transactions(self):
+        with CaptureQueriesContext(connection) as few:
+            bulk_create_transactions(self.get_rows()[:8])
+        with CaptureQueriesContext(connection) as many:
+            bulk_create_transactions(self.get_rows())
+
+        self.assertEqual(len(few), len(many))
+
+    def test_no_transactions(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(bulk_create_transactions([]), [])
+
+    def test_bulk_delete_transactions(self):
+        bulk_create_transactions(self.get_rows())
+        data_version, _ = get_data_version_info(self.user)
+        deleted = Transaction.objects.filter(
+            budget__user=self.user, amount__in=(-10, -20, 7)
+        )
+        deleted_ids = list(deleted.values_list("id", flat=True))
+
+        self.assertEqual(bulk_delete_transactions(deleted), 21)
+
+        self.assertFalse(Transaction.objects.filter(pk__in=deleted_ids).exists())
+        self.assertFalse(
+            Transaction.tags.through.objects.filter(
+                transaction_id__in=deleted_ids
+            ).exists()
+        )
+        self.assertEqual(find_stale_budget_balances(self.user), [])
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.own_balance, 5)
+        self.assertMatchesRebuild(DailyBalanceSnapshot, rebuild_balance_snapshots)
+        self.assertMatchesRebuild(MonthlyRollup, rebuild_monthly_rollups)
+        self.assertEqual(get_data_version_info(self.user)[0], data_version + 1)
+
+    def test_bulk_delete_filtered_by_tags(self):
+        bulk_create_transactions(self.get_rows())
+        tagged = Transaction.objects.filter(tags__in=self.tags)
+        tagged_ids = set(tagged.values_list("id", flat=True))
+
+        # Transactions with both tags are in the queryset twice
+        self.assertEqual(bulk_delete_transactions(tagged), len(tagged_ids))
+
+        self.assertFalse(Transaction.objects.filter(pk__in=tagged_ids).exists())
+        self.assertFalse(Transaction.tags.through.objects.exists())
+        self.assertEqual(find_stale_budget_balances(self.user), [])
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.own_balance, 5)
+        self.assertMatchesRebuild(DailyBalanceSnapshot, rebuild_balance_snapshots)
+        self.assertMatchesRebuild(MonthlyRollup, rebuild_monthly_rollups)
+
+    def test_bulk_delete_query_count_does_not_depend_on_transactions(self):
+        bulk_create_transactions(self.get_rows())
+        predictions = Transaction.objects.filter(prediction=True)
+
+        with CaptureQueriesContext(connection) as few:
+            self.assertEqual(
+                bulk_delete_transactions(
+                    predictions.filter(date__lt=self.day.shift(days=4).date())
+                ),
+                2,
+            )
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(
+                bulk_delete_transactions(predictions.exclude(amount=3)), 18
+            )
+
+        self.assertEqual(len(few), len(many))
+
+    def test_admin_deletes_in_bulk(self):
+        bulk_create_transactions(self.get_rows())
+        transactions = Transaction.objects.filter(amount=-10)
+
+        site._registry[Transaction].delete_queryset(None, transactions)
+
+        self.assertFalse(transactions.exists())
+        self.assertEqual(find_stale_budget_balances(self.user), [])
+        self.assertMatchesRebuild(DailyBalanceSnapshot, rebuild_balance_snapshots)
+
+
+class TestDeferredBumps(BudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.budget = self.generate_budget()
+        self.transactions = [self.generate_transaction(self.budget) for _ in range(3)]
+        self.data_version, _ = get_data_version_info(self.user)
+
+    def test_one_bump_for_rows_deleted_one_at_a_time(self):
+        with deferred_bumps():
+            for transaction in self.transactions:
+                transaction.delete()
+            with deferred_bumps():
+                self.generate_transaction(self.budget)
+            self.assertEqual(get_data_version_info(self.user)[0], self.data_version)
+
+        self.assertEqual(get_data_version_info(self.user)[0], self.data_version + 1)
+
+    def test_no_bump_after_errors(self):
+        with self.assertRaises(ValueError), deferred_bumps():
+            self.transactions[0].delete()
+            raise ValueError()
+
+        self.assertEqual(get_data_version_info(self.user)[0], self.data_version)
@@ -0,0 +1,127 @@
+from unittest.mock import patch
+
+import arrow
+from django.utils.http import http_date
+from rest_framework.authtoken.models import Token
+from rest_framework.reverse import reverse
+
+from api2.models import UserInfo
+from budget.utils.test import BudgetTestCase
+from reports.types import TimeBucketSizeOption
+
+
+class TestConditionalGet(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.budget = cls.generate_budget()
+        cls.generate_transaction(cls.budget)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        super().setUp()
+        # Last-Modified is only sent once the second of the change is over
+        self.set_data_modified(arrow.now().shift(minutes=-1))
+
+    def request(self, url: str, **headers):
+        return self.client.get(url, HTTP_AUTHORIZATION=f"Token {self.token}", **headers)
+
+    def assertNotModifiedUntilChanged(self, url: str):
+        r = self.request(url)
+        self.assertEqual(r.status_code, 200)
+        self.assertIn("ETag", r)
+        self.assertIn("Last-Modified", r)
+
+        r = self.request(url, HTTP_IF_NONE_MATCH=r["ETag"])
+        self.assertEqual(r.status_code, 304)
+        self.assertEqual(r.content, b"")
+
+        etag = r["ETag"]
+        self.generate_transaction(self.budget)
+        r = self.request(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r["ETag"], etag)
+
+    def test_transaction_list(self):
+        self.assertNotModifiedUntilChanged(reverse("api2:transaction-list"))
+
+    def test_budget_list(self):
+        self.assertNotModifiedUntilChanged(reverse("api2:budget-list"))
+
+    def test_budget_detail(self):
+        self.assertNotModifiedUntilChanged(
+            reverse("api2:budget-detail", kwargs={"pk": self.budget.pk})
+        )
+
+    def test_report(self):
+        self.assertNotModifiedUntilChanged(
+            reverse("reports:income-list")
+            + "?date__gte=2022-01-01&date__lte=2022-02-01"
+            + f"&time_bucket_size={TimeBucketSizeOption.ONE.value}"
+        )
+
+    def test_not_modified_skips_queries(self):
+        url = reverse("api2:transaction-list")
+        etag = self.request(url)["ETag"]
+
+        # The token and the data version
+        with self.assertNumQueries(2):
+            r = self.request(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 304)
+
+    def test_other_url(self):
+        etag = self.request(reverse("api2:transaction-list"))["ETag"]
+        r = self.request(reverse("api2:budget-list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+
+    def set_data_modified(self, data_modified: arrow.Arrow):
+        UserInfo.objects.filter(user=self.user).update(
+            data_modified=data_modified.datetime
+        )
+
+    def test_if_modified_since(self):
+        url = reverse("api2:transaction-list")
+        last_modified = self.request(url)["Last-Modified"]
+
+        r = self.request(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(r.status_code, 304)
+
+    def test_last_modified_rounded_up(self):
+        data_modified = arrow.get(2022, 1, 1, 10, 0, 0, 400000)
+        self.set_data_modified(data_modified)
+
+        r = self.request(reverse("api2:transaction-list"))
+
+        self.assertEqual(
+            r["Last-Modified"], http_date(data_modified.shift(seconds=1).timestamp())
+        )
+
+    def test_no_last_modified_until_its_second_is_over(self):
+        data_modified = arrow.get(2022, 1, 1, 10, 0, 0, 400000)
+        self.set_data_modified(data_modified)
+        url = reverse("api2:transaction-list")
+
+        with patch(
+            "api2.views.ConditionalGetMixin.time.time",
+            return_value=data_modified.shift(microseconds=100000).timestamp(),
+        ):
+            r = self.request(url)
+            self.assertNotIn("Last-Modified", r)
+            # A change later in the same second is not hidden by a 304
+            r = self.request(
+                url, HTTP_IF_MODIFIED_SINCE=http_date(data_modified.timestamp() + 1)
+            )
+            self.assertEqual(r.status_code, 200)
+
+    def test_if_modified_since_ignored_with_if_none_match(self):
+        url = reverse("api2:transaction-list")
+        r = self.request(url)
+        etag, last_modified = r["ETag"], r["Last-Modified"]
+
+        UserInfo.objects.filter(user=self.user).update(data_version=0)
+        r = self.request(
+            url, HTTP_IF_NONE_MATCH=etag, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+
+        self.assertEqual(r.status_code, 200)
@@ -56,6 +56,62 @@ class TestBudget(BudgetTestCase):
         self.assertEqual(c.balance(), 2)
         [self.assertEqual(budget.balance(), 1) for budget in leaf_budgets]
 
+    def test_balance_follows_transaction_changes(self):
+        b = self.generate_budget(parent=self.budget_root, is_node=True)
+        d = self.generate_budget(parent=b)
+        e = self.generate_budget(parent=b)
+
+        trans = self.generate_transaction(amount=10, budget=d)
+        self.generate_transaction(amount=100, budget=d, prediction=True)
+        self.assertEqual(d.balance(), 10)
+        self.assertEqual(b.balance(), 10)
+
+        trans.amount = 15
+        trans.save()
+        self.assertEqual(d.balance(), 15)
+        self.assertEqual(self.budget_root.balance(), 15)
+
+        trans.budget = e
+        trans.save()
+        self.assertEqual(d.balance(), 0)
+        self.assertEqual(e.balance(), 15)
+        self.assertEqual(b.balance(), 15)
+
+        trans.prediction = True
+        trans.save()
+        self.assertEqual(e.balance(), 0)
+
+        trans.prediction = False
+        trans.save()
+        trans.delete()
+        self.assertEqual(e.balance(), 0)
+        self.assertEqual(self.budget_root.balance(), 0)
+
+    def test_balance_follows_budget_parent(self):
+        b = self.generate_budget(parent=self.budget_root, is_node=True)
+        c = self.generate_budget(parent=self.budget_root, is_node=True)
+        d = self.generate_budget(parent=b)
+        self.generate_transaction(amount=10, budget=d)
+
+        d.parent = c
+        d.save()
+        self.assertEqual(b.balance(), 0)
+        self.assertEqual(c.balance(), 10)
+        self.assertEqual(self.budget_root.balance(), 10)
+
+        c.delete()
+        self.assertEqual(self.budget_root.balance(), 0)
+        self.assertEqual(d.balance(), 10)
+
+    def test_save_does_not_overwrite_balance(self):
+        stale_budget = Budget.objects.get(pk=self.budget.pk)
+        self.generate_transaction(amount=10, budget=self.budget)
+
+        stale_budget.name = "renamed"
+        stale_budget.save()
+
+        self.assertEqual(self.budget.balance(), 10)
+
     @patch("arrow.now", return_value=now)
     def test_calculate_income_outcome(self, _):
         for x in range(4):
@@ -0,0 +1,154 @@
+import arrow
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api2.management.commands.rebuild_monthly_rollups import (
+    Command as RebuildMonthlyRollupsCommand,
+)
+from api2.models import Budget, MonthlyRollup
+from api2.utils.monthly_rollups import rebuild_monthly_rollups
+from budget.utils.test import BudgetTestCase
+
+ROLLUP_FIELDS = (
+    "user_id",
+    "budget_id",
+    "tag_id",
+    "month",
+    "income",
+    "transfer",
+    "prediction",
+    "amount",
+    "count",
+)
+
+
+class TestMonthlyRollups(BudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.budget = self.generate_budget()
+        self.other_budget = self.generate_budget()
+        self.tags = [self.generate_tag(), self.generate_tag()]
+        self.day = arrow.get(2022, 1, 10)
+
+    def get_rollups(self):
+        return sorted(
+            MonthlyRollup.objects.values_list(*ROLLUP_FIELDS),
+            key=lambda row: tuple(str(value) for value in row),
+        )
+
+    def assertMatchesRebuild(self):
+        rollups = self.get_rollups()
+        rebuild_monthly_rollups(Budget.objects.all())
+        self.assertEqual(rollups, self.get_rollups())
+
+    def test_create(self):
+        self.generate_transaction(self.budget, date=self.day, amount=10)
+        self.generate_transaction(self.budget, date=self.day.shift(days=5), amount=5)
+        self.generate_transaction(
+            self.budget, date=self.day, amount=-3, income=True, tags=self.tags
+        )
+
+        rollup = MonthlyRollup.objects.get(
+            budget=self.budget,
+            tag=None,
+            income=False,
+            month=self.day.date().replace(day=1),
+        )
+        self.assertEqual((rollup.amount, rollup.count), (15, 2))
+        self.assertEqual(
+            MonthlyRollup.objects.filter(tag__in=self.tags).count(), len(self.tags)
+        )
+        self.assertMatchesRebuild()
+
+    def test_update(self):
+        trans = self.generate_transaction(
+            self.budget, date=self.day, amount=10, tags=self.tags[:1]
+        )
+
+        trans.amount = 20
+        trans.date = self.day.shift(months=1).date()
+        trans.save()
+        self.assertMatchesRebuild()
+
+        trans.budget = self.other_budget
+        trans.prediction = True
+        trans.save()
+        self.assertMatchesRebuild()
+
+        trans.delete()
+        self.assertMatchesRebuild()
+        self.assertFalse(MonthlyRollup.objects.exists())
+
+    def test_same_month_edit_writes_net_changes(self):
+        trans = self.generate_transaction(
+            self.budget, date=self.day, amount=10, tags=self.tags
+        )
+
+        trans.amount = 20
+        trans.date = self.day.shift(days=1).date()
+        with CaptureQueriesContext(connection) as queries:
+            trans.save()
+
+        rollup_queries = [
+            query["sql"]
+            for query in queries.captured_queries
+            if '"api2_monthlyrollup"' in query["sql"]
+        ]
+        self.assertEqual(len(rollup_queries), len(self.tags) + 1)
+        self.assertTrue(all(sql.startswith("UPDATE") for sql in rollup_queries))
+        self.assertMatchesRebuild()
+
+    def test_budget_users_loaded_once_per_save(self):
+        trans = self.generate_transaction(
+            self.budget, date=self.day, amount=10, tags=self.tags
+        )
+
+        trans.amount = 20
+        trans.budget = self.other_budget
+        with CaptureQueriesContext(connection) as queries:
+            trans.save()
+
+        user_lookups = [
+            query["sql"]
+            for query in queries.captured_queries
+            if query["sql"].startswith(
+                'SELECT "api2_budget"."id", "api2_budget"."user_id"'
+            )
+        ]
+        self.assertEqual(len(user_lookups), 1)
+        self.assertMatchesRebuild()
+
+    def test_tags_changed(self):
+        trans = self.generate_transaction(self.budget, date=self.day, amount=10)
+
+        trans.tags.add(*self.tags)
+        self.assertMatchesRebuild()
+
+        trans.tags.remove(self.tags[0], self.generate_tag())
+        self.assertMatchesRebuild()
+
+        self.tags[0].transaction_set.add(trans)
+        self.assertMatchesRebuild()
+
+        self.tags[1].transaction_set.remove(trans)
+        self.assertMatchesRebuild()
+
+        trans.tags.clear()
+        self.assertMatchesRebuild()
+        self.assertFalse(MonthlyRollup.objects.filter(tag__isnull=False).exists())
+
+    def test_tag_deleted(self):
+        self.generate_transaction(self.budget, date=self.day, amount=10, tags=self.tags)
+
+        self.tags[0].delete()
+
+        self.assertMatchesRebuild()
+
+    def test_command(self):
+        self.generate_transaction(self.budget, date=self.day, amount=10, tags=self.tags)
+        rollups = self.get_rollups()
+        MonthlyRollup.objects.all().delete()
+
+        RebuildMonthlyRollupsCommand().handle(user=self.user.username)
+
+        self.assertEqual(rollups, self.get_rollups())
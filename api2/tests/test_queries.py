@@ -1,4 +1,10 @@
-from api2.queries import get_all_children
+from api2.models import Budget
+from api2.queries import (
+    get_all_ancestors,
+    get_all_children,
+    get_recursive_monthly_allocations,
+    get_subtree_ids,
+)
 from budget.utils.test import BudgetTestCase
 
 
@@ -12,3 +18,53 @@ class GetAllChildren(BudgetTestCase):
         budget_with_no_children = self.generate_budget()
         all_children = get_all_children(budget_with_no_children)
         self.assertEqual([*all_children], [])
+
+    def test_moved_budget(self):
+        root, nodes, children = self.generate_budget_tree()
+        b = Budget.objects.get(name="b")
+        c = Budget.objects.get(name="c")
+
+        b.parent = c
+        b.save()
+
+        self.assertEqual({*get_all_children(c)}, {b, *children})
+        self.assertEqual({*get_all_children(root)}, {*children, *nodes})
+
+        d = Budget.objects.get(name="d")
+        self.assertEqual([*get_all_ancestors(d)], [b, c, root, self.budget_root])
+
+    def test_deleted_budget(self):
+        root, nodes, children = self.generate_budget_tree()
+        b, c, d, f, g = Budget.objects.filter(
+            name__in=["b", "c", "d", "f", "g"]
+        ).order_by("name")
+
+        b.delete()
+
+        self.assertEqual({*get_all_children(root)}, {c, f, g})
+        self.assertEqual([*get_all_ancestors(d)], [])
+
+
+class GetSubtreeIds(BudgetTestCase):
+    def test(self):
+        root, nodes, children = self.generate_budget_tree()
+        b = Budget.objects.get(name="b")
+        d = Budget.objects.get(name="d")
+        e = Budget.objects.get(name="e")
+
+        subtrees = get_subtree_ids([b.id, d.id])
+
+        self.assertEqual(subtrees, {b.id: {b.id, d.id, e.id}, d.id: {d.id}})
+
+
+class GetRecursiveMonthlyAllocations(BudgetTestCase):
+    def test(self):
+        node = self.generate_budget(is_node=True)
+        child = self.generate_budget(parent=node, monthly_allocation=10)
+        self.generate_budget(parent=node, monthly_allocation=5)
+
+        allocations = get_recursive_monthly_allocations(
+            Budget.objects.filter(pk__in=[node.pk, child.pk])
+        )
+
+        self.assertEqual(allocations, {node.id: 15})
@@ -0,0 +1,43 @@
+from django.core.management import CommandError
+
+from api2.management.commands.rebuild_budget_balances import (
+    Command as RebuildBudgetBalancesCommand,
+)
+from api2.models import Budget
+from budget.utils.test import BudgetTestCase
+
+
+class TestRebuildBudgetBalances(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.node = cls.generate_budget(is_node=True)
+        cls.budget = cls.generate_budget(parent=cls.node)
+        cls.generate_transaction(cls.budget, amount=10)
+        cls.generate_transaction(cls.budget, amount=20, prediction=True)
+
+    def test_verify(self):
+        RebuildBudgetBalancesCommand().handle(verify=True)
+
+        Budget.objects.filter(pk=self.budget.pk).update(own_balance=0)
+        with self.assertRaises(CommandError):
+            RebuildBudgetBalancesCommand().handle(verify=True)
+
+    def test_rebuild(self):
+        Budget.objects.update(own_balance=0, subtree_balance=0)
+
+        RebuildBudgetBalancesCommand().handle(user=self.user.username)
+
+        self.budget.refresh_from_db()
+        self.node.refresh_from_db()
+        self.budget_root.refresh_from_db()
+        self.assertEqual(
+            (self.budget.own_balance, self.budget.subtree_balance), (10, 10)
+        )
+        self.assertEqual((self.node.own_balance, self.node.subtree_balance), (0, 10))
+        self.assertEqual(self.budget_root.subtree_balance, 10)
+        RebuildBudgetBalancesCommand().handle(verify=True)
+
+    def test_unknown_user(self):
+        with self.assertRaises(CommandError):
+            RebuildBudgetBalancesCommand().handle(user="does not exist")
@@ -0,0 +1,53 @@
+import json
+
+import arrow
+from rest_framework.utils.encoders import JSONEncoder
+
+from api2.models import Transaction
+from api2.serializers import TransactionSerializer
+from api2.utils.streaming import buffered, iter_json, stream_queryset
+from budget.utils.test import BudgetTestCase
+
+
+class StreamingTestCase(BudgetTestCase):
+    def test_iter_json(self):
+        data = {
+            "dates": ["2022-01-01", "2022-02-01"],
+            "data": {1: [1, 2], 2: [3, 4]},
+            "rows": iter([{"date": arrow.get(2022, 1, 1).date()}, {}]),
+            "empty": iter([]),
+        }
+
+        pieces = list(iter_json(data, JSONEncoder()))
+
+        self.assertGreater(len(pieces), 10)
+        self.assertEqual(
+            json.loads("".join(pieces)),
+            {
+                "dates": ["2022-01-01", "2022-02-01"],
+                "data": {"1": [1, 2], "2": [3, 4]},
+                "rows": [{"date": "2022-01-01"}, {}],
+                "empty": [],
+            },
+        )
+
+    def test_buffered(self):
+        self.assertEqual(list(buffered(["ab", "cd", "e"], size=3)), [b"abcd", b"e"])
+        self.assertEqual(list(buffered([])), [])
+
+    def test_stream_queryset(self):
+        budget = self.generate_budget()
+        tag = self.generate_tag()
+        for _ in range(5):
+            self.generate_transaction(budget, tags=[tag])
+        queryset = Transaction.objects.order_by("id")
+
+        # One cursor over the transactions and the tags of each chunk of two rows
+        with self.assertNumQueries(4):
+            rows = list(
+                stream_queryset(
+                    queryset, TransactionSerializer, ("tags",), chunk_size=2
+                )
+            )
+
+        self.assertEqual(rows, TransactionSerializer(queryset, many=True).data)
@@ -1,3 +1,4 @@
+import json
 from typing import Type, Union
 
 import arrow
@@ -53,6 +54,23 @@ class TransactionViewTestCase(BudgetTestCase):
         self.assertNotIn("results", list_response)
         self.assertEqual(len(list_response), 1)
 
+    def test_streaming_list(self):
+        tag = self.generate_tag()
+        for budget in self.budgets:
+            self.generate_transaction(budget=budget, tags=[tag])
+
+        r = self.get(reverse("api2:transaction-list"), query={"stream": "true"})
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r.streaming)
+        self.assertEqual(r["Content-Type"], "application/json")
+
+        list_response = json.loads(b"".join(r.streaming_content))
+        expected = self.get(
+            reverse("api2:transaction-list"), query={"no_pagination": "true"}
+        ).json()
+        self.assertEqual(list_response, expected)
+        self.assertLengthEqual(list_response, len(self.budgets))
+
     def test_excludes_filter(self):
         exclude_budget = self.budgets[0]
 
@@ -126,6 +144,21 @@ class ReportTestCase(BudgetTestCase):
         self.assertEqual(r.status_code, 200, r.json())
         self.assertEqual(r.json()["budgets"], {})
 
+    def test_streaming(self):
+        query = {
+            "date__gte": str(self.start.date()),
+            "date__lte": str(self.end.date()),
+        }
+
+        r = self.get(self.url, query={**query, "stream": "1"})
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r.streaming)
+
+        self.assertEqual(
+            json.loads(b"".join(r.streaming_content)),
+            self.get(self.url, query=query).json(),
+        )
+
     def test_get_stats(self):
         Transaction.objects.all().delete()
         tag1 = self.generate_tag()
@@ -1,45 +1,159 @@
-from typing import List
+import logging
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
 
 import arrow
 from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import QuerySet
 
 from api2.constants import ROOT_BUDGET_NAME, DefaultTags
 from api2.models import Budget, Transaction, Tag
+from api2.utils.bulk_transactions import TaggedTransaction, bulk_create_transactions
+
+logger = logging.getLogger(__name__)
+
+MONTHLY_INCOME_DESCRIPTION = "Monthly Income"
+USER_CHUNK_SIZE = 500
+
+
+class MonthlyIncome(NamedTuple):
+    transactions: List[Transaction]
+    # Users with funded budgets but no root budget or income tag
+    skipped_user_ids: List[int]
 
 
 def add_monthly_income(user: User, date=None, prediction=False) -> List[Transaction]:
     """
     Add allocated funds from Root to each budget
     """
+    return bulk_create_transactions(
+        get_monthly_income_transactions(user, date, prediction)
+    )
+
+
+def add_monthly_income_for_users(
+    users: Optional["QuerySet[User]"] = None,
+    date=None,
+    dry_run=False,
+    chunk_size: int = USER_CHUNK_SIZE,
+) -> MonthlyIncome:
+    """
+    add_monthly_income for every user, built for a chunk of users at a time
+    and inserted in bulk.
 
+    Budgets that already received their monthly income in the month of date,
+    going by Transaction.monthly_income_month, are skipped, so running it
+    again in the same month does not add it twice, and a unique constraint
+    keeps runs at the same time from both adding it. Users without a root
+    budget or income tag get nothing and are returned in skipped_user_ids.
+    With dry_run nothing is saved. Returns the transactions that were, or
+    would be, created
+    """
     date = arrow.now() if date is None else arrow.get(date)
-    root_budget = Budget.objects.get(name=ROOT_BUDGET_NAME, user=user)
-    income_tag = Tag.objects.get(name=DefaultTags.INCOME, user=user)
-    transactions = []
+    users = User.objects.all() if users is None else users
+    user_ids = list(users.order_by("id").values_list("id", flat=True))
+    posted_budgets = Transaction.objects.filter(
+        prediction=False, monthly_income_month=date.floor("month").date()
+    ).values("budget")
+
+    created: List[Transaction] = []
+    skipped_user_ids: Set[int] = set()
+    for i in range(0, len(user_ids), chunk_size):
+        budgets = Budget.objects.filter(
+            user_id__in=user_ids[i : i + chunk_size]
+        ).exclude(pk__in=posted_budgets)
+        try:
+            chunk, skipped = _add_monthly_income(budgets, date, dry_run)
+        except IntegrityError:
+            # A run at the same time added the monthly income of some of the
+            # budgets first, they are excluded when trying again
+            logger.warning("Monthly income was added concurrently, trying again")
+            chunk, skipped = _add_monthly_income(budgets, date, dry_run)
+        created.extend(chunk)
+        skipped_user_ids.update(skipped)
+
+    return MonthlyIncome(created, sorted(skipped_user_ids))
+
+
+def _add_monthly_income(
+    budgets: "QuerySet[Budget]", date: arrow.Arrow, dry_run: bool
+) -> Tuple[List[Transaction], Set[int]]:
+    with db_transaction.atomic():
+        rows, skipped_user_ids = build_monthly_income_transactions(budgets, date)
+        if dry_run:
+            return [transaction for transaction, _ in rows], skipped_user_ids
+        return bulk_create_transactions(rows), skipped_user_ids
+
 
-    for budget in Budget.objects.filter(user=user, monthly_allocation__gt=0):
-        budget_income_trans = Transaction.objects.create(
+def get_monthly_income_transactions(
+    user: User, date=None, prediction=False
+) -> List[TaggedTransaction]:
+    """
+    The unsaved transactions of add_monthly_income with their tags
+    """
+    transactions, _ = build_monthly_income_transactions(
+        Budget.objects.filter(user=user), date, prediction
+    )
+    return transactions
+
+
+def build_monthly_income_transactions(
+    budgets: "QuerySet[Budget]", date=None, prediction=False
+) -> Tuple[List[TaggedTransaction], Set[int]]:
+    """
+    The unsaved budget income and root debit, with their tags, of each budget
+    with a monthly allocation, for any number of users. The root budgets and
+    income tags of all of the users are fetched at once.
+
+    The budgets of users without a root budget or income tag are skipped,
+    those users are returned along with the transactions
+    """
+    date = arrow.now() if date is None else arrow.get(date)
+    budgets = list(budgets.filter(monthly_allocation__gt=0).order_by("user_id", "id"))
+    user_ids = {budget.user_id for budget in budgets}
+    root_budgets: Dict[int, Budget] = {
+        budget.user_id: budget
+        for budget in Budget.objects.filter(name=ROOT_BUDGET_NAME, user__in=user_ids)
+    }
+    income_tags: Dict[int, Tag] = {
+        tag.user_id: tag
+        for tag in Tag.objects.filter(name=DefaultTags.INCOME, user__in=user_ids)
+    }
+    transactions: List[TaggedTransaction] = []
+    skipped_user_ids: Set[int] = set()
+
+    for budget in budgets:
+        root_budget = root_budgets.get(budget.user_id)
+        income_tag = income_tags.get(budget.user_id)
+        if root_budget is None or income_tag is None:
+            logger.warning(
+                'Skipping monthly income of budget "%s", its user has no root budget or income tag',
+                budget.id,
+            )
+            skipped_user_ids.add(budget.user_id)
+            continue
+
+        budget_income_trans = Transaction(
             amount=abs(budget.monthly_allocation),
-            description="Monthly Income",
+            description=MONTHLY_INCOME_DESCRIPTION,
             budget=budget,
             date=date.date(),
             income=True,
             transfer=False,
             prediction=prediction,
+            monthly_income_month=date.floor("month").date(),
         )
-        budget_income_trans.tags.set([income_tag])
 
-        root_income_trans = Transaction.objects.create(
+        root_income_trans = Transaction(
             amount=0 - abs(budget.monthly_allocation),
-            description=f"Monthly Income: {budget.name}",
+            description=f"{MONTHLY_INCOME_DESCRIPTION}: {budget.name}",
             budget=root_budget,
             date=date.date(),
             income=True,
             transfer=False,
             prediction=prediction,
         )
-        root_income_trans.tags.set([income_tag])
 
-        transactions.append(budget_income_trans)
-        transactions.append(root_income_trans)
-    return transactions
+        transactions.append((budget_income_trans, [income_tag]))
+        transactions.append((root_income_trans, [income_tag]))
+    return transactions, skipped_user_ids
@@ -0,0 +1,175 @@
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+from django.db import transaction as db_transaction
+from django.db.models import Count, F, Q, QuerySet, Sum
+
+from api2.models import Budget, DailyBalanceSnapshot, Transaction
+from api2.utils.ledger import TransactionState
+
+DAY_TOTAL_FIELDS = ("income", "outcome", "transfer", "delta", "count")
+
+
+def get_day_totals(state: TransactionState, sign: int) -> Dict[str, int]:
+    amount = sign * state.amount
+    return {
+        "income": amount if state.income else 0,
+        "outcome": amount if not state.income and not state.transfer else 0,
+        "transfer": amount if state.transfer else 0,
+        "delta": amount,
+        "count": sign,
+    }
+
+
+DayKey = Tuple[int, bool, date]
+
+
+def get_day_changes(
+    previous: Optional[TransactionState], current: Optional[TransactionState]
+) -> Dict[DayKey, Dict[str, int]]:
+    """
+    The net change to the day totals of each (budget, prediction, date) snapshot
+    when the previous version of a transaction is replaced by the current one
+    """
+    changes: Dict[DayKey, Dict[str, int]] = {}
+    for state, sign in ((previous, -1), (current, 1)):
+        if state is None or state.budget_id is None:
+            continue
+        key = (state.budget_id, state.prediction, state.date)
+        totals = get_day_totals(state, sign)
+        if key in changes:
+            totals = {
+                field: changes[key][field] + totals[field] for field in DAY_TOTAL_FIELDS
+            }
+        changes[key] = totals
+    return changes
+
+
+def add_to_snapshot(key: DayKey, totals: Dict[str, int], user_id: Optional[int]):
+    """
+    Adds the totals to the snapshot of a (budget, prediction, date) day, and
+    their delta to the closing balance of that day and every day after it
+    """
+    if not any(totals.values()):
+        return
+
+    budget_id, prediction, day = key
+    snapshots = DailyBalanceSnapshot.objects.filter(
+        budget_id=budget_id, prediction=prediction
+    )
+
+    updated = snapshots.filter(date=day).update(
+        **{field: F(field) + totals[field] for field in DAY_TOTAL_FIELDS}
+    )
+    if not updated:
+        DailyBalanceSnapshot.objects.create(
+            user_id=user_id,
+            budget_id=budget_id,
+            prediction=prediction,
+            date=day,
+            closing_balance=snapshots.filter(date__lt=day)
+            .order_by("-date")
+            .values_list("closing_balance", flat=True)
+            .first()
+            or 0,
+            **totals,
+        )
+    # Includes the closing balance of a snapshot created above
+    if totals["delta"]:
+        snapshots.filter(date__gte=day).update(
+            closing_balance=F("closing_balance") + totals["delta"]
+        )
+    if totals["count"] < 0:
+        snapshots.filter(date=day, count__lte=0).delete()
+
+
+def apply_transaction_change(
+    previous: Optional[TransactionState],
+    current: Optional[TransactionState],
+    user_ids: Dict[int, Optional[int]],
+):
+    """
+    Replaces the previous version of a transaction in the snapshots with the
+    current one, user_ids mapping their budgets to their users. previous is
+    None for new transactions, current is None for deleted ones.
+
+    Only the net change of each day is written, so an edit that keeps the
+    budget, prediction and date updates the later days once, if at all
+    """
+    if previous == current:
+        return
+
+    with db_transaction.atomic():
+        for key, totals in get_day_changes(previous, current).items():
+            add_to_snapshot(key, totals, user_ids.get(key[0]))
+
+
+def rebuild_balance_snapshots(
+    budgets: QuerySet[Budget],
+    since: Optional[date] = None,
+    prediction: Optional[bool] = None,
+) -> int:
+    """
+    Recalculates the snapshots of the budgets from their transactions. When
+    since is given only the snapshots from that day onwards are replaced.
+
+    Returns the number of snapshots created
+    """
+    transactions = Transaction.objects.filter(budget__in=budgets)
+    snapshots = DailyBalanceSnapshot.objects.filter(budget__in=budgets)
+    if prediction is not None:
+        transactions = transactions.filter(prediction=prediction)
+        snapshots = snapshots.filter(prediction=prediction)
+
+    closing_balances: Dict[Tuple[int, bool], int] = defaultdict(int)
+    if since is not None:
+        for budget_id, is_prediction, total in (
+            transactions.filter(date__lt=since)
+            .order_by()
+            .values("budget", "prediction")
+            .annotate(total=Sum("amount"))
+            .values_list("budget", "prediction", "total")
+        ):
+            closing_balances[(budget_id, is_prediction)] = total
+
+        transactions = transactions.filter(date__gte=since)
+        snapshots = snapshots.filter(date__gte=since)
+
+    days = (
+        transactions.order_by()
+        .values("budget", "budget__user", "prediction", "date")
+        .annotate(
+            income_total=Sum("amount", filter=Q(income=True)),
+            outcome_total=Sum("amount", filter=Q(income=False, transfer=False)),
+            transfer_total=Sum("amount", filter=Q(transfer=True)),
+            delta_total=Sum("amount"),
+            count_total=Count("id"),
+        )
+        .order_by("budget", "prediction", "date")
+    )
+
+    new_snapshots = []
+    for day in days:
+        key = (day["budget"], day["prediction"])
+        closing_balances[key] += day["delta_total"]
+        new_snapshots.append(
+            DailyBalanceSnapshot(
+                user_id=day["budget__user"],
+                budget_id=day["budget"],
+                date=day["date"],
+                prediction=day["prediction"],
+                income=day["income_total"] or 0,
+                outcome=day["outcome_total"] or 0,
+                transfer=day["transfer_total"] or 0,
+                delta=day["delta_total"],
+                count=day["count_total"],
+                closing_balance=closing_balances[key],
+            )
+        )
+
+    with db_transaction.atomic():
+        snapshots.delete()
+        DailyBalanceSnapshot.objects.bulk_create(new_snapshots, batch_size=500)
+
+    return len(new_snapshots)
@@ -0,0 +1,152 @@
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from django.contrib.auth.models import User
+from django.db import transaction as db_transaction
+from django.db.models import F, Sum
+
+from api2.models import Budget, Transaction
+from api2.utils.ledger import TransactionState
+
+BudgetBalances = Dict[int, Tuple[int, int]]
+
+
+def _counts_towards_balance(state: Optional[TransactionState]) -> bool:
+    return state is not None and state.budget_id is not None and not state.prediction
+
+
+def adjust_subtree_balances(budget_id: int, delta: int, include_self=True):
+    """
+    Adds delta to the subtree balance of the budget and every budget above it
+    """
+    if not delta:
+        return
+
+    links = {"descendant_links__descendant_id": budget_id}
+    if not include_self:
+        links["descendant_links__depth__gt"] = 0
+
+    Budget.objects.filter(**links).update(subtree_balance=F("subtree_balance") + delta)
+
+
+def apply_balance_delta(budget_id: int, delta: int):
+    """
+    Adds delta to the balance of the budget and the subtree balance of
+    every budget above it
+    """
+    if not delta:
+        return
+
+    with db_transaction.atomic():
+        Budget.objects.filter(pk=budget_id).update(own_balance=F("own_balance") + delta)
+        adjust_subtree_balances(budget_id, delta)
+
+
+def apply_transaction_change(
+    previous: Optional[TransactionState], current: Optional[TransactionState]
+):
+    """
+    Removes the previous contribution of a transaction from the ledger and adds
+    the current one. previous is None for new transactions, current is None for
+    deleted ones
+    """
+    deltas: Dict[int, int] = defaultdict(int)
+    if _counts_towards_balance(previous):
+        deltas[previous.budget_id] -= previous.amount  # type: ignore
+    if _counts_towards_balance(current):
+        deltas[current.budget_id] += current.amount  # type: ignore
+
+    for budget_id, delta in deltas.items():
+        apply_balance_delta(budget_id, delta)
+
+
+def get_subtree_balance(budget_id: int) -> int:
+    return (
+        Budget.objects.filter(pk=budget_id)
+        .values_list("subtree_balance", flat=True)
+        .first()
+    ) or 0
+
+
+def move_subtree(
+    budget_id: int, old_parent_id: Optional[int], new_parent_id: Optional[int]
+):
+    """
+    Moves the subtree balance of a budget from its old ancestors to its new ones
+    """
+    subtree_balance = get_subtree_balance(budget_id)
+
+    with db_transaction.atomic():
+        if old_parent_id is not None:
+            adjust_subtree_balances(old_parent_id, -subtree_balance)
+        if new_parent_id is not None:
+            adjust_subtree_balances(new_parent_id, subtree_balance)
+
+
+def remove_subtree(budget_id: int):
+    """
+    Removes the subtree balance of a budget from every budget above it
+    """
+    adjust_subtree_balances(
+        budget_id, -get_subtree_balance(budget_id), include_self=False
+    )
+
+
+def calculate_budget_balances(user: Optional[User] = None) -> BudgetBalances:
+    """
+    Calculates (own_balance, subtree_balance) for every budget from scratch
+    """
+    budgets = Budget.objects.all() if user is None else Budget.objects.filter(user=user)
+    parents = dict(budgets.values_list("id", "parent_id"))
+    own_balances: Dict[int, int] = dict(
+        Transaction.objects.filter(budget__in=budgets, prediction=False)
+        .order_by()
+        .values("budget")
+        .annotate(total=Sum("amount"))
+        .values_list("budget", "total")
+    )
+
+    subtree_balances = {budget_id: 0 for budget_id in parents}
+    for budget_id in parents:
+        own_balance = own_balances.get(budget_id, 0)
+        visited = set()
+        node_id: Optional[int] = budget_id
+        while node_id in subtree_balances and node_id not in visited:
+            subtree_balances[node_id] += own_balance  # type: ignore
+            visited.add(node_id)
+            node_id = parents[node_id]  # type: ignore
+
+    return {
+        budget_id: (own_balances.get(budget_id, 0), subtree_balances[budget_id])
+        for budget_id in parents
+    }
+
+
+def find_stale_budget_balances(user: Optional[User] = None) -> List[Budget]:
+    """
+    Returns every budget whose stored balance is wrong, with the
+    correct balance set on the unsaved instance
+    """
+    expected_balances = calculate_budget_balances(user)
+    budgets = Budget.objects.filter(pk__in=expected_balances.keys()).only(
+        "id", "name", "user", *Budget.LEDGER_FIELDS
+    )
+
+    stale_budgets = []
+    for budget in budgets:
+        expected = expected_balances[budget.id]
+        if (budget.own_balance, budget.subtree_balance) != expected:
+            budget.own_balance, budget.subtree_balance = expected
+            stale_budgets.append(budget)
+
+    return stale_budgets
+
+
+def rebuild_budget_balances(user: Optional[User] = None) -> List[Budget]:
+    with db_transaction.atomic():
+        stale_budgets = find_stale_budget_balances(user)
+        Budget.objects.bulk_update(
+            stale_budgets, Budget.LEDGER_FIELDS, batch_size=500  # type: ignore
+        )
+
+    return stale_budgets
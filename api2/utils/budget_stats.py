@@ -0,0 +1,89 @@
+from typing import Dict, List, Optional, Sequence
+
+import arrow
+from django.db.models import Count, Q, QuerySet, Sum
+
+from api2.models import Budget
+from api2.utils.data_version import bump_data_version
+
+BUDGET_STATS_FIELDS = ("rank", "income_per_month", "outcome_per_month")
+UPDATE_BATCH_SIZE = 500
+
+
+def get_amount_per_month(total: Optional[int], months: int) -> int:
+    # Same as Budget.calculate_income_outcome
+    return round(total / months) if total else 0
+
+
+def annotate_budget_stats(
+    budgets: "QuerySet[Budget]", rank_months: int, income_outcome_months: int
+) -> "QuerySet[Budget]":
+    """
+    Adds the stats of each budget in one grouped query: stats_rank, the number
+    of transactions in the last rank_months, and stats_income and
+    stats_outcome, the sums of its income and other transactions in the last
+    income_outcome_months. Predictions are left out
+    """
+    now = arrow.now()
+    rank_filter = Q(
+        transaction__prediction=False,
+        transaction__date__gte=now.shift(months=-rank_months).date(),
+    )
+    income_outcome_filter = Q(
+        transaction__prediction=False,
+        transaction__date__range=(
+            now.shift(months=-income_outcome_months).date(),
+            now.date(),
+        ),
+    )
+    return budgets.annotate(
+        stats_rank=Count("transaction", filter=rank_filter),
+        stats_income=Sum(
+            "transaction__amount",
+            filter=income_outcome_filter & Q(transaction__income=True),
+        ),
+        stats_outcome=Sum(
+            "transaction__amount",
+            filter=income_outcome_filter & Q(transaction__income=False),
+        ),
+    )
+
+
+def update_budget_stats(
+    fields: Sequence[str] = BUDGET_STATS_FIELDS,
+    rank_months: int = 6,
+    income_outcome_months: int = 6,
+) -> List[Budget]:
+    """
+    Sets the stats fields of every budget like Budget.calculate_income_outcome
+    and the budget rankings, with one query to calculate them and bulk
+    updates of the changed budgets. Returns the changed budgets
+    """
+    budgets = annotate_budget_stats(
+        Budget.objects.order_by().only("user", *fields),
+        rank_months,
+        income_outcome_months,
+    )
+
+    changed = []
+    for budget in budgets:
+        stats: Dict[str, int] = {
+            "rank": budget.stats_rank,
+            "income_per_month": get_amount_per_month(
+                budget.stats_income, income_outcome_months
+            ),
+            "outcome_per_month": get_amount_per_month(
+                budget.stats_outcome, income_outcome_months
+            ),
+        }
+        if all(getattr(budget, field) == stats[field] for field in fields):
+            continue
+
+        for field in fields:
+            setattr(budget, field, stats[field])
+        changed.append(budget)
+
+    Budget.objects.bulk_update(changed, fields, batch_size=UPDATE_BATCH_SIZE)
+    # bulk_update does not send the signals that mark the data as changed
+    bump_data_version(budget.user_id for budget in changed)
+    return changed
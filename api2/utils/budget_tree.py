@@ -0,0 +1,100 @@
+from typing import List, Optional
+
+from django.db import transaction as db_transaction
+
+from api2.models import BudgetClosure
+
+
+def add_budget(budget_id: int, parent_id: Optional[int]):
+    """
+    Indexes a new budget underneath its parent
+    """
+    links = [BudgetClosure(ancestor_id=budget_id, descendant_id=budget_id, depth=0)]
+    if parent_id is not None:
+        links += [
+            BudgetClosure(
+                ancestor_id=ancestor_id, descendant_id=budget_id, depth=depth + 1
+            )
+            for ancestor_id, depth in BudgetClosure.objects.filter(
+                descendant_id=parent_id
+            ).values_list("ancestor_id", "depth")
+        ]
+
+    BudgetClosure.objects.bulk_create(links)
+
+
+def detach_subtree(budget_id: int):
+    """
+    Unlinks a budget and everything below it from the budgets above it
+    """
+    subtree_ids = BudgetClosure.objects.filter(ancestor_id=budget_id).values(
+        "descendant_id"
+    )
+    ancestor_ids = BudgetClosure.objects.filter(
+        descendant_id=budget_id, depth__gt=0
+    ).values("ancestor_id")
+
+    BudgetClosure.objects.filter(
+        descendant_id__in=subtree_ids, ancestor_id__in=ancestor_ids
+    ).delete()
+
+
+def attach_subtree(budget_id: int, parent_id: int):
+    """
+    Links a detached budget and everything below it to its new parent and
+    every budget above that parent
+    """
+    subtree = list(
+        BudgetClosure.objects.filter(ancestor_id=budget_id).values_list(
+            "descendant_id", "depth"
+        )
+    )
+    ancestors = list(
+        BudgetClosure.objects.filter(descendant_id=parent_id).values_list(
+            "ancestor_id", "depth"
+        )
+    )
+
+    BudgetClosure.objects.bulk_create(
+        [
+            BudgetClosure(
+                ancestor_id=ancestor_id,
+                descendant_id=descendant_id,
+                depth=ancestor_depth + descendant_depth + 1,
+            )
+            for ancestor_id, ancestor_depth in ancestors
+            for descendant_id, descendant_depth in subtree
+        ],
+        batch_size=500,
+    )
+
+
+def move_budget(budget_id: int, new_parent_id: Optional[int]):
+    with db_transaction.atomic():
+        detach_subtree(budget_id)
+        if new_parent_id is not None:
+            attach_subtree(budget_id, new_parent_id)
+
+
+def remove_budget(budget_id: int):
+    """
+    Deleting a budget orphans its children, so each child subtree is detached
+    from the deleted budget and its ancestors. The rows of the budget itself
+    are removed by the cascade
+    """
+    with db_transaction.atomic():
+        for child_id in BudgetClosure.objects.filter(
+            ancestor_id=budget_id, depth=1
+        ).values_list("descendant_id", flat=True):
+            detach_subtree(child_id)
+
+
+def get_ancestor_ids(budget_id: int) -> List[int]:
+    """
+    Ids of the parent of the budget, its parent, and so on up to the root budget
+    """
+    return list(
+        BudgetClosure.objects.filter(descendant_id=budget_id, depth__gt=0)
+        .order_by("depth")
+        .values_list("ancestor_id", flat=True)
+    )
@@ -0,0 +1,150 @@
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+from django.db import connections, transaction as db_transaction
+from django.db.models import Min, QuerySet, Sum
+
+from api2.models import Budget, Tag, Transaction
+from api2.utils import balance_snapshots, budget_balance, data_version, monthly_rollups
+from api2.utils.ledger import TransactionState
+
+TaggedTransaction = Tuple[Transaction, Sequence[Tag]]
+# (budget id, prediction, earliest changed day)
+LedgerChange = Tuple[int, bool, date]
+
+
+def bulk_create_transactions(
+    rows: Sequence[TaggedTransaction], batch_size: int = 500
+) -> List[Transaction]:
+    """
+    Inserts unsaved transactions and the links to their tags in batches.
+
+    bulk_create does not send the signals that maintain the budget balances,
+    balance snapshots, monthly rollups and data version, so they are updated
+    here once for all of the transactions
+
+    Returns the created transactions
+    """
+    transactions = [transaction for transaction, _ in rows]
+    if not transactions:
+        return []
+
+    Link = Transaction.tags.through
+    with db_transaction.atomic(), data_version.deferred_bumps():
+        Transaction.objects.bulk_create(transactions, batch_size=batch_size)
+        Link.objects.bulk_create(
+            [
+                Link(transaction_id=transaction.id, tag_id=tag.id)
+                for transaction, tags in rows
+                for tag in tags
+            ],
+            batch_size=batch_size,
+        )
+        apply_created_transactions(transactions)
+
+    return transactions
+
+
+def bulk_delete_transactions(transactions: "QuerySet[Transaction]") -> int:
+    """
+    Deletes transactions and the links to their tags with one query each per
+    batch of ids, a single batch unless the database limits query parameters.
+
+    Deleting a queryset sends the delete signals for every row, which update
+    the budget balances, balance snapshots, monthly rollups and data version
+    one transaction at a time. They are skipped here and the derived data is
+    updated once for all of the transactions
+
+    Returns the number of deleted transactions
+    """
+    db = transactions.db
+    # The queryset may filter on the tag links, which are deleted first
+    pks = list(transactions.order_by().values_list("pk", flat=True))
+    if not pks:
+        return 0
+
+    selected = Transaction.objects.using(db).filter(pk__in=transactions.values("pk"))
+    Link = Transaction.tags.through
+    connection = connections[db]
+    batch_size = max(connection.ops.bulk_batch_size(["pk"], pks), 1)
+    table = connection.ops.quote_name(Transaction._meta.db_table)
+    deleted = 0
+
+    with db_transaction.atomic(using=db), data_version.deferred_bumps():
+        deltas: Dict[int, int] = dict(
+            selected.filter(prediction=False, budget__isnull=False)
+            .values("budget")
+            .annotate(total=Sum("amount"))
+            .values_list("budget", "total")
+        )
+        changes: List[LedgerChange] = list(
+            selected.filter(budget__isnull=False)
+            .values("budget", "prediction")
+            .annotate(since=Min("date"))
+            .values_list("budget", "prediction", "since")
+        )
+
+        with connection.cursor() as cursor:
+            for i in range(0, len(pks), batch_size):
+                batch = pks[i : i + batch_size]
+                # No signals are connected to the links, so this is one query
+                Link.objects.using(db).filter(transaction_id__in=batch).delete()
+                cursor.execute(
+                    f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(batch))})",
+                    batch,
+                )
+                deleted += cursor.rowcount
+
+        for budget_id, delta in deltas.items():
+            budget_balance.apply_balance_delta(budget_id, -delta)
+        apply_ledger_changes(changes)
+
+    return deleted
+
+
+def apply_created_transactions(transactions: Sequence[Transaction]):
+    """
+    Adds transactions inserted without signals to the data derived from them
+    """
+    states = [
+        TransactionState.from_instance(transaction)
+        for transaction in transactions
+        if transaction.budget_id is not None
+    ]
+
+    deltas: Dict[int, int] = defaultdict(int)
+    for state in states:
+        if not state.prediction:
+            deltas[state.budget_id] += state.amount  # type: ignore
+    for budget_id, delta in deltas.items():
+        budget_balance.apply_balance_delta(budget_id, delta)
+
+    apply_ledger_changes(
+        (state.budget_id, state.prediction, state.date)  # type: ignore
+        for state in states
+    )
+
+
+def apply_ledger_changes(changes: Iterable[LedgerChange]):
+    """
+    Rebuilds the balance snapshots and monthly rollups of budgets whose
+    transactions changed without signals, from the earliest changed day, and
+    marks the data of their users as changed
+    """
+    budget_ids: Dict[bool, Set[int]] = defaultdict(set)
+    since: Dict[bool, date] = {}
+    for budget_id, prediction, day in changes:
+        budget_ids[prediction].add(budget_id)
+        since[prediction] = min(day, since.get(prediction, day))
+
+    for prediction, changed_budget_ids in budget_ids.items():
+        budgets = Budget.objects.filter(pk__in=changed_budget_ids)
+        balance_snapshots.rebuild_balance_snapshots(
+            budgets, since[prediction], prediction
+        )
+        monthly_rollups.rebuild_monthly_rollups(budgets, since[prediction], prediction)
+
+    data_version.bump_data_version(
+        data_version.get_budget_user_ids(set().union(*budget_ids.values()))
+    )
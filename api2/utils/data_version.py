@@ -0,0 +1,87 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+
+import arrow
+from django.contrib.auth.models import User
+from django.db.models import F
+
+from api2.models import Budget, UserInfo
+
+DataVersion = Tuple[int, Optional[datetime]]
+
+# The users to bump at the end of a deferred_bumps block, None outside of one
+_deferred_user_ids: ContextVar[Optional[Set[int]]] = ContextVar(
+    "deferred_user_ids", default=None
+)
+
+
+def get_budget_user_ids(budget_ids: Iterable[Optional[int]]) -> Set[int]:
+    budget_ids = {budget_id for budget_id in budget_ids if budget_id is not None}
+    if not budget_ids:
+        return set()
+
+    return set(
+        Budget.objects.filter(pk__in=budget_ids, user__isnull=False).values_list(
+            "user_id", flat=True
+        )
+    )
+
+
+def get_budget_users(budget_ids: Iterable[Optional[int]]) -> Dict[int, Optional[int]]:
+    """
+    Maps each of the budgets to the id of its user
+    """
+    budget_ids = {budget_id for budget_id in budget_ids if budget_id is not None}
+    if not budget_ids:
+        return {}
+
+    return dict(Budget.objects.filter(pk__in=budget_ids).values_list("id", "user_id"))
+
+
+def bump_data_version(user_ids: Iterable[Optional[int]]):
+    """
+    Marks the data of the users as changed, invalidating anything derived from
+    the previous version such as cached reports
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    deferred_user_ids = _deferred_user_ids.get()
+    if deferred_user_ids is not None:
+        deferred_user_ids.update(user_ids)
+        return
+    if not user_ids:
+        return
+
+    UserInfo.objects.filter(user_id__in=user_ids).update(
+        data_version=F("data_version") + 1, data_modified=arrow.now().datetime
+    )
+
+
+@contextmanager
+def deferred_bumps() -> Iterator[None]:
+    """
+    Collects the users marked as changed inside the block, by receivers that
+    run once per row for example, and bumps each of them once when it ends
+    """
+    if _deferred_user_ids.get() is not None:
+        # The outermost block bumps the users
+        yield
+        return
+
+    token = _deferred_user_ids.set(set())
+    try:
+        yield
+        user_ids = _deferred_user_ids.get()
+    finally:
+        _deferred_user_ids.reset(token)
+    bump_data_version(user_ids)  # type: ignore
+
+
+def get_data_version_info(user: User) -> DataVersion:
+    """
+    Returns (data_version, data_modified) of the user
+    """
+    return UserInfo.objects.filter(user=user).values_list(
+        "data_version", "data_modified"
+    ).first() or (0, None)
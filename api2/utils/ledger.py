@@ -0,0 +1,40 @@
+from datetime import date
+from typing import NamedTuple, Optional
+
+from api2.models import Transaction
+
+
+class TransactionState(NamedTuple):
+    """
+    The fields of a transaction that derived ledger data depends on.
+
+    Signals capture this before a transaction is saved or deleted so the
+    previous contribution can be removed before the new one is added
+    """
+
+    budget_id: Optional[int]
+    date: date
+    amount: int
+    income: bool
+    transfer: bool
+    prediction: bool
+
+    @classmethod
+    def from_instance(cls, transaction: Transaction) -> "TransactionState":
+        return cls(
+            budget_id=transaction.budget_id,
+            # Dates assigned in memory may still be datetimes or strings
+            date=Transaction._meta.get_field("date").to_python(transaction.date),
+            amount=transaction.amount,
+            income=transaction.income,
+            transfer=transaction.transfer,
+            prediction=transaction.prediction,
+        )
+
+    @classmethod
+    def load(cls, pk: Optional[int]) -> Optional["TransactionState"]:
+        if pk is None:
+            return None
+
+        values = Transaction.objects.filter(pk=pk).values_list(*cls._fields).first()
+        return cls(*values) if values else None
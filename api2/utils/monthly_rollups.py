@@ -0,0 +1,201 @@
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from django.db import transaction as db_transaction
+from django.db.models import Count, F, Q, QuerySet, Sum
+from django.db.models.functions import TruncMonth
+
+from api2.models import Budget, MonthlyRollup, Transaction
+from api2.utils import data_version
+from api2.utils.ledger import TransactionState
+
+TagLink = Tuple[int, int]
+
+
+class RollupKey(NamedTuple):
+    budget_id: int
+    tag_id: Optional[int]
+    month: date
+    income: bool
+    transfer: bool
+    prediction: bool
+
+
+def add_rollup_changes(
+    changes: Dict[RollupKey, List[int]],
+    state: TransactionState,
+    tag_ids: Iterable[Optional[int]],
+    sign: int,
+):
+    """
+    Adds (sign=1) or removes (sign=-1) a transaction from the [amount, count]
+    changes of the rollup of its month for each of the tags, None being the
+    row without a tag
+    """
+    if state.budget_id is None:
+        return
+
+    for tag_id in tag_ids:
+        key = RollupKey(
+            budget_id=state.budget_id,
+            tag_id=tag_id,
+            month=state.date.replace(day=1),
+            income=state.income,
+            transfer=state.transfer,
+            prediction=state.prediction,
+        )
+        change = changes[key]
+        change[0] += sign * state.amount
+        change[1] += sign
+
+
+def apply_rollup_changes(
+    changes: Dict[RollupKey, List[int]], user_ids: Dict[int, Optional[int]]
+):
+    """
+    Writes the net [amount, count] change of each rollup, skipping the ones
+    that cancel out, then deletes the rollups that were emptied in one query
+    """
+    emptied = Q()
+    with db_transaction.atomic():
+        for key, (amount, count) in changes.items():
+            if not amount and not count:
+                continue
+
+            rollups = MonthlyRollup.objects.filter(**key._asdict())
+            updated = rollups.update(
+                amount=F("amount") + amount, count=F("count") + count
+            )
+            if not updated:
+                MonthlyRollup.objects.create(
+                    **key._asdict(),
+                    user_id=user_ids.get(key.budget_id),
+                    amount=amount,
+                    count=count,
+                )
+            if count < 0:
+                emptied |= Q(**key._asdict())
+
+        if emptied:
+            MonthlyRollup.objects.filter(emptied, count__lte=0).delete()
+
+
+def apply_transaction_change(
+    previous: Optional[TransactionState],
+    current: Optional[TransactionState],
+    tag_ids: Iterable[int],
+    user_ids: Dict[int, Optional[int]],
+):
+    """
+    Replaces the previous version of a transaction in the rollups with the
+    current one, tag_ids being the tags of the transaction and user_ids mapping
+    their budgets to their users. previous is None for new transactions,
+    current is None for deleted ones
+    """
+    if previous == current:
+        return
+
+    rows: List[Optional[int]] = [None, *tag_ids]
+    changes: Dict[RollupKey, List[int]] = defaultdict(lambda: [0, 0])
+    if previous is not None:
+        add_rollup_changes(changes, previous, rows, -1)
+    if current is not None:
+        add_rollup_changes(changes, current, rows, 1)
+    apply_rollup_changes(changes, user_ids)
+
+
+def get_tag_links(
+    instance, reverse: bool, pk_set: Optional[Iterable[int]] = None
+) -> List[TagLink]:
+    """
+    Returns the (transaction id, tag id) pairs of the instance of an m2m_changed
+    signal, limited to pk_set when it is given
+    """
+    links = Transaction.tags.through.objects.filter(
+        **{"tag_id" if reverse else "transaction_id": instance.pk}
+    )
+    if pk_set is not None:
+        links = links.filter(
+            **{"transaction_id__in" if reverse else "tag_id__in": pk_set}
+        )
+    return list(links.values_list("transaction_id", "tag_id"))
+
+
+def apply_tag_links(links: Iterable[TagLink], sign: int):
+    """
+    Adds (sign=1) or removes (sign=-1) transactions from the rollups of tags
+    that were added to or removed from them
+    """
+    tag_ids: Dict[int, List[int]] = defaultdict(list)
+    for transaction_id, tag_id in links:
+        tag_ids[transaction_id].append(tag_id)
+
+    states = {
+        transaction_id: TransactionState.load(transaction_id)
+        for transaction_id in tag_ids
+    }
+    user_ids = data_version.get_budget_users(
+        state.budget_id for state in states.values() if state is not None
+    )
+    changes: Dict[RollupKey, List[int]] = defaultdict(lambda: [0, 0])
+    for transaction_id, transaction_tag_ids in tag_ids.items():
+        state = states[transaction_id]
+        if state is not None:
+            add_rollup_changes(changes, state, transaction_tag_ids, sign)
+    apply_rollup_changes(changes, user_ids)
+
+
+def rebuild_monthly_rollups(
+    budgets: QuerySet[Budget],
+    since: Optional[date] = None,
+    prediction: Optional[bool] = None,
+) -> int:
+    """
+    Recalculates the rollups of the budgets from their transactions. When since
+    is given only the rollups from its month onwards are replaced.
+
+    Returns the number of rollups created
+    """
+    transactions = Transaction.objects.filter(budget__in=budgets).order_by()
+    existing = MonthlyRollup.objects.filter(budget__in=budgets)
+    if prediction is not None:
+        transactions = transactions.filter(prediction=prediction)
+        existing = existing.filter(prediction=prediction)
+    if since is not None:
+        transactions = transactions.filter(date__gte=since.replace(day=1))
+        existing = existing.filter(month__gte=since.replace(day=1))
+
+    keys = ("budget", "budget__user", "income", "transfer", "prediction")
+    totals = {"total": Sum("amount"), "total_count": Count("id")}
+
+    untagged = transactions.values(*keys, rollup_month=TruncMonth("date")).annotate(
+        **totals
+    )
+    tagged = (
+        transactions.filter(tags__isnull=False)
+        .values(*keys, "tags", rollup_month=TruncMonth("date"))
+        .annotate(**totals)
+    )
+
+    rollups = [
+        MonthlyRollup(
+            user_id=row["budget__user"],
+            budget_id=row["budget"],
+            tag_id=row.get("tags"),
+            month=row["rollup_month"],
+            income=row["income"],
+            transfer=row["transfer"],
+            prediction=row["prediction"],
+            amount=row["total"],
+            count=row["total_count"],
+        )
+        for rows in (untagged, tagged)
+        for row in rows
+    ]
+
+    with db_transaction.atomic():
+        existing.delete()
+        MonthlyRollup.objects.bulk_create(rollups, batch_size=500)
+
+    return len(rollups)
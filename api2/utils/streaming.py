@@ -0,0 +1,92 @@
+from collections.abc import Iterator as IteratorType
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Type
+
+from django.conf import settings
+from django.db.models import Model, QuerySet, prefetch_related_objects
+from django.http import StreamingHttpResponse
+from rest_framework.serializers import BaseSerializer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Size of the pieces written to the client
+BUFFER_SIZE = 64 * 1024
+
+
+def is_streaming_requested(query_params) -> bool:
+    return bool(query_params.get("stream"))
+
+
+def iter_json(value: Any, encoder: JSONEncoder) -> Iterator[str]:
+    """
+    Encodes value as JSON piece by piece. Dictionaries are encoded one item at
+    a time and iterators, such as the one returned by stream_queryset, are
+    encoded as arrays one element at a time. Anything else is encoded at once
+    """
+    if isinstance(value, dict):
+        yield "{"
+        for i, (key, item) in enumerate(value.items()):
+            yield ("," if i else "") + encoder.encode(str(key)) + ":"
+            yield from iter_json(item, encoder)
+        yield "}"
+    elif isinstance(value, IteratorType):
+        yield "["
+        for i, item in enumerate(value):
+            if i:
+                yield ","
+            yield from iter_json(item, encoder)
+        yield "]"
+    else:
+        yield encoder.encode(value)
+
+
+def buffered(pieces: Iterable[str], size: int = BUFFER_SIZE) -> Iterator[bytes]:
+    buffer: List[str] = []
+    length = 0
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield "".join(buffer).encode()
+            buffer, length = [], 0
+
+    if buffer:
+        yield "".join(buffer).encode()
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    """
+    Renders data as JSON while it is sent, so large responses are never held
+    in memory in full. See iter_json for what is streamed
+    """
+
+    def __init__(self, data: Any, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(buffered(iter_json(data, JSONEncoder())), **kwargs)
+
+
+def stream_queryset(
+    queryset: QuerySet,
+    serializer_class: Type[BaseSerializer],
+    prefetch: Sequence[str] = (),
+    context: Optional[Dict[str, Any]] = None,
+    chunk_size: Optional[int] = None,
+) -> Iterator[Any]:
+    """
+    Serializes the queryset chunk_size rows at a time, fetching them from a
+    server side cursor where the database supports it. prefetch_related does
+    not apply to iterators, so the prefetch lookups are fetched per chunk
+    """
+    chunk_size = chunk_size or settings.STREAM_CHUNK_SIZE
+
+    def serialize(chunk: List[Model]) -> Iterator[Any]:
+        prefetch_related_objects(chunk, *prefetch)
+        yield from serializer_class(chunk, many=True, context=context).data
+
+    chunk: List[Model] = []
+    for instance in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(instance)
+        if len(chunk) == chunk_size:
+            yield from serialize(chunk)
+            chunk = []
+
+    if chunk:
+        yield from serialize(chunk)
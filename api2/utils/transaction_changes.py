@@ -0,0 +1,29 @@
+from typing import Iterable, Optional
+
+from django.db import transaction as db_transaction
+
+from api2.utils import balance_snapshots, budget_balance, data_version, monthly_rollups
+from api2.utils.ledger import TransactionState
+
+
+def apply_transaction_change(
+    previous: Optional[TransactionState],
+    current: Optional[TransactionState],
+    tag_ids: Iterable[int],
+):
+    """
+    Updates the budget balances, balance snapshots, monthly rollups and data
+    version after a transaction was saved or deleted, tag_ids being its tags.
+    previous is None for new transactions, current is None for deleted ones.
+
+    The users of the budgets are loaded once and shared between them
+    """
+    user_ids = data_version.get_budget_users(
+        state.budget_id for state in (previous, current) if state is not None
+    )
+
+    with db_transaction.atomic():
+        budget_balance.apply_transaction_change(previous, current)
+        balance_snapshots.apply_transaction_change(previous, current, user_ids)
+        monthly_rollups.apply_transaction_change(previous, current, tag_ids, user_ids)
+        data_version.bump_data_version(user_ids.values())
@@ -1,12 +1,14 @@
 from rest_framework.permissions import IsAuthenticated
 
+from .ConditionalGetMixin import ConditionalGetMixin
 from .UserRelatedModelViewSet import UserRelatedModelViewSet
 from ..filters import BudgetFilterset
 from ..models import Budget
+from ..queries import get_recursive_monthly_allocations
 from ..serializers import BudgetSerializer
 
 
-class BudgetViewset(UserRelatedModelViewSet):
+class BudgetViewset(ConditionalGetMixin, UserRelatedModelViewSet):
     model = Budget
     serializer_class = BudgetSerializer
     permission_classes = [IsAuthenticated]
@@ -15,3 +17,11 @@ class BudgetViewset(UserRelatedModelViewSet):
 
     def get_queryset(self):
         return super().get_queryset().order_by("-monthly_allocation")
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ("list", "retrieve"):
+            context[
+                "recursive_monthly_allocations"
+            ] = get_recursive_monthly_allocations(super().get_queryset())
+        return context
@@ -0,0 +1,75 @@
+import hashlib
+import math
+import time
+from typing import Optional
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.request import Request
+
+from ..utils.data_version import DataVersion, get_data_version_info
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag and Last-Modified headers to list and retrieve responses, and
+    answers with 304 Not Modified before running any query or serializer when
+    the client already has the current version of the user's data
+    """
+
+    _data_version_info: Optional[DataVersion] = None
+
+    def get_data_version_info(self) -> DataVersion:
+        if self._data_version_info is None:
+            self._data_version_info = get_data_version_info(self.request.user)  # type: ignore
+        return self._data_version_info
+
+    def get_etag(self, request: Request) -> str:
+        data_version, _ = self.get_data_version_info()
+        digest = hashlib.sha256(
+            f"{request.user.id}:{data_version}:{request.get_full_path()}".encode()
+        ).hexdigest()
+        return f'W/"{digest}"'
+
+    def get_last_modified(self) -> Optional[int]:
+        """
+        data_modified rounded up to the second, so it is never earlier than
+        the change. None until that second is over, a later change in the
+        same second would have the same Last-Modified
+        """
+        _, data_modified = self.get_data_version_info()
+        if data_modified is None:
+            return None
+
+        last_modified = math.ceil(data_modified.timestamp())
+        return last_modified if last_modified <= time.time() else None
+
+    def conditional_get(self, view, request: Request, *args, **kwargs):
+        etag = self.get_etag(request)
+        last_modified = self.get_last_modified()
+
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            # The ETag changes with every change, the date only every second
+            last_modified=None
+            if "HTTP_IF_NONE_MATCH" in request.META
+            else last_modified,
+        )
+        if response is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        # Always revalidate, responses differ per user
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def list(self, request: Request, *args, **kwargs):
+        return self.conditional_get(super().list, request, *args, **kwargs)  # type: ignore
+
+    def retrieve(self, request: Request, *args, **kwargs):
+        return self.conditional_get(super().retrieve, request, *args, **kwargs)  # type: ignore
@@ -9,6 +9,11 @@ from rest_framework.viewsets import ModelViewSet
 from ..filters import TransactionFilterset
 from ..models import Transaction, Budget, Tag
 from ..serializers import TransactionSerializer
+from ..utils.streaming import (
+    StreamingJSONResponse,
+    is_streaming_requested,
+    stream_queryset,
+)
 
 
 class ReportViewset(ModelViewSet):
@@ -23,7 +28,7 @@ class ReportViewset(ModelViewSet):
 
     @staticmethod
     def get_budget_stats(qs: QuerySet[Transaction]) -> list:
-        if len(qs) == 0:
+        if not qs.exists():
             return []
 
         budgets = Budget.objects.filter(id__in=set(qs.values_list("budget", flat=True)))
@@ -39,7 +44,7 @@ class ReportViewset(ModelViewSet):
             budget_stats = {
                 "id": budget.id,
                 "name": budget.name,
-                "final_balance": budget.balance(),
+                "final_balance": budget.subtree_balance,
                 "income": Transaction.objects.filter(
                     budget=budget, date__range=date_range, income=True
                 ).aggregate(total=Sum("amount"))["total"]
@@ -59,14 +64,14 @@ class ReportViewset(ModelViewSet):
     @staticmethod
     def get_tag_stats(qs: QuerySet) -> list:
         stats: List[Dict[str, str]] = []
-        if len(qs) == 0:
+        if not qs.exists():
             return stats
         first_trans = qs.first()
         assert first_trans
         tags = Tag.objects.filter(user=first_trans.budget.user)
         for tag in tags:
             transactions_with_tag = qs.filter(tags=tag)
-            if len(transactions_with_tag) == 0:
+            if not transactions_with_tag.exists():
                 continue
             total = transactions_with_tag.aggregate(total=Sum("amount"))["total"]
             stats.append({"name": tag.name, "total": total})
@@ -76,9 +81,12 @@ class ReportViewset(ModelViewSet):
 
     def list(self, request, **kwargs):
         qs = self.filter_queryset(self.get_queryset())
+        streaming = is_streaming_requested(request.GET)
 
         response = {
-            "transactions": self.serializer_class(qs, many=True).data,
+            "transactions": stream_queryset(qs, self.serializer_class, ("tags",))
+            if streaming
+            else self.serializer_class(qs, many=True).data,
             "budgets": {},
             "tags": self.get_tag_stats(qs),
         }
@@ -86,4 +94,6 @@ class ReportViewset(ModelViewSet):
         if request.GET.get("date__gte") and request.GET.get("date__lte"):
             response["budgets"] = self.get_budget_stats(qs)
 
+        if streaming:
+            return StreamingJSONResponse(response)
         return Response(response)
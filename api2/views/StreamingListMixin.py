@@ -0,0 +1,31 @@
+from rest_framework.request import Request
+
+from ..utils.streaming import (
+    StreamingJSONResponse,
+    is_streaming_requested,
+    stream_queryset,
+)
+
+
+class StreamingListMixin:
+    """
+    Streams the whole filtered queryset without pagination when the stream
+    query parameter is set, serializing it a chunk of rows at a time
+    """
+
+    # Relations of the serializer fetched for each chunk
+    stream_prefetch: tuple = ()
+
+    def list(self, request: Request, *args, **kwargs):
+        if not is_streaming_requested(request.GET):
+            return super().list(request, *args, **kwargs)  # type: ignore
+
+        queryset = self.filter_queryset(self.get_queryset())  # type: ignore
+        return StreamingJSONResponse(
+            stream_queryset(
+                queryset,
+                self.get_serializer_class(),  # type: ignore
+                prefetch=self.stream_prefetch,
+                context=self.get_serializer_context(),  # type: ignore
+            )
+        )
@@ -1,15 +1,18 @@
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.viewsets import ModelViewSet
 
+from .ConditionalGetMixin import ConditionalGetMixin
+from .StreamingListMixin import StreamingListMixin
 from ..filters import TransactionFilterset
 from ..models import Transaction
 from ..serializers import TransactionSerializer
 
 
-class TransactionViewset(ModelViewSet):
+class TransactionViewset(ConditionalGetMixin, StreamingListMixin, ModelViewSet):
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
     filterset_class = TransactionFilterset
+    stream_prefetch = ("tags",)
 
     def get_queryset(self):
         return Transaction.objects.filter(
@@ -173,6 +173,56 @@ REST_FRAMEWORK = {
     "DEFAULT_RENDERER_CLASSES": ["rest_framework.renderers.JSONRenderer"],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
+# Rows serialized at a time by responses requested with the "stream" query parameter
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", 500))
+# Reports are cached in local memory unless REPORT_CACHE_REDIS_URL is set,
+# a Redis server should be configured with a maxmemory-policy of allkeys-lru
+REPORT_CACHE_REDIS_URL = os.getenv("REPORT_CACHE_REDIS_URL")
+REPORT_CACHE_TIMEOUT = int(os.getenv("REPORT_CACHE_TIMEOUT", 60 * 60 * 24))
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "reports": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REPORT_CACHE_REDIS_URL,
+        "TIMEOUT": REPORT_CACHE_TIMEOUT,
+    }
+    if REPORT_CACHE_REDIS_URL
+    else {
+        "BACKEND": "reports.cache.SizeBoundedLocMemCache",
+        "LOCATION": "reports",
+        "TIMEOUT": REPORT_CACHE_TIMEOUT,
+        "OPTIONS": {
+            "MAX_ENTRIES": 1000,
+            "MAX_SIZE": int(os.getenv("REPORT_CACHE_MAX_SIZE", 64 * 1024 * 1024)),
+        },
+    },
+}
+
+# "database" or "numpy", reports can override it with the "backend" query parameter
+REPORT_BACKEND = os.getenv("REPORT_BACKEND", "database")
+# "python" or "numpy", how the predictor samples predicted transactions
+PREDICTION_ENGINE = os.getenv("PREDICTION_ENGINE", "python")
+# "transactions" or "virtual", whether predictions are stored as transactions or
+# synthesized by reports from the stored distribution of the predictor
+PREDICTION_STORAGE = os.getenv("PREDICTION_STORAGE", "transactions")
+# Processes creating the predictions of users in parallel
+PREDICTION_WORKERS = int(os.getenv("PREDICTION_WORKERS", 1))
+# Cron nodes splitting the users between them, each only creates predictions for
+# the users whose id modulo PREDICTION_SHARD_COUNT is its PREDICTION_SHARD_INDEX
+PREDICTION_SHARD_COUNT = int(os.getenv("PREDICTION_SHARD_COUNT", 1))
+PREDICTION_SHARD_INDEX = int(os.getenv("PREDICTION_SHARD_INDEX", 0))
+# Cron jobs running at the same time, each in its own process. 0 runs them one
+# at a time in the process of the command, without timeouts
+CRON_WORKERS = int(os.getenv("CRON_WORKERS", 1))
+# Seconds a cron job may run for in its own process, unless the job sets its
+# own timeout
+CRON_JOB_TIMEOUT = float(os.getenv("CRON_JOB_TIMEOUT", 60 * 60))
+# The monthly income cron job only logs the transactions it would add
+MONTHLY_INCOME_DRY_RUN = os.getenv("MONTHLY_INCOME_DRY_RUN", "FALSE") == "TRUE"
+# "drift" or "calendar", reports can override it with the "time_bucket_alignment"
+# query parameter
+REPORT_TIME_BUCKET_ALIGNMENT = os.getenv("REPORT_TIME_BUCKET_ALIGNMENT", "drift")
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Budget",
     "DESCRIPTION": "Keeping track of finances",
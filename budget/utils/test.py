@@ -3,6 +3,7 @@ from urllib.parse import urlencode
 
 import arrow
 from django.contrib.auth.models import User
+from django.core.cache import caches
 from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
 from rest_framework.test import APITestCase
@@ -24,6 +25,12 @@ class BudgetTestCase(APITestCase):
         cls.user_info = UserInfo.objects.get(user=cls.user)
         cls.budget_root = Budget.objects.get(user=cls.user, name=ROOT_BUDGET_NAME)
 
+    def setUp(self):
+        super().setUp()
+        # Cached values would outlive the test database transaction
+        for cache in caches.all():
+            cache.clear()
+
     def _make_request(
         self, method_name, endpoint, data, encoding="json", query=None, user=None
     ):
@@ -32,7 +39,7 @@ class BudgetTestCase(APITestCase):
         token, _ = Token.objects.get_or_create(user=user or self.user)
 
         if query is not None:
-            endpoint += "?" + urlencode(query)
+            endpoint += "?" + urlencode(query, doseq=True)
 
         return http_method(
             endpoint, data=data, format=encoding, HTTP_AUTHORIZATION=f"Token {token}"
@@ -1,14 +1,25 @@
 import abc
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from enum import Enum
+from graphlib import TopologicalSorter
 from importlib import import_module
 
 import logging
 
+from multiprocessing.connection import wait
+from multiprocessing.process import BaseProcess
 from os import listdir
 from os.path import dirname, basename
-from typing import List
+from typing import Dict, List, NamedTuple, Optional, Tuple
 import re
 
 import arrow
+from django.conf import settings
+from django.db import connections
 from .jobs import daily, monthly
 
 logger = logging.getLogger(__name__)
@@ -21,6 +32,11 @@ class CronJob(abc.ABC):
 
     name: str
     skip: bool = False
+    # Class names of the jobs of the same batch that have to succeed first
+    depends_on: Tuple[str, ...] = ()
+    # Seconds the job may run for when it runs in its own process, defaults to
+    # CRON_JOB_TIMEOUT
+    timeout: Optional[float] = None
 
     def start(self, *args, **kwargs):
         self.run(*args, **kwargs)
@@ -29,6 +45,20 @@ class CronJob(abc.ABC):
         raise NotImplementedError()
 
 
+class JobStatus(Enum):
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    TIMED_OUT = "timed out"
+    # A job it depends on did not succeed
+    SKIPPED = "skipped"
+
+
+class JobResult(NamedTuple):
+    job: CronJob
+    status: JobStatus
+    seconds: float
+
+
 class CronJobRunner:
     _extension = re.compile(r"\.py$")
     batch_map = {
@@ -54,9 +84,192 @@ class CronJobRunner:
         return cron_jobs
 
     @classmethod
-    def execute_jobs(cls, batch="daily"):
+    def execute_jobs(
+        cls, batch="daily", workers: Optional[int] = None
+    ) -> List[JobResult]:
+        """
+        Runs every job of the batch after the jobs it depends on, with up to
+        workers (CRON_WORKERS by default) jobs running at the same time in
+        their own processes, which are killed when they time out. With 0
+        workers the jobs run one at a time in this process, without timeouts.
+        A failed job does not stop the jobs that do not depend on it. Returns
+        the result of each job
+        """
+        jobs = cls._discover_jobs(batch, cls.batch_map[batch])
+        dependencies = cls._get_dependencies(jobs)
+        workers = settings.CRON_WORKERS if workers is None else workers
+
+        if workers > 0:
+            results = cls._run_in_processes(dependencies, workers)
+        else:
+            results = cls._run_in_this_process(dependencies)
+
+        cls._log_summary(results)
+        return results
+
+    @staticmethod
+    def _get_dependencies(jobs: List[CronJob]) -> Dict[CronJob, List[CronJob]]:
+        """
+        The jobs it depends on for each job, ordered so every job comes after
+        its dependencies. Raises ValueError when a job depends on a job that is
+        not in the batch
+        """
+        jobs_by_name = {type(job).__name__: job for job in jobs}
+        for job in jobs:
+            unknown = [name for name in job.depends_on if name not in jobs_by_name]
+            if unknown:
+                raise ValueError(
+                    f'Cron job "{job.name}" depends on unknown jobs: {", ".join(unknown)}'
+                )
+
+        dependencies = {
+            job: [jobs_by_name[name] for name in job.depends_on] for job in jobs
+        }
+        order = TopologicalSorter(dependencies).static_order()
+        return {job: dependencies[job] for job in order}
+
+    @staticmethod
+    def _is_skipped(
+        dependencies: List[CronJob], results: Dict[CronJob, JobResult]
+    ) -> bool:
+        return any(
+            dependency in results and results[dependency].status != JobStatus.SUCCEEDED
+            for dependency in dependencies
+        )
+
+    @classmethod
+    def _run_in_this_process(
+        cls, dependencies: Dict[CronJob, List[CronJob]]
+    ) -> List[JobResult]:
+        results: Dict[CronJob, JobResult] = {}
+        for job, job_dependencies in dependencies.items():
+            if cls._is_skipped(job_dependencies, results):
+                results[job] = JobResult(job, JobStatus.SKIPPED, 0)
+                continue
 
-        for job in cls._discover_jobs(batch, cls.batch_map[batch]):
             logger.info("%s STARTING: %s", arrow.now().isoformat(), job.name)
-            job.start()
-            logger.info("%s COMPLETE: %s", arrow.now().isoformat(), job.name)
+            started = time.monotonic()
+            try:
+                job.start()
+            except Exception:
+                logger.exception("%s FAILED: %s", arrow.now().isoformat(), job.name)
+                status = JobStatus.FAILED
+            else:
+                logger.info("%s COMPLETE: %s", arrow.now().isoformat(), job.name)
+                status = JobStatus.SUCCEEDED
+            results[job] = JobResult(job, status, time.monotonic() - started)
+
+        return list(results.values())
+
+    @classmethod
+    def _run_in_processes(
+        cls, dependencies: Dict[CronJob, List[CronJob]], workers: int
+    ) -> List[JobResult]:
+        results: Dict[CronJob, JobResult] = {}
+        pending = list(dependencies)
+        # Process and start time of each running job
+        running: Dict[CronJob, Tuple[BaseProcess, float]] = {}
+        context = multiprocessing.get_context("fork")
+        # Forked jobs must not share the database connections of this process,
+        # each of them opens its own
+        connections.close_all()
+
+        while pending or running:
+            for job in list(pending):
+                if cls._is_skipped(dependencies[job], results):
+                    results[job] = JobResult(job, JobStatus.SKIPPED, 0)
+                    pending.remove(job)
+                elif len(running) < workers and all(
+                    dependency in results for dependency in dependencies[job]
+                ):
+                    logger.info("%s STARTING: %s", arrow.now().isoformat(), job.name)
+                    # Not a daemon, jobs can start processes of their own
+                    process = context.Process(target=run_job, args=(job,))
+                    process.start()
+                    running[job] = (process, time.monotonic())
+                    pending.remove(job)
+
+            if not running:
+                continue
+
+            next_deadline = min(
+                started + cls._get_timeout(job) for job, (_, started) in running.items()
+            )
+            wait(
+                [process.sentinel for process, _ in running.values()],
+                timeout=max(next_deadline - time.monotonic(), 0),
+            )
+
+            for job, (process, started) in list(running.items()):
+                seconds = time.monotonic() - started
+                if process.exitcode is not None:
+                    status = (
+                        JobStatus.SUCCEEDED
+                        if process.exitcode == 0
+                        else JobStatus.FAILED
+                    )
+                elif seconds >= cls._get_timeout(job):
+                    cls._kill_job_process(process)
+                    status = JobStatus.TIMED_OUT
+                else:
+                    continue
+
+                logger.info(
+                    "%s %s: %s",
+                    arrow.now().isoformat(),
+                    "COMPLETE" if status == JobStatus.SUCCEEDED else status.name,
+                    job.name,
+                )
+                results[job] = JobResult(job, status, seconds)
+                del running[job]
+
+        return [results[job] for job in dependencies]
+
+    @staticmethod
+    def _kill_job_process(process: BaseProcess):
+        """
+        Kills the process of a job together with the processes it started,
+        which share its process group
+        """
+        try:
+            os.killpg(process.pid, signal.SIGKILL)  # type: ignore
+        except ProcessLookupError:
+            # The job has not made its own process group yet
+            process.kill()
+        process.join()
+
+    @staticmethod
+    def _get_timeout(job: CronJob) -> float:
+        return job.timeout or settings.CRON_JOB_TIMEOUT
+
+    @staticmethod
+    def _log_summary(results: List[JobResult]):
+        for result in results:
+            logger.info(
+                "%s %s in %.1fs", result.job.name, result.status.value, result.seconds
+            )
+
+        unsuccessful = [
+            result for result in results if result.status != JobStatus.SUCCEEDED
+        ]
+        if unsuccessful:
+            logger.error(
+                "%s of %s cron jobs did not succeed", len(unsuccessful), len(results)
+            )
+
+
+def run_job(job: CronJob):
+    """
+    Runs a job in the process started for it by CronJobRunner, in a process
+    group of its own so the processes the job starts are stopped with it. The
+    exception of a failed job is logged here, the runner only gets the exit
+    code
+    """
+    os.setpgrp()
+    try:
+        job.start()
+    except Exception:
+        logger.exception("%s ERROR: %s", arrow.now().isoformat(), job.name)
+        sys.exit(1)
+    finally:
+        connections.close_all()
@@ -1,4 +1,4 @@
-from api2.models import Budget
+from api2.utils.budget_stats import update_budget_stats
 from cron.cron import CronJob
 
 
@@ -9,11 +9,12 @@ class CalculateIncomeOutcome(CronJob):
     ----------------
 
     Goes through the last 3 months of transactions for each budget and determines the average income/outcome for
-    that budget
+    that budget, for every budget at once
     """
 
     name = "Calculate Budget Income Outcome"
 
     def run(self, *args, **options):
-        for budget in Budget.objects.all():
-            budget.calculate_income_outcome(save=True, time_period=3)
+        update_budget_stats(
+            fields=("income_per_month", "outcome_per_month"), income_outcome_months=3
+        )
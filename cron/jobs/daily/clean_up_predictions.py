@@ -1,6 +1,7 @@
 import arrow
 
 from api2.models import Transaction
+from api2.utils.bulk_transactions import bulk_delete_transactions
 from cron.cron import CronJob
 
 
@@ -9,4 +10,6 @@ class CleanUpPredictions(CronJob):
 
     def run(self, *args, **kwargs):
         now = arrow.now()
-        Transaction.objects.filter(date__lte=now.datetime, prediction=True).delete()
+        bulk_delete_transactions(
+            Transaction.objects.filter(date__lte=now.datetime, prediction=True)
+        )
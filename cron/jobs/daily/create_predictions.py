@@ -1,51 +1,246 @@
 import logging
+from concurrent.futures import Executor, ProcessPoolExecutor
+
 import arrow
-from api2.models import Transaction, UserInfo
+import django
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q, QuerySet
+from django.db.models.functions import Mod
+
+from api2.models import PredictionDistribution, Transaction, UserInfo
+from api2.utils import data_version
+from api2.utils.bulk_transactions import bulk_delete_transactions
 from cron.cron import CronJob
 from reports.predictor import Predictor
+from reports.types import TimeRange
+from reports.virtual_predictions import (
+    is_virtual_storage,
+    save_prediction_distribution,
+)
 
 logger = logging.getLogger(__name__)
 
 
 class CreatePredictions(CronJob):
+    """
+    Keeps the predictions of every user covering tomorrow until predict_end.
+    They are only created again from scratch when the analyzed data changed,
+    otherwise expired days are trimmed and newly uncovered days appended.
+
+    With virtual prediction storage only the distribution of the predictor is
+    stored, and its window moved along every day.
+
+    Users are spread over PREDICTION_WORKERS processes, and split between
+    PREDICTION_SHARD_COUNT cron nodes by the id of the user
+    """
+
     name = "Create Predictions based on user info"
+    depends_on = ("CleanUpPredictions",)
 
     def run(self, *args, **kwargs):
-        for user_info in UserInfo.objects.all():
-            if not user_info.analyze_start:
-                logger.info(
-                    'Skipping creating predictions for "%s". User missing analyze_start property.',
-                    user_info.user.username,
-                )
-                continue
-
-            user = user_info.user
-            logger.info('Deleting all predictions for "%s"', user.username)
-            Transaction.objects.filter(prediction=True, budget__user=user).delete()
-
-            logger.info(
-                'Analysing trans for "%s" from "%s" to now',
-                user.username,
-                user_info.analyze_start,
-            )
-            user_info.currently_calculating_predictions = True
-            user_info.save()
+        user_info_ids = list(self.get_user_infos().values_list("id", flat=True))
+        if settings.PREDICTION_WORKERS > 1 and len(user_info_ids) > 1:
+            with self.get_executor() as executor:
+                results = list(executor.map(create_user_predictions, user_info_ids))
+        else:
+            results = [
+                create_user_predictions(user_info_id) for user_info_id in user_info_ids
+            ]
 
-            analyze_range = (
-                arrow.get(user_info.analyze_start),
-                arrow.now(),
+        failed = results.count(False)
+        if failed:
+            logger.error(
+                'Creating predictions failed for "%s" of "%s" users',
+                failed,
+                len(results),
             )
-            predict_range = (
-                arrow.now().shift(days=1),
-                arrow.get(user_info.predict_end),
+            # The other users keep their predictions, but the job failed
+            raise RuntimeError(
+                f"Creating predictions failed for {failed} of {len(results)} users"
             )
 
-            predictor = Predictor(user, analyze_range, predict_range)
-            created_predictions = predictor.run()
+    @staticmethod
+    def get_user_infos() -> "QuerySet[UserInfo]":
+        """
+        The users of this shard, when predictions are split between several
+        cron nodes by the id of the user
+        """
+        user_infos = UserInfo.objects.order_by("id")
+        if settings.PREDICTION_SHARD_COUNT > 1:
+            user_infos = user_infos.annotate(
+                shard=Mod("user_id", settings.PREDICTION_SHARD_COUNT)
+            ).filter(shard=settings.PREDICTION_SHARD_INDEX)
+        return user_infos
 
+    @staticmethod
+    def get_executor() -> Executor:
+        # Forked workers must not share the database connections of this
+        # process, each of them opens its own
+        connections.close_all()
+        return ProcessPoolExecutor(
+            max_workers=settings.PREDICTION_WORKERS, initializer=django.setup
+        )
+
+    def create_predictions(self, user_info: UserInfo) -> None:
+        if not user_info.analyze_start:
             logger.info(
-                'Created "%s" predicted transactions for "%s" until "%s"',
-                created_predictions.count(),
-                user.username,
-                user_info.predict_end,
+                'Skipping creating predictions for "%s". User missing analyze_start property.',
+                user_info.user.username,
             )
+            return
+
+        fingerprint = user_info.calculate_prediction_fingerprint()
+        if is_virtual_storage():
+            self.update_prediction_distribution(user_info, fingerprint)
+        elif (
+            fingerprint == user_info.prediction_fingerprint
+            and user_info.predicted_until
+        ):
+            self.roll_predictions(user_info)
+        else:
+            self.recreate_predictions(user_info, fingerprint)
+
+    def recreate_predictions(self, user_info: UserInfo, fingerprint: str) -> None:
+        user = user_info.user
+        logger.info('Deleting all predictions for "%s"', user.username)
+        bulk_delete_transactions(
+            Transaction.objects.filter(prediction=True, budget__user=user)
+        )
+        PredictionDistribution.objects.filter(user=user).delete()
+
+        start = self.get_tomorrow()
+        self.predict(user_info, start, start)
+
+        user_info.prediction_fingerprint = fingerprint
+        user_info.predicted_from = start.date()
+        user_info.save(update_fields=UserInfo.PREDICTION_WINDOW_FIELDS)
+
+    def roll_predictions(self, user_info: UserInfo) -> None:
+        user = user_info.user
+        tomorrow = self.get_tomorrow()
+        predict_end = arrow.get(user_info.predict_end)
+        predictions = Transaction.objects.filter(prediction=True, budget__user=user)
+
+        logger.info(
+            'Trimming predictions for "%s" before "%s" and from "%s"',
+            user.username,
+            tomorrow.date(),
+            predict_end.date(),
+        )
+        bulk_delete_transactions(
+            predictions.filter(
+                Q(date__lt=tomorrow.date()) | Q(date__gte=predict_end.date())
+            )
+        )
+
+        start = max(tomorrow, min(arrow.get(user_info.predicted_until), predict_end))
+        self.predict(user_info, start, arrow.get(user_info.predicted_from))
+        user_info.save(update_fields=["predicted_until"])
+
+    def update_prediction_distribution(
+        self, user_info: UserInfo, fingerprint: str
+    ) -> None:
+        user = user_info.user
+        tomorrow = self.get_tomorrow()
+        end = max(tomorrow, arrow.get(user_info.predict_end))
+        prediction_distribution = PredictionDistribution.objects.filter(
+            user=user
+        ).first()
+
+        if (
+            prediction_distribution is not None
+            and fingerprint == user_info.prediction_fingerprint
+        ):
+            if (prediction_distribution.start, prediction_distribution.end) != (
+                tomorrow.date(),
+                end.date(),
+            ):
+                logger.info('Moving the prediction window of "%s"', user.username)
+                prediction_distribution.start = tomorrow.date()
+                prediction_distribution.end = end.date()
+                prediction_distribution.save()
+            return
+
+        logger.info(
+            'Replacing predictions of "%s" with their distribution', user.username
+        )
+        bulk_delete_transactions(
+            Transaction.objects.filter(prediction=True, budget__user=user)
+        )
+        predictor = Predictor(user, self.get_analyze_range(user_info), (tomorrow, end))
+        save_prediction_distribution(predictor)
+
+        user_info.prediction_fingerprint = fingerprint
+        user_info.predicted_from = tomorrow.date()
+        # No predicted transactions are stored
+        user_info.predicted_until = None
+        user_info.save(update_fields=UserInfo.PREDICTION_WINDOW_FIELDS)
+
+    def predict(
+        self,
+        user_info: UserInfo,
+        start: arrow.Arrow,
+        income_schedule_start: arrow.Arrow,
+    ) -> None:
+        """
+        Predicts the days from start until predict_end and records them as
+        covered in user_info.predicted_until
+        """
+        user = user_info.user
+        predict_end = arrow.get(user_info.predict_end)
+        user_info.predicted_until = max(start, predict_end).date()
+        if start >= predict_end:
+            logger.info('No new days to predict for "%s"', user.username)
+            return
+
+        logger.info(
+            'Analysing trans for "%s" from "%s" to now',
+            user.username,
+            user_info.analyze_start,
+        )
+        predictor = Predictor(
+            user,
+            self.get_analyze_range(user_info),
+            (start, predict_end),
+            income_schedule_start=income_schedule_start,
+        )
+        created_predictions = predictor.run()
+
+        logger.info(
+            'Created "%s" predicted transactions for "%s" from "%s" until "%s"',
+            len(created_predictions),
+            user.username,
+            start.date(),
+            user_info.predict_end,
+        )
+
+    @staticmethod
+    def get_analyze_range(user_info: UserInfo) -> TimeRange:
+        return (
+            arrow.get(user_info.analyze_start),
+            arrow.now(),
+        )
+
+    @staticmethod
+    def get_tomorrow() -> arrow.Arrow:
+        return arrow.get(arrow.now().shift(days=1).date())
+
+
+def create_user_predictions(user_info_id: int) -> bool:
+    """
+    Creates the predictions of one user, in a worker process when run in
+    parallel. Failures are logged and rolled back so the other users still get
+    their predictions, returns whether it succeeded
+    """
+    try:
+        # Deleting, creating and recording the predictions all change the
+        # data of the user, it is marked as changed once
+        with transaction.atomic(), data_version.deferred_bumps():
+            user_info = UserInfo.objects.select_related("user").get(pk=user_info_id)
+            CreatePredictions().create_predictions(user_info)
+    except Exception:
+        logger.exception('Creating predictions failed for user info "%s"', user_info_id)
+        return False
+
+    return True
@@ -1,6 +1,4 @@
-import arrow
-
-from api2.models import Transaction, Budget
+from api2.utils.budget_stats import update_budget_stats
 from cron.cron import CronJob
 
 
@@ -8,10 +6,4 @@ class UpdateBudgetRankings(CronJob):
     name = "Update Budget Frequency Rankings"
 
     def run(self, *args, **kwargs):
-        last_6_months = arrow.now().shift(months=-6).datetime
-
-        for budget in Budget.objects.all():
-            budget.rank = Transaction.objects.filter(
-                prediction=False, budget=budget, date__gte=last_6_months
-            ).count()
-            budget.save()
+        update_budget_stats(fields=("rank",), rank_months=6)
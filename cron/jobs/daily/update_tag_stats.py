@@ -1,11 +1,14 @@
-from typing import Optional
+from typing import Dict, Hashable, Iterable, Tuple
 
 import arrow
-from django.db.models import QuerySet, Count
+from django.db.models import Count, QuerySet
 
-from api2.models import Tag, Transaction, Budget
+from api2.models import Tag, Transaction
+from api2.utils.data_version import bump_data_version
 from cron.cron import CronJob
 
+UPDATE_BATCH_SIZE = 500
+
 
 class UpdateTagStats(CronJob):
     """
@@ -13,45 +16,61 @@ class UpdateTagStats(CronJob):
      - Frequency Ranking: How often this tag is used
      - Most common budget: Most frequent budget used with this tag
      - Most common amount: Most common amounts used with this tag
+
+    Every stat is calculated for all tags at once by grouping the tag links of
+    the last 6 months, and only changed tags are written
     """
 
     name = "Update Tag Stats"
+    depends_on = ("CalculateIncomeOutcome",)
+    fields = ("rank", "common_budget", "common_transaction_amount")
 
     def run(self, *args, **kwargs):
         last_6_months = arrow.now().shift(months=-6).datetime
+        tag_links = Transaction.tags.through.objects.filter(
+            transaction__date__gte=last_6_months, transaction__prediction=False
+        ).order_by()
 
-        for tag in Tag.objects.all():
-            transactions = Transaction.objects.filter(
-                tags=tag, date__gte=last_6_months, prediction=False
-            ).prefetch_related("budgets")
-            tag.rank = self.get_rank(transactions)
-            tag.common_budget = self.get_common_budget(transactions)
-            tag.common_transaction_amount = self.get_common_amount(transactions)
-            tag.save()
+        ranks = dict(
+            tag_links.values("tag")
+            .annotate(count=Count("id"))
+            .values_list("tag", "count")
+        )
+        common_budgets = self.get_most_common(
+            tag_links.filter(transaction__budget__isnull=False), "transaction__budget"
+        )
+        common_amounts = self.get_most_common(tag_links, "transaction__amount")
 
-    @staticmethod
-    def get_rank(transactions: QuerySet[Transaction]) -> int:
-        return transactions.count()
-
-    @staticmethod
-    def get_common_budget(transactions: QuerySet[Transaction]) -> Optional[Budget]:
-        try:
-            most_common_budget_pk = (
-                transactions.values("budget")
-                .annotate(count=Count("pk"))
-                .order_by("-count")[0]["budget"]
+        changed = []
+        for tag in Tag.objects.order_by().only("user", *self.fields):
+            stats = (
+                ranks.get(tag.id, 0),
+                common_budgets.get(tag.id),
+                common_amounts.get(tag.id),
             )
-            return Budget.objects.get(pk=most_common_budget_pk)
-        except IndexError:
-            return None
+            if stats == (tag.rank, tag.common_budget_id, tag.common_transaction_amount):
+                continue
+
+            tag.rank, tag.common_budget_id, tag.common_transaction_amount = stats
+            changed.append(tag)
+
+        Tag.objects.bulk_update(changed, self.fields, batch_size=UPDATE_BATCH_SIZE)
+        # bulk_update does not send the signals that mark the data as changed
+        bump_data_version(tag.user_id for tag in changed)
 
     @staticmethod
-    def get_common_amount(transactions: QuerySet[Transaction]) -> Optional[int]:
-        try:
-            return (
-                transactions.values("amount")
-                .annotate(count=Count("amount"))
-                .order_by("-count")[0]["amount"]
-            )
-        except IndexError:
-            return None
+    def get_most_common(tag_links: QuerySet, field: str) -> Dict[int, Hashable]:
+        """
+        The most common value of the field among the transactions of each tag
+        """
+        counts: Iterable[Tuple[int, Hashable, int]] = (
+            tag_links.values("tag", field)
+            .annotate(count=Count("id"))
+            .values_list("tag", field, "count")
+        )
+        most_common: Dict[int, Tuple[Hashable, int]] = {}
+        for tag_id, value, count in counts:
+            if tag_id not in most_common or count > most_common[tag_id][1]:
+                most_common[tag_id] = (value, count)
+
+        return {tag_id: value for tag_id, (value, _) in most_common.items()}
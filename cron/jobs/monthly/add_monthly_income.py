@@ -1,15 +1,31 @@
-from django.contrib.auth.models import User
+import logging
 
-from api2.utils.add_monthly_income import add_monthly_income
+from django.conf import settings
+
+from api2.utils.add_monthly_income import add_monthly_income_for_users
 from cron.cron import CronJob
 
+logger = logging.getLogger(__name__)
+
 
 class AddMonthlyIncome(CronJob):
 
     name = "Add Monthly Income"
 
-    # Creates an income transaction for each user
+    # Creates the income transactions of every user in bulk, budgets that got
+    # their income this month already are skipped
 
     def run(self, *args, **options):
-        for user in User.objects.all():
-            add_monthly_income(user)
+        dry_run = settings.MONTHLY_INCOME_DRY_RUN
+        created, skipped_user_ids = add_monthly_income_for_users(dry_run=dry_run)
+        logger.info(
+            '%s "%s" monthly income transactions',
+            "Would add" if dry_run else "Added",
+            len(created),
+        )
+        if skipped_user_ids:
+            logger.warning(
+                'Skipped the monthly income of "%s" users without a root budget or income tag: %s',
+                len(skipped_user_ids),
+                skipped_user_ids,
+            )
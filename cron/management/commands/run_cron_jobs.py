@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand, CommandError
 
-from cron.cron import CronJobRunner
+from cron.cron import CronJobRunner, JobStatus
 
 
 class Command(BaseCommand):
@@ -17,4 +17,11 @@ class Command(BaseCommand):
                 f"Invalid batch option, can be {[*CronJobRunner.batch_map.keys()]}"
             )
 
-        CronJobRunner.execute_jobs(batch=options["batch"])
+        results = CronJobRunner.execute_jobs(batch=options["batch"])
+        unsuccessful = [
+            result.job.name
+            for result in results
+            if result.status != JobStatus.SUCCEEDED
+        ]
+        if unsuccessful:
+            raise CommandError(f"Cron jobs did not succeed: {unsuccessful}")
@@ -1,15 +1,19 @@
 import abc
-from typing import Type
+from typing import List, Type
 from unittest.mock import patch
 
 from budget.utils.test import BudgetTestCase
-from cron.cron import CronJob, CronJobRunner
+from cron.cron import CronJob, CronJobRunner, JobResult
 
 
 class CronJobTest(BudgetTestCase, abc.ABC):
     job: Type[CronJob]
 
-    def start(self):
-        jobs = [self.job()]
+    def start(self) -> List[JobResult]:
+        job = self.job()
+        # Run by itself, without the jobs it depends on
+        job.depends_on = ()
+        jobs = [job]
         with patch("cron.cron.CronJobRunner._discover_jobs", return_value=jobs):
-            CronJobRunner.execute_jobs()
+            # In this process, so the job sees the test database
+            return CronJobRunner.execute_jobs(workers=0)
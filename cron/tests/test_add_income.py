@@ -1,23 +1,170 @@
 from unittest.mock import patch
 
-from django.contrib.auth.models import User
+import arrow
+from django.db import IntegrityError, connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 
+from api2.constants import ROOT_BUDGET_NAME, DefaultTags
+from api2.models import Budget, Transaction
+from api2.utils.add_monthly_income import (
+    add_monthly_income,
+    add_monthly_income_for_users,
+    build_monthly_income_transactions,
+    get_monthly_income_transactions,
+)
 from cron.jobs.monthly.add_monthly_income import AddMonthlyIncome
 from cron.tests import CronJobTest
 
 
-MODULE = "cron.jobs.monthly.add_monthly_income"
-
-
 class AddIncomeTestCase(CronJobTest):
     job = AddMonthlyIncome
 
+    def generate_funded_user(self):
+        user = self.generate_user()
+        root = Budget.objects.get(user=user, name=ROOT_BUDGET_NAME)
+        for allocation in (20, 30, 0):
+            self.generate_budget(parent=root, user=user, monthly_allocation=allocation)
+        return user
+
     def test(self):
-        [self.generate_user() for _ in range(5)]
+        users = [self.generate_funded_user() for _ in range(5)]
+
+        self.start()
+
+        for user in users:
+            income = Transaction.objects.filter(
+                budget__user=user,
+                income=True,
+                prediction=False,
+                tags__name=DefaultTags.INCOME,
+            )
+            self.assertEqual(income.count(), 4)
+            self.assertEqual(
+                sorted(income.values_list("amount", flat=True)), [-30, -20, 20, 30]
+            )
+            self.assertEqual(
+                Budget.objects.get(user=user, monthly_allocation=20).balance(), 20
+            )
+
+    def test_same_as_single_user(self):
+        user = self.generate_funded_user()
+        date = arrow.get(2020, 1, 1)
+
+        created, _ = add_monthly_income_for_users(date=date)
+
+        self.assertEqual(
+            [
+                (t.budget_id, t.amount, t.description, t.date)
+                for t, _ in get_monthly_income_transactions(user, date)
+            ],
+            [(t.budget_id, t.amount, t.description, t.date) for t in created],
+        )
+
+    def test_not_added_twice_in_a_month(self):
+        user = self.generate_funded_user()
+        self.start()
+        count = Transaction.objects.count()
+
+        self.start()
+        self.assertEqual(Transaction.objects.count(), count)
+
+        # A budget funded since then still gets its income
+        root = Budget.objects.get(user=user, name=ROOT_BUDGET_NAME)
+        self.generate_budget(parent=root, user=user, monthly_allocation=10)
+        self.assertEqual(len(add_monthly_income_for_users().transactions), 2)
+
+        next_month = arrow.now().shift(months=1)
+        self.assertEqual(
+            len(add_monthly_income_for_users(date=next_month).transactions), 6
+        )
+
+    def test_not_added_twice_when_edited(self):
+        self.generate_funded_user()
+        self.start()
+        count = Transaction.objects.count()
+
+        for transaction in Transaction.objects.all():
+            transaction.description = "Salary"
+            transaction.save()
+
+        self.start()
+        self.assertEqual(Transaction.objects.count(), count)
+
+    def test_unique_per_budget_and_month(self):
+        user = self.generate_funded_user()
+        add_monthly_income(user)
 
-        with patch(f"{MODULE}.add_monthly_income") as mock_add_income:
+        with self.assertRaises(IntegrityError):
+            add_monthly_income(user)
+
+        # Predictions are not limited
+        add_monthly_income(user, prediction=True)
+        add_monthly_income(user, prediction=True)
+
+    def test_added_concurrently(self):
+        user = self.generate_funded_user()
+
+        concurrent_runs = []
+
+        def add_concurrently(*args, **kwargs):
+            rows = build_monthly_income_transactions(*args, **kwargs)
+            if not concurrent_runs:
+                # Another run adds the income between the check and the insert
+                concurrent_runs.append(user)
+                add_monthly_income(user)
+            return rows
+
+        with (
+            patch(
+                "api2.utils.add_monthly_income.build_monthly_income_transactions",
+                side_effect=add_concurrently,
+            ),
+            self.assertLogs("api2.utils.add_monthly_income", "WARNING"),
+        ):
+            created, _ = add_monthly_income_for_users()
+
+        self.assertEqual(
+            Transaction.objects.filter(budget__user=user, income=True).count(), 4
+        )
+        self.assertEqual(len(created), 4)
+
+    def test_dry_run_setting(self):
+        self.generate_funded_user()
+
+        with override_settings(MONTHLY_INCOME_DRY_RUN=True):
             self.start()
 
-        self.assertEqual(mock_add_income.call_count, User.objects.count())
-        for user in User.objects.all():
-            mock_add_income.assert_any_call(user)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_skipped_users(self):
+        funded = self.generate_funded_user()
+        skipped = self.generate_funded_user()
+        Budget.objects.filter(user=skipped, name=ROOT_BUDGET_NAME).delete()
+
+        created, skipped_user_ids = add_monthly_income_for_users()
+
+        self.assertEqual(skipped_user_ids, [skipped.id])
+        self.assertEqual({t.budget.user_id for t in created}, {funded.id})
+
+    def test_dry_run(self):
+        self.generate_funded_user()
+
+        created, _ = add_monthly_income_for_users(dry_run=True)
+
+        self.assertEqual(len(created), 4)
+        self.assertTrue(all(t.pk is None for t in created))
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_query_count_does_not_depend_on_users(self):
+        def count_queries() -> int:
+            Transaction.objects.all().delete()
+            with CaptureQueriesContext(connection) as queries:
+                add_monthly_income_for_users(dry_run=True)
+            return len(queries)
+
+        self.generate_funded_user()
+        query_count = count_queries()
+        for _ in range(5):
+            self.generate_funded_user()
+        self.assertEqual(count_queries(), query_count)
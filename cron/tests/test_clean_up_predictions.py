@@ -1,4 +1,8 @@
 from unittest.mock import patch
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
 from api2.models import Transaction
 from cron.jobs.daily.clean_up_predictions import CleanUpPredictions
 from cron.tests import CronJobTest
@@ -26,3 +30,22 @@ class TestCleanUpPredictions(CronJobTest):
 
         trans = Transaction.objects.all()
         self.assertLengthEqual(trans, len(unaffected_trans))
+
+    def test_query_count_does_not_depend_on_predictions(self):
+        budget = self.generate_budget()
+        self.generate_transaction(budget, prediction=True, date=self.now.shift(days=5))
+
+        def count_queries(predictions: int) -> int:
+            for day in range(predictions):
+                self.generate_transaction(
+                    budget, prediction=True, date=self.now.shift(days=-day)
+                )
+            with (
+                patch(f"{MODULE}.arrow.now", return_value=self.now),
+                CaptureQueriesContext(connection) as queries,
+            ):
+                self.start()
+            return len(queries)
+
+        self.assertEqual(count_queries(2), count_queries(30))
+        self.assertEqual(Transaction.objects.count(), 1)
@@ -1,9 +1,14 @@
+from typing import List, Set
 from unittest.mock import patch
 
 import arrow
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 
-from api2.models import Transaction, UserInfo
+from api2.models import PredictionDistribution, Transaction, UserInfo
+from cron.cron import JobStatus
 from cron.jobs.daily.create_predictions import CreatePredictions
 from cron.tests import CronJobTest
 
@@ -18,7 +23,7 @@ class TestCreatePredictions(CronJobTest):
         super().setUp()
         self.budget = self.generate_budget()
         self.user_info.analyze_start = arrow.now().shift(months=-6).date()
-        self.user_info.predict_end = arrow.now().shift(months=-6).date()
+        self.user_info.predict_end = arrow.now().shift(months=6).date()
         self.user_info.save()
 
     def test_start(self):
@@ -51,3 +56,261 @@ class TestCreatePredictions(CronJobTest):
         self.start()
 
         self.assertEqual(Transaction.objects.filter(prediction=True).count(), 0)
+
+    def run_counting_predictors(self) -> int:
+        with patch(f"{PREDICTIONS_MODULE}.run", return_value=[]) as mock_run:
+            self.start()
+        return mock_run.call_count
+
+    def test_skip_unchanged_users(self):
+        self.generate_transaction(self.budget, date=arrow.now().shift(days=-1))
+
+        self.assertEqual(self.run_counting_predictors(), 1)
+        prediction = self.generate_transaction(
+            self.budget, prediction=True, date=arrow.now().shift(days=2)
+        )
+        self.assertEqual(self.run_counting_predictors(), 0)
+        # The predictions of skipped users are kept
+        prediction.refresh_from_db()
+
+    def test_recreate_query_count_does_not_depend_on_predictions(self):
+        self.generate_transaction(self.budget, date=arrow.now().shift(days=-1))
+
+        def count_queries(predictions: int) -> int:
+            for day in range(predictions):
+                self.generate_transaction(
+                    self.budget, prediction=True, date=arrow.now().shift(days=day + 1)
+                )
+            # Forces the predictions to be created again
+            UserInfo.objects.update(prediction_fingerprint=None)
+            with (
+                patch(f"{PREDICTIONS_MODULE}.run", return_value=[]),
+                CaptureQueriesContext(connection) as queries,
+            ):
+                self.start()
+            self.assertFalse(Transaction.objects.filter(prediction=True).exists())
+            return len(queries)
+
+        self.assertEqual(count_queries(2), count_queries(30))
+
+    def test_recreate_after_changes(self):
+        trans = self.generate_transaction(
+            self.budget, date=arrow.now().shift(days=-1), tags=[]
+        )
+        self.assertEqual(self.run_counting_predictors(), 1)
+
+        def assertRecreatedOnce():
+            self.assertEqual(self.run_counting_predictors(), 1)
+            self.assertEqual(self.run_counting_predictors(), 0)
+
+        trans.amount += 1
+        trans.save()
+        assertRecreatedOnce()
+
+        trans.tags.add(self.generate_tag())
+        assertRecreatedOnce()
+
+        trans.tags.set([self.generate_tag()])
+        assertRecreatedOnce()
+
+        self.generate_transaction(self.budget, date=arrow.now())
+        assertRecreatedOnce()
+
+        self.budget.monthly_allocation += 1
+        self.budget.save()
+        assertRecreatedOnce()
+
+        user_info = UserInfo.objects.get(user=self.user)
+        user_info.expected_monthly_net_income += 1
+        user_info.save()
+        assertRecreatedOnce()
+
+    def test_fingerprint_changes_when_a_tag_is_swapped(self):
+        tags = [self.generate_tag(), self.generate_tag()]
+        first = self.generate_transaction(
+            self.budget, date=arrow.now().shift(days=-1), tags=tags[:1]
+        )
+        second = self.generate_transaction(
+            self.budget, date=arrow.now().shift(days=-1), tags=tags[1:]
+        )
+        fingerprint = self.user_info.calculate_prediction_fingerprint()
+
+        first.tags.set(tags[1:])
+        second.tags.set(tags[:1])
+
+        self.assertNotEqual(
+            self.user_info.calculate_prediction_fingerprint(), fingerprint
+        )
+
+    def test_roll_window(self):
+        self.assertEqual(self.run_counting_predictors(), 1)
+        user_info = UserInfo.objects.get(user=self.user)
+        tomorrow = arrow.get(arrow.now().shift(days=1).date())
+        predict_end = arrow.get(user_info.predict_end)
+        self.assertEqual(user_info.predicted_from, tomorrow.date())
+        self.assertEqual(user_info.predicted_until, predict_end.date())
+
+        expired = self.generate_transaction(self.budget, prediction=True, date=tomorrow)
+        kept = self.generate_transaction(
+            self.budget, prediction=True, date=tomorrow.shift(days=1)
+        )
+        user_info.predict_end = predict_end.shift(days=3).date()
+        user_info.save()
+
+        with (
+            patch(f"{MODULE}.arrow.now", return_value=arrow.now().shift(days=1)),
+            patch(f"{MODULE}.Predictor") as mock_predictor,
+        ):
+            self.start()
+
+        # Only the days added to the end are predicted, keeping the income schedule
+        mock_predictor.assert_called_once()
+        _, _, prediction_range = mock_predictor.call_args.args
+        self.assertEqual(prediction_range, (predict_end, predict_end.shift(days=3)))
+        self.assertEqual(
+            mock_predictor.call_args.kwargs["income_schedule_start"], tomorrow
+        )
+
+        with self.assertRaises(Transaction.DoesNotExist):
+            expired.refresh_from_db()
+        kept.refresh_from_db()
+
+        user_info.refresh_from_db()
+        self.assertEqual(user_info.predicted_from, tomorrow.date())
+        self.assertEqual(user_info.predicted_until, predict_end.shift(days=3).date())
+
+    def test_trim_query_count_does_not_depend_on_predictions(self):
+        self.assertEqual(self.run_counting_predictors(), 1)
+        predict_end = arrow.get(UserInfo.objects.get(user=self.user).predict_end)
+
+        def count_queries(predictions: int) -> int:
+            for day in range(predictions):
+                self.generate_transaction(
+                    self.budget, prediction=True, date=predict_end.shift(days=day)
+                )
+            with (
+                patch(f"{MODULE}.Predictor") as mock_predictor,
+                CaptureQueriesContext(connection) as queries,
+            ):
+                self.start()
+            mock_predictor.assert_not_called()
+            self.assertFalse(
+                Transaction.objects.filter(
+                    prediction=True, date__gte=predict_end.date()
+                ).exists()
+            )
+            return len(queries)
+
+        self.assertEqual(count_queries(2), count_queries(30))
+
+    def test_trim_window_end(self):
+        self.assertEqual(self.run_counting_predictors(), 1)
+        user_info = UserInfo.objects.get(user=self.user)
+        predict_end = arrow.get(user_info.predict_end)
+        kept = self.generate_transaction(
+            self.budget, prediction=True, date=predict_end.shift(days=-2)
+        )
+        trimmed = self.generate_transaction(
+            self.budget, prediction=True, date=predict_end.shift(days=-1)
+        )
+
+        user_info.predict_end = predict_end.shift(days=-1).date()
+        user_info.save()
+        self.assertEqual(self.run_counting_predictors(), 0)
+
+        kept.refresh_from_db()
+        with self.assertRaises(Transaction.DoesNotExist):
+            trimmed.refresh_from_db()
+        user_info.refresh_from_db()
+        self.assertEqual(user_info.predicted_until, user_info.predict_end)
+
+    @override_settings(PREDICTION_STORAGE="virtual")
+    def test_virtual_storage(self):
+        existing_prediction = self.generate_transaction(self.budget, prediction=True)
+        self.generate_transaction(
+            self.budget, date=arrow.now().shift(days=-1), tags=[self.generate_tag()]
+        )
+        self.start()
+
+        with self.assertRaises(Transaction.DoesNotExist):
+            existing_prediction.refresh_from_db()
+        self.assertFalse(Transaction.objects.filter(prediction=True).exists())
+
+        tomorrow = arrow.get(arrow.now().shift(days=1).date())
+        prediction_distribution = PredictionDistribution.objects.get(user=self.user)
+        self.assertEqual(prediction_distribution.start, tomorrow.date())
+        self.assertEqual(prediction_distribution.end, self.user_info.predict_end)
+
+        # Only the window moves when nothing changed
+        with patch(f"{MODULE}.arrow.now", return_value=arrow.now().shift(days=1)):
+            self.start()
+        moved = PredictionDistribution.objects.get(user=self.user)
+        self.assertEqual(moved.start, tomorrow.shift(days=1).date())
+        self.assertEqual(moved.seed, prediction_distribution.seed)
+        self.assertEqual(moved.schedule_start, tomorrow.date())
+
+        # Switching back creates predicted transactions again
+        with override_settings(PREDICTION_STORAGE="transactions"):
+            self.start()
+        self.assertTrue(Transaction.objects.filter(prediction=True).exists())
+        self.assertFalse(PredictionDistribution.objects.exists())
+
+    def generate_users_with_analyze_start(self, count: int) -> List[UserInfo]:
+        user_infos = [self.user_info]
+        for _ in range(count - 1):
+            user_info = UserInfo.objects.get(user=self.generate_user())
+            user_info.analyze_start = self.user_info.analyze_start
+            user_info.predict_end = self.user_info.predict_end
+            user_info.save()
+            user_infos.append(user_info)
+        return user_infos
+
+    def get_predicted_users(self) -> Set[int]:
+        return set(
+            UserInfo.objects.filter(prediction_fingerprint__isnull=False).values_list(
+                "user_id", flat=True
+            )
+        )
+
+    def test_shards(self):
+        user_infos = self.generate_users_with_analyze_start(4)
+
+        for index in range(2):
+            with override_settings(
+                PREDICTION_SHARD_COUNT=2, PREDICTION_SHARD_INDEX=index
+            ):
+                self.run_counting_predictors()
+            self.assertEqual(
+                self.get_predicted_users(),
+                {
+                    user_info.user_id
+                    for user_info in user_infos
+                    if user_info.user_id % 2 <= index
+                },
+            )
+
+    def test_failures_are_isolated(self):
+        user_infos = self.generate_users_with_analyze_start(2)
+        existing_prediction = self.generate_transaction(self.budget, prediction=True)
+
+        with patch(f"{PREDICTIONS_MODULE}.run", side_effect=[Exception("failed"), []]):
+            [result] = self.start()
+
+        self.assertEqual(result.status, JobStatus.FAILED)
+        # The failed user is rolled back
+        self.assertEqual(self.get_predicted_users(), {user_infos[1].user_id})
+        existing_prediction.refresh_from_db()
+
+    def test_workers(self):
+        self.generate_users_with_analyze_start(3)
+
+        with (
+            override_settings(PREDICTION_WORKERS=2),
+            patch(f"{MODULE}.CreatePredictions.get_executor") as get_executor,
+        ):
+            # Runs the workers in this process
+            get_executor.return_value.__enter__.return_value.map = map
+            self.run_counting_predictors()
+
+        get_executor.assert_called_once()
+        self.assertEqual(len(self.get_predicted_users()), 3)
@@ -1,11 +1,80 @@
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from typing import List
 from unittest.mock import patch, MagicMock
 
 from django.core.management import CommandError
 
 from budget.utils.test import BudgetTestCase
-from cron.cron import CronJobRunner
+from cron.cron import CronJob, CronJobRunner, JobStatus
 from cron.management.commands.run_cron_jobs import Command as RunCronJobCommand
 
+# Names of the jobs run in this process
+ran_jobs: List[str] = []
+
+
+class First(CronJob):
+    name = "first"
+
+    def run(self, *args, **kwargs):
+        ran_jobs.append(self.name)
+
+
+class Second(First):
+    name = "second"
+    depends_on = ("First",)
+
+
+class Failing(CronJob):
+    name = "failing"
+
+    def run(self, *args, **kwargs):
+        raise Exception("failed")
+
+
+class AfterFailing(First):
+    name = "after failing"
+    depends_on = ("Failing", "First")
+
+
+class Slow(CronJob):
+    name = "slow"
+    timeout = 0.5
+
+    def run(self, *args, **kwargs):
+        time.sleep(60)
+
+
+def keep_writing(path: str):
+    # Stops by itself after 10 seconds in case it is not killed
+    for _ in range(200):
+        with open(path, "a") as f:
+            f.write(".")
+        time.sleep(0.05)
+
+
+class SlowWithWorker(Slow):
+    """
+    Starts a worker process of its own, like CreatePredictions can
+    """
+
+    name = "slow with worker"
+    path = os.path.join(tempfile.gettempdir(), f"cron-worker-{os.getpid()}")
+
+    def run(self, *args, **kwargs):
+        multiprocessing.get_context("fork").Process(
+            target=keep_writing, args=(self.path,)
+        ).start()
+        super().run(*args, **kwargs)
+
+
+class AfterSlow(First):
+    name = "after slow"
+    depends_on = ("Slow",)
+
 
 class Test(BudgetTestCase):
     def test_invalid_batch_value(self):
@@ -41,7 +110,108 @@ class Test(BudgetTestCase):
     def test_execute_cron_jobs(self):
         jobs = [MagicMock(), MagicMock()]
         with patch("cron.cron.CronJobRunner._discover_jobs", return_value=jobs):
-            CronJobRunner.execute_jobs()
+            CronJobRunner.execute_jobs(workers=0)
 
         for job in jobs:
             job.start.assert_called_once()
+
+    def execute_jobs(self, jobs: List[CronJob], workers=0):
+        ran_jobs.clear()
+        with patch("cron.cron.CronJobRunner._discover_jobs", return_value=jobs):
+            results = CronJobRunner.execute_jobs(workers=workers)
+        return {result.job.name: result.status for result in results}
+
+    def test_dependencies_run_first(self):
+        results = self.execute_jobs([Second(), First()])
+
+        self.assertEqual(ran_jobs, ["first", "second"])
+        self.assertEqual(
+            results, {"first": JobStatus.SUCCEEDED, "second": JobStatus.SUCCEEDED}
+        )
+
+    def test_unknown_dependencies(self):
+        with self.assertRaisesRegex(ValueError, "First"):
+            self.execute_jobs([Second()])
+        self.assertEqual(ran_jobs, [])
+
+    def test_continue_after_failures(self):
+        results = self.execute_jobs([AfterFailing(), Failing(), First()])
+
+        self.assertEqual(ran_jobs, ["first"])
+        self.assertEqual(
+            results,
+            {
+                "first": JobStatus.SUCCEEDED,
+                "failing": JobStatus.FAILED,
+                "after failing": JobStatus.SKIPPED,
+            },
+        )
+
+    def test_parallel(self):
+        jobs = [AfterSlow(), Slow(), AfterFailing(), Failing(), Second(), First()]
+        started = time.monotonic()
+        results = self.execute_jobs(jobs, workers=2)
+
+        self.assertLess(time.monotonic() - started, 30)
+        self.assertEqual(
+            results,
+            {
+                "first": JobStatus.SUCCEEDED,
+                "second": JobStatus.SUCCEEDED,
+                "failing": JobStatus.FAILED,
+                "after failing": JobStatus.SKIPPED,
+                "slow": JobStatus.TIMED_OUT,
+                "after slow": JobStatus.SKIPPED,
+            },
+        )
+        # Jobs ran in their own processes
+        self.assertEqual(ran_jobs, [])
+
+    def test_timeout_with_one_worker(self):
+        results = self.execute_jobs([AfterSlow(), Slow(), First()], workers=1)
+
+        self.assertEqual(
+            results,
+            {
+                "first": JobStatus.SUCCEEDED,
+                "slow": JobStatus.TIMED_OUT,
+                "after slow": JobStatus.SKIPPED,
+            },
+        )
+
+    def test_exceptions_of_job_processes_are_logged(self):
+        with tempfile.NamedTemporaryFile("r") as log:
+            handler = logging.FileHandler(log.name)
+            logging.getLogger("cron.cron").addHandler(handler)
+            self.addCleanup(logging.getLogger("cron.cron").removeHandler, handler)
+            self.addCleanup(handler.close)
+
+            results = self.execute_jobs([Failing()], workers=1)
+            output = log.read()
+
+        self.assertEqual(results, {"failing": JobStatus.FAILED})
+        self.assertIn("ERROR: failing", output)
+        self.assertIn("Traceback", output)
+        self.assertIn('raise Exception("failed")', output)
+
+    def test_timeout_stops_processes_started_by_the_job(self):
+        def remove_output():
+            if os.path.exists(SlowWithWorker.path):
+                os.remove(SlowWithWorker.path)
+
+        self.addCleanup(remove_output)
+
+        results = self.execute_jobs([SlowWithWorker(), First()], workers=2)
+
+        self.assertEqual(results["slow with worker"], JobStatus.TIMED_OUT)
+        written = os.path.getsize(SlowWithWorker.path)
+        self.assertGreater(written, 0)
+        time.sleep(0.3)
+        self.assertEqual(os.path.getsize(SlowWithWorker.path), written)
+
+    def test_command_fails_when_a_job_failed(self):
+        with (
+            patch("cron.cron.CronJobRunner._discover_jobs", return_value=[Failing()]),
+            self.assertRaises(CommandError),
+        ):
+            RunCronJobCommand().handle(batch="daily")
@@ -1,3 +1,7 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api2.models import Tag, UserInfo
 from cron.jobs.daily.update_tag_stats import UpdateTagStats
 from cron.tests import CronJobTest
 
@@ -67,3 +71,47 @@ class UpdateTagRankingsTest(CronJobTest):
         self.start()
         self.tag.refresh_from_db()
         self.assertEqual(self.tag.common_transaction_amount, most_common_amount)
+
+    def test_stats_of_unused_tags_are_reset(self):
+        self.tag.rank = 5
+        self.tag.common_budget = self.budget
+        self.tag.common_transaction_amount = 100
+        self.tag.save()
+
+        self.start()
+
+        self.tag.refresh_from_db()
+        self.assertEqual(self.tag.rank, 0)
+        self.assertIsNone(self.tag.common_budget)
+        self.assertIsNone(self.tag.common_transaction_amount)
+
+    def test_data_version_bumped_for_changed_tags(self):
+        other_user = self.generate_user()
+        self.generate_transaction(self.budget, tags=[self.tag], date=self.now)
+
+        def data_versions():
+            return dict(UserInfo.objects.values_list("user", "data_version"))
+
+        before = data_versions()
+        self.start()
+        after = data_versions()
+
+        self.assertGreater(after[self.user.id], before[self.user.id])
+        self.assertEqual(after[other_user.id], before[other_user.id])
+
+    def test_query_count_does_not_depend_on_tags(self):
+        def count_queries() -> int:
+            Tag.objects.update(rank=0)
+            with CaptureQueriesContext(connection) as queries:
+                self.start()
+            return len(queries)
+
+        self.generate_transaction(self.budget, tags=[self.tag], date=self.now)
+        query_count = count_queries()
+
+        for _ in range(5):
+            tag = self.generate_tag()
+            self.generate_transaction(
+                self.generate_budget(), tags=[tag, self.tag], date=self.now
+            )
+        self.assertEqual(count_queries(), query_count)
@@ -0,0 +1,368 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from functools import reduce
+from itertools import accumulate
+from operator import or_
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import arrow
+
+from django.db.models import (
+    Aggregate,
+    Case,
+    Expression,
+    F,
+    IntegerField,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+
+from reports.time_buckets import get_date_range
+from reports.types import NativeTimeRange, TimeRange
+
+Series = List[int]
+GroupKey = Tuple[Hashable, ...]
+BucketIndexer = Callable[[Any], Optional[int]]
+
+BUCKET = "bucket"
+
+
+def is_one_day_buckets(time_buckets: List[TimeRange]) -> bool:
+    return all(start.date() == end.date() for start, end in time_buckets)
+
+
+def get_bucket_expression(
+    time_buckets: List[TimeRange],
+) -> Tuple[Expression, BucketIndexer]:
+    """
+    Returns an expression labelling each row with its time bucket, and a function
+    mapping that label to the index of the bucket.
+
+    Single day buckets are labelled with the date itself, anything larger
+    uses a CASE expression that evaluates to the index of the bucket
+    """
+    if is_one_day_buckets(time_buckets):
+        indexes = {start.date(): i for i, (start, _) in enumerate(time_buckets)}
+        return F("date"), indexes.get
+
+    expression = Case(
+        *[
+            When(date__range=get_date_range(time_range), then=Value(i))
+            for i, time_range in enumerate(time_buckets)
+        ],
+        default=None,
+        output_field=IntegerField(),
+    )
+    return expression, lambda index: index
+
+
+def without_distinct(queryset: QuerySet) -> QuerySet:
+    if queryset.query.distinct:
+        # Grouping a DISTINCT query would count rows duplicated by joins
+        return queryset.model.objects.filter(pk__in=queryset.values("pk"))
+    return queryset
+
+
+def aggregate_buckets(
+    queryset: QuerySet,
+    time_buckets: List[TimeRange],
+    aggregates: Dict[str, Aggregate],
+    group_by: Sequence[str] = (),
+) -> Dict[GroupKey, Dict[str, Series]]:
+    """
+    Calculates every aggregate for every time bucket and group in one query.
+
+    Returns {(group values...): {aggregate name: [value for each bucket]}}.
+    Buckets without any rows are 0, groups without any rows are missing
+    """
+    if not time_buckets:
+        return {}
+
+    queryset = without_distinct(queryset)
+    expression, get_bucket_index = get_bucket_expression(time_buckets)
+    rows = (
+        queryset.filter(
+            date__range=(time_buckets[0][0].date(), time_buckets[-1][1].date())
+        )
+        .order_by()
+        .values(*group_by, **{BUCKET: expression})
+        .annotate(**aggregates)
+    )
+
+    results: Dict[GroupKey, Dict[str, Series]] = {}
+    for row in rows:
+        bucket_index = get_bucket_index(row[BUCKET])
+        if bucket_index is None:
+            continue
+
+        key = tuple(row[field] for field in group_by)
+        if key not in results:
+            results[key] = {name: empty_series(time_buckets) for name in aggregates}
+
+        for name in aggregates:
+            results[key][name][bucket_index] += row[name] or 0
+
+    return results
+
+
+def next_month(day: date) -> date:
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def split_into_months(
+    time_buckets: List[TimeRange],
+) -> Tuple[Dict[date, int], List[Tuple[int, NativeTimeRange]]]:
+    """
+    Splits each time bucket into the calendar months it fully covers and the
+    partial months at its edges.
+
+    Returns ({first day of month: bucket index}, [(bucket index, edge range)])
+    """
+    months: Dict[date, int] = {}
+    edges: List[Tuple[int, NativeTimeRange]] = []
+    for i, time_range in enumerate(time_buckets):
+        start, end = get_date_range(time_range)
+        first_month = month = start if start.day == 1 else next_month(start)
+        while next_month(month) - timedelta(days=1) <= end:
+            months[month] = i
+            month = next_month(month)
+
+        if month == first_month:
+            edges.append((i, (start, end)))
+            continue
+        if start < first_month:
+            edges.append((i, (start, first_month - timedelta(days=1))))
+        if month <= end:
+            edges.append((i, (month, end)))
+
+    return months, edges
+
+
+def rollup_bucket_series(
+    queryset: QuerySet,
+    rollups: QuerySet,
+    time_buckets: List[TimeRange],
+    aggregate: Aggregate,
+    rollup_aggregate: Aggregate,
+    group_by: Sequence[str] = (),
+    rollup_group_by: Optional[Sequence[str]] = None,
+) -> Dict[GroupKey, Series]:
+    """
+    Same as aggregate_buckets for one aggregate, except that calendar months
+    fully inside a bucket are read from the MonthlyRollup rows and only the
+    partial months at the edges of buckets from the transactions.
+
+    rollup_aggregate and rollup_group_by are the equivalent of aggregate and
+    group_by for MonthlyRollup rows
+    """
+    if rollup_group_by is None:
+        rollup_group_by = group_by
+
+    months, edges = split_into_months(time_buckets)
+    if not months:
+        return {
+            key: result["value"]
+            for key, result in aggregate_buckets(
+                queryset, time_buckets, {"value": aggregate}, group_by
+            ).items()
+        }
+
+    results: Dict[GroupKey, Series] = {}
+
+    def add(key: GroupKey, bucket_index: int, value: Optional[int]):
+        if key not in results:
+            results[key] = empty_series(time_buckets)
+        results[key][bucket_index] += value or 0
+
+    rows = (
+        rollups.filter(month__in=list(months))
+        .order_by()
+        .values(*rollup_group_by, "month")
+        .annotate(value=rollup_aggregate)
+    )
+    for row in rows:
+        add(
+            tuple(row[field] for field in rollup_group_by),
+            months[row["month"]],
+            row["value"],
+        )
+
+    if edges:
+        edge_filter = reduce(or_, [Q(date__range=edge) for _, edge in edges])
+        edge_results = aggregate_buckets(
+            queryset.filter(edge_filter),
+            [(arrow.get(start), arrow.get(end)) for _, (start, end) in edges],
+            {"value": aggregate},
+            group_by,
+        )
+        for key, result in edge_results.items():
+            for edge_index, value in enumerate(result["value"]):
+                add(key, edges[edge_index][0], value)
+
+    return results
+
+
+def empty_series(time_buckets: List[TimeRange]) -> Series:
+    return [0] * len(time_buckets)
+
+
+def bucket_series(
+    queryset: QuerySet, time_buckets: List[TimeRange], aggregate: Aggregate
+) -> Series:
+    results = aggregate_buckets(queryset, time_buckets, {"value": aggregate})
+    return results[()]["value"] if results else empty_series(time_buckets)
+
+
+def cumulative_series(opening_balance: int, deltas: Series) -> Series:
+    return list(accumulate(deltas, initial=opening_balance))[1:]
+
+
+def opening_balances(
+    queryset: QuerySet, time_buckets: List[TimeRange], group_by: Sequence[str] = ()
+) -> Dict[GroupKey, int]:
+    """
+    Sum of every amount before the first time bucket for each group
+    """
+    if not time_buckets:
+        return {}
+
+    queryset = without_distinct(queryset).filter(date__lt=time_buckets[0][0].date())
+    if not group_by:
+        total = queryset.aggregate(total=Sum("amount"))["total"]
+        return {} if total is None else {(): total}
+
+    rows = queryset.order_by().values(*group_by).annotate(total=Sum("amount"))
+    return {tuple(row[field] for field in group_by): row["total"] or 0 for row in rows}
+
+
+def grouped_balance_series(
+    queryset: QuerySet, time_buckets: List[TimeRange], group_by: Sequence[str] = ()
+) -> Dict[GroupKey, Series]:
+    """
+    Balance at the end of each time bucket for each group, calculated as the
+    opening balance plus a running sum of the change in each bucket rather than
+    summing all history again for every bucket.
+
+    Groups without any rows are missing
+    """
+    openings = opening_balances(queryset, time_buckets, group_by)
+    deltas = aggregate_buckets(
+        queryset, time_buckets, {"value": Sum("amount")}, group_by
+    )
+
+    return {
+        key: cumulative_series(
+            openings.get(key, 0),
+            deltas[key]["value"] if key in deltas else empty_series(time_buckets),
+        )
+        for key in set(openings) | set(deltas)
+    }
+
+
+def balance_series(queryset: QuerySet, time_buckets: List[TimeRange]) -> Series:
+    return grouped_balance_series(queryset, time_buckets).get(
+        (), empty_series(time_buckets)
+    )
+
+
+def add_series(time_buckets: List[TimeRange], *series: Series) -> Series:
+    return [sum(values) for values in zip(empty_series(time_buckets), *series)]
+
+
+def add_report_data(data: Any, other: Any) -> Any:
+    """
+    Adds two reports of the same kind together, series by series
+    """
+    if isinstance(data, dict):
+        return {key: add_report_data(value, other[key]) for key, value in data.items()}
+
+    return [value + other_value for value, other_value in zip(data, other)]
+
+
+def roll_up_series(
+    series: Dict[int, Series],
+    parents: Dict[int, Optional[int]],
+    time_buckets: List[TimeRange],
+) -> Dict[int, Series]:
+    """
+    Adds the series of every budget to the budgets above it. Children are
+    visited before their parents, so each budget is added to its parent once
+    with the totals of its whole subtree.
+
+    parents maps every budget of the tree to its parent, parents outside of
+    the tree are ignored
+    """
+    depths: Dict[int, int] = {}
+    for budget_id in parents:
+        path = []
+        node_id: Optional[int] = budget_id
+        while node_id in parents and node_id not in depths and node_id not in path:
+            path.append(node_id)
+            node_id = parents[node_id]  # type: ignore
+        depth = depths.get(node_id, -1)  # type: ignore
+        for node_id in reversed(path):
+            depth += 1
+            depths[node_id] = depth
+
+    totals = {
+        budget_id: list(series.get(budget_id, empty_series(time_buckets)))
+        for budget_id in parents
+    }
+    for budget_id in sorted(parents, key=depths.__getitem__, reverse=True):
+        parent_id = parents[budget_id]
+        if parent_id in totals:
+            totals[parent_id] = add_series(
+                time_buckets, totals[parent_id], totals[budget_id]  # type: ignore
+            )
+
+    return totals
+
+
+def snapshot_balance_series(
+    snapshots: QuerySet, time_buckets: List[TimeRange], group_by: Sequence[str] = ()
+) -> Dict[GroupKey, Series]:
+    """
+    Balance at the end of each time bucket read from DailyBalanceSnapshot rows.
+    The opening balance is the latest closing balance before the first bucket
+    of each (budget, prediction) pair, so no transactions are read at all.
+
+    Returns {(group values...): [balance for each bucket]}, groups without any
+    snapshots are missing
+    """
+    if not time_buckets:
+        return {}
+
+    start = time_buckets[0][0].date()
+    latest_date_before_start = (
+        snapshots.model.objects.filter(
+            budget=OuterRef("budget"),
+            prediction=OuterRef("prediction"),
+            date__lt=start,
+        )
+        .order_by("-date")
+        .values("date")[:1]
+    )
+
+    opening_balances: Dict[GroupKey, int] = defaultdict(int)
+    for row in snapshots.filter(
+        date__lt=start, date=Subquery(latest_date_before_start)
+    ).values(*group_by, "closing_balance"):
+        key = tuple(row[field] for field in group_by)
+        opening_balances[key] += row["closing_balance"]
+
+    deltas = aggregate_buckets(
+        snapshots, time_buckets, {"change": Sum("delta")}, group_by
+    )
+
+    return {
+        key: cumulative_series(
+            opening_balances[key],
+            deltas[key]["change"] if key in deltas else empty_series(time_buckets),
+        )
+        for key in set(opening_balances) | set(deltas)
+    }
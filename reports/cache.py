@@ -0,0 +1,73 @@
+import hashlib
+import json
+from typing import Optional
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import QueryDict
+from django_prometheus.conf import NAMESPACE
+from prometheus_client import Counter
+
+REPORT_CACHE = "reports"
+
+# Query parameters that do not change the report
+IGNORED_QUERY_PARAMS = {"backend", "stream"}
+
+report_cache_lookups = Counter(
+    "report_cache_lookups_total",
+    "Report cache lookups by report and result",
+    ["report", "result"],
+    namespace=NAMESPACE,
+)
+
+
+class SizeBoundedLocMemCache(LocMemCache):
+    """
+    Local memory cache that also evicts the least recently used entries while
+    the pickled values take up more than OPTIONS["MAX_SIZE"] bytes
+    """
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self._max_size = params.get("OPTIONS", {}).get("MAX_SIZE")
+
+    def _set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        super()._set(key, value, timeout)
+        if not self._max_size:
+            return
+
+        # Entries are kept most recently used first
+        size = sum(len(pickled) for pickled in self._cache.values())
+        while size > self._max_size and self._cache:
+            old_key, pickled = self._cache.popitem()
+            del self._expire_info[old_key]
+            size -= len(pickled)
+
+
+def get_report_cache_key(
+    user_id: int, report: str, query_params: QueryDict, data_version: int
+) -> str:
+    """
+    The order of query parameters and their values does not matter, and the
+    key changes whenever the data of the user does
+    """
+    params = sorted(
+        (name, sorted(values))
+        for name, values in query_params.lists()
+        if name not in IGNORED_QUERY_PARAMS
+    )
+    digest = hashlib.sha256(json.dumps(params).encode()).hexdigest()
+    return f"report:{user_id}:{data_version}:{report}:{digest}"
+
+
+def get_cached_report(key: str, report: str) -> Optional[dict]:
+    cached = caches[REPORT_CACHE].get(key)
+    report_cache_lookups.labels(
+        report=report, result="miss" if cached is None else "hit"
+    ).inc()
+    return cached
+
+
+def cache_report(key: str, data: dict):
+    caches[REPORT_CACHE].set(key, data)
@@ -0,0 +1,227 @@
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from django.db.models import QuerySet
+
+from api2.models import Transaction
+from reports.types import TimeRange
+
+Series = List[int]
+Mask = Optional[np.ndarray]
+# Values of LEDGER_FIELDS
+LedgerRow = Tuple[int, date, int, Optional[int], bool, bool, bool]
+
+LEDGER_FIELDS = (
+    "id",
+    "date",
+    "amount",
+    "budget_id",
+    "income",
+    "transfer",
+    "prediction",
+)
+
+
+class ColumnarLedger:
+    """
+    The transactions of a report loaded into NumPy arrays with one query, so
+    every series of the report is calculated in memory instead of with a query
+    per budget or tag.
+
+    Each transaction is labelled with the index of its time bucket, -1 when it
+    is before the first bucket. Those are only loaded when include_history is
+    set, for reports that need an opening balance
+    """
+
+    def __init__(
+        self,
+        queryset: Optional[QuerySet[Transaction]],
+        time_buckets: List[TimeRange],
+        include_history: bool = False,
+    ):
+        self.time_buckets = time_buckets
+        self.num_buckets = len(time_buckets)
+        self._tags: Optional[np.ndarray] = None
+
+        rows: list = []
+        if time_buckets and queryset is not None:
+            queryset = queryset.filter(date__lte=time_buckets[-1][1].date())
+            if not include_history:
+                queryset = queryset.filter(date__gte=time_buckets[0][0].date())
+            rows = list(queryset.order_by("id").values_list(*LEDGER_FIELDS))
+        self.queryset = queryset
+        self.load_rows(rows)
+
+    @classmethod
+    def from_rows(
+        cls,
+        rows: List[LedgerRow],
+        tags: List[Tuple[int, int]],
+        time_buckets: List[TimeRange],
+    ) -> "ColumnarLedger":
+        """
+        Ledger of transactions that are not in the database, such as
+        synthesized predictions. Rows are ordered by id and tags are
+        (row index, tag id) pairs. Rows before the time buckets are always
+        kept, so balances can be calculated
+        """
+        ledger = cls(None, time_buckets)
+        # Index of each kept row in the ledger
+        indexes: Dict[int, int] = {}
+        if time_buckets:
+            last_day = time_buckets[-1][1].date()
+            for index, row in enumerate(rows):
+                if row[1] <= last_day:
+                    indexes[index] = len(indexes)
+
+        ledger.load_rows([rows[index] for index in indexes])
+        ledger._tags = np.array(
+            [(indexes[row], tag_id) for row, tag_id in tags if row in indexes],
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        return ledger
+
+    def load_rows(self, rows: List[LedgerRow]):
+        columns = list(zip(*rows)) or [()] * len(LEDGER_FIELDS)
+        self.id = np.array(columns[0], dtype=np.int64)
+        self.amount = np.array(columns[2], dtype=np.int64)
+        self.budget_id = np.array(
+            [-1 if budget_id is None else budget_id for budget_id in columns[3]],
+            dtype=np.int64,
+        )
+        self.income = np.array(columns[4], dtype=bool)
+        self.transfer = np.array(columns[5], dtype=bool)
+        self.prediction = np.array(columns[6], dtype=bool)
+        self.bucket = self.get_bucket_indexes(
+            np.array([day.toordinal() for day in columns[1]], dtype=np.int64),
+            self.time_buckets,
+        )
+
+    @staticmethod
+    def get_bucket_indexes(
+        ordinals: np.ndarray, time_buckets: List[TimeRange]
+    ) -> np.ndarray:
+        if not time_buckets:
+            return np.zeros(len(ordinals), dtype=np.int64)
+
+        starts = np.array([start.date().toordinal() for start, _ in time_buckets])
+        return np.searchsorted(starts, ordinals, side="right") - 1
+
+    def select(self, mask: Mask) -> np.ndarray:
+        in_range = self.bucket >= 0
+        return in_range if mask is None else in_range & mask
+
+    def grouped_sums(
+        self,
+        groups: np.ndarray,
+        num_groups: int,
+        weights: np.ndarray,
+        selected: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Sums the weights into a (num_groups, num_buckets) matrix
+        """
+        cells = groups[selected] * self.num_buckets + self.bucket[selected]
+        sums = np.bincount(
+            cells, weights=weights[selected], minlength=num_groups * self.num_buckets
+        )
+        return np.rint(sums).astype(np.int64).reshape(num_groups, self.num_buckets)
+
+    def sum_series(self, mask: Mask = None) -> Series:
+        selected = self.select(mask)
+        groups = np.zeros(len(self.amount), dtype=np.int64)
+        return self.grouped_sums(groups, 1, self.amount, selected)[0].tolist()
+
+    def count_series(self, mask: Mask = None) -> Series:
+        selected = self.select(mask)
+        groups = np.zeros(len(self.amount), dtype=np.int64)
+        ones = np.ones(len(self.amount), dtype=np.int64)
+        return self.grouped_sums(groups, 1, ones, selected)[0].tolist()
+
+    def balance_series(self, mask: Mask = None) -> Series:
+        selected = np.ones(len(self.amount), dtype=bool) if mask is None else mask
+        opening_balance = int(self.amount[selected & (self.bucket < 0)].sum())
+        return (opening_balance + np.cumsum(self.sum_series(mask))).tolist()
+
+    def budget_series(
+        self, subtrees: Dict[int, Set[int]], mask: Mask = None, balance=False
+    ) -> Dict[int, Series]:
+        """
+        Sum of each subtree in each bucket, or its balance at the end of each
+        bucket when balance is set
+        """
+        ids = np.array(sorted(set().union(*subtrees.values())), dtype=np.int64)
+        if len(ids) == 0:
+            return {budget_id: [0] * self.num_buckets for budget_id in subtrees}
+
+        positions = np.searchsorted(ids, self.budget_id).clip(max=len(ids) - 1)
+        selected = ids[positions] == self.budget_id
+        if mask is not None:
+            selected &= mask
+
+        sums = self.grouped_sums(
+            positions, len(ids), self.amount, self.select(selected)
+        )
+        if balance:
+            history = selected & (self.bucket < 0)
+            opening_balances = np.rint(
+                np.bincount(
+                    positions[history],
+                    weights=self.amount[history],
+                    minlength=len(ids),
+                )
+            ).astype(np.int64)
+            sums = np.cumsum(sums, axis=1) + opening_balances[:, None]
+
+        return {
+            budget_id: sums[np.searchsorted(ids, sorted(subtree))].sum(axis=0).tolist()
+            for budget_id, subtree in subtrees.items()
+        }
+
+    def load_tags(self) -> np.ndarray:
+        """
+        (transaction row, tag id) pairs for the loaded transactions
+        """
+        if self._tags is None:
+            through_rows = Transaction.tags.through.objects.filter(
+                transaction__in=self.queryset.values("id")
+            ).values_list("transaction_id", "tag_id")
+            pairs = np.array(list(through_rows), dtype=np.int64).reshape(-1, 2)
+            pairs[:, 0] = np.searchsorted(self.id, pairs[:, 0])
+            self._tags = pairs
+
+        return self._tags
+
+    def tag_series(self, tag_ids: Iterable[int], balance=False) -> Dict[int, Series]:
+        """
+        Sum of the transactions with each tag in each bucket, or the balance at
+        the end of each bucket when balance is set
+        """
+        ids = np.array(sorted(set(tag_ids)), dtype=np.int64)
+        pairs = self.load_tags()
+        pairs = pairs[np.isin(pairs[:, 1], ids)]
+        rows, tags = pairs[:, 0], np.searchsorted(ids, pairs[:, 1])
+
+        in_range = self.bucket[rows] >= 0
+        cells = tags[in_range] * self.num_buckets + self.bucket[rows][in_range]
+        sums = np.rint(
+            np.bincount(
+                cells,
+                weights=self.amount[rows][in_range],
+                minlength=len(ids) * self.num_buckets,
+            )
+        ).astype(np.int64)
+        sums = sums.reshape(len(ids), self.num_buckets)
+
+        if balance:
+            opening_balances = np.rint(
+                np.bincount(
+                    tags[~in_range],
+                    weights=self.amount[rows][~in_range],
+                    minlength=len(ids),
+                )
+            ).astype(np.int64)
+            sums = np.cumsum(sums, axis=1) + opening_balances[:, None]
+
+        return {tag_id: sums[i].tolist() for i, tag_id in enumerate(ids.tolist())}
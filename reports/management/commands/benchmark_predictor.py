@@ -0,0 +1,49 @@
+from timeit import timeit
+
+import arrow
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from api2.models import UserInfo
+from reports.predictor import Predictor
+from reports.types import PredictionEngineOption
+
+
+class Command(BaseCommand):
+    help = """
+    Times building the predicted transactions of a user with each prediction
+    engine, without saving them
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=str, required=True, help="Username")
+        parser.add_argument(
+            "--days", type=int, default=365, help="Length of the prediction range"
+        )
+        parser.add_argument(
+            "--number", type=int, default=5, help="Repetitions of each engine"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["user"]}" does not exist')
+
+        now = arrow.now()
+        analyze_start = (
+            UserInfo.objects.get(user=user).analyze_start or now.shift(months=-6).date()
+        )
+        analyze_range = (arrow.get(analyze_start), now)
+        predict_range = (now.shift(days=1), now.shift(days=options["days"]))
+
+        for engine in PredictionEngineOption.values():
+            predictor = Predictor(user, analyze_range, predict_range, engine, seed=0)
+            count = len(predictor._build_transactions())
+            sampling = timeit(predictor._sample_transactions, number=options["number"])
+            building = timeit(predictor._build_transactions, number=options["number"])
+            self.stdout.write(
+                f"{engine:<8} {count:>7} transactions, "
+                f"sampling {sampling / options['number'] * 1000:8.2f} ms, "
+                f"building {building / options['number'] * 1000:8.2f} ms"
+            )
@@ -0,0 +1,79 @@
+from timeit import timeit
+from typing import List
+
+import arrow
+from django.core.management.base import BaseCommand
+
+from reports.time_buckets import get_date_range, get_report_dates, get_time_buckets
+from reports.types import TimeBucketAlignmentOption, TimeBucketSizeOption, TimeRange
+
+
+def shift_time_buckets(
+    start_date: arrow.Arrow, end_date: arrow.Arrow, day_delta: int
+) -> List[TimeRange]:
+    """
+    The previous implementation of the drifting time buckets, which shifts an
+    Arrow object for every bucket, kept as a baseline
+    """
+    if day_delta == 1:
+        return [
+            (start_date.shift(days=day), start_date.shift(days=day))
+            for day in range((end_date - start_date).days + 1)
+        ]
+
+    diff = end_date - start_date
+    ranges: List[TimeRange] = []
+    for day in range(day_delta, diff.days, day_delta):
+        start = ranges[-1][1].shift(days=1) if len(ranges) > 0 else start_date
+        ranges.append((start, start_date.shift(days=day)))
+
+    if diff.days % day_delta != 0:
+        start = ranges[-1][1].shift(days=1) if len(ranges) > 0 else start_date
+        ranges.append((start, end_date))
+
+    return ranges
+
+
+class Command(BaseCommand):
+    help = """
+    Times generating the time buckets of a report, and converting them to the
+    dates used by the queries and the response
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--years", type=int, default=10, help="Length of the time range"
+        )
+        parser.add_argument(
+            "--number", type=int, default=20, help="Repetitions of each case"
+        )
+
+    def handle(self, *args, **options):
+        time_range = (arrow.get(2000, 1, 1), arrow.get(2000 + options["years"], 1, 1))
+        cases = {
+            "one_day": (TimeBucketSizeOption.ONE_DAY.value, 1),
+            "one_week": (TimeBucketSizeOption.ONE_WEEK.value, 7),
+            "one_month": (TimeBucketSizeOption.ONE_MONTH.value, 31),
+        }
+
+        def use(time_buckets: List[TimeRange]):
+            get_report_dates(time_buckets)
+            for time_bucket in time_buckets:
+                get_date_range(time_bucket)
+
+        for name, (time_bucket_size, day_delta) in cases.items():
+            timings = {
+                "arrow shift": lambda: use(shift_time_buckets(*time_range, day_delta)),
+                **{
+                    f"ordinals, {alignment}": lambda alignment=alignment: use(
+                        get_time_buckets(time_range, time_bucket_size, alignment)
+                    )
+                    for alignment in TimeBucketAlignmentOption.values()
+                },
+            }
+            for label, function in timings.items():
+                seconds = timeit(function, number=options["number"])
+                self.stdout.write(
+                    f"{name:<10} {label:<20} "
+                    f"{seconds / options['number'] * 1000:8.2f} ms"
+                )
@@ -1,25 +1,42 @@
 import random
-from typing import Dict, TYPE_CHECKING, List
+from copy import copy
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+import arrow
+import numpy as np
 from typing_extensions import TypedDict
+from django.conf import settings
 from django.contrib.auth.models import User
 
 from api2.constants import ROOT_BUDGET_NAME, DefaultTags
 from api2.models import Budget, Tag, Transaction, UserInfo
-from api2.utils.add_monthly_income import add_monthly_income
+from api2.utils.add_monthly_income import get_monthly_income_transactions
+from api2.utils.bulk_transactions import TaggedTransaction, bulk_create_transactions
 from reports.constants import PREDICTION_TRANSACTION_DESCRIPTION
-from reports.types import TimeRange
-from django.db.models import Avg
+from reports.sampling import Sample, sample_predictions
+from reports.types import PredictionEngineOption, TimeRange
+from django.db.models import Avg, Count, OuterRef, Subquery
 
 from reports.utils import daysBetween, roll, toNativeTimeRange
 
-if TYPE_CHECKING:
-    from django.db.models import QuerySet
-
 TagProbDistro = TypedDict("TagProbDistro", {"prob": float, "average_amount": int})
 BudgetProbDistro = TypedDict(
     "BudgetProbDistro", {"prob": float, "tags": Dict[Tag, TagProbDistro]}
 )
 ProbabilityDistrobution = Dict[Budget, BudgetProbDistro]
+# (days between each transaction, the first transaction)
+IncomeScheduleEntry = Tuple[int, TaggedTransaction]
+DistributionRow = TypedDict(
+    "DistributionRow",
+    {
+        "budget": int,
+        "tags": Optional[int],
+        "tag_count": int,
+        "average": float,
+        "budget_count": int,
+    },
+)
 
 
 class Predictor:
@@ -34,48 +51,92 @@ class Predictor:
           - Time to take average of
         Date range to predict:
           - must be in future
+        Engine:
+          - "python" rolls for every day and budget, "numpy" draws the whole
+            prediction range at once from a generator seeded with seed
+        Income schedule start:
+          - Day the paycheques are counted from, defaults to the start of the
+            prediction range. Lets a later range continue the same schedule
     """
 
     def __init__(
-        self, user: User, analyze_range: TimeRange, prediction_range: TimeRange
+        self,
+        user: User,
+        analyze_range: TimeRange,
+        prediction_range: TimeRange,
+        engine: Optional[str] = None,
+        seed: Optional[int] = None,
+        income_schedule_start: Optional[arrow.Arrow] = None,
     ) -> None:
         self.user = user
+        self.engine = engine or settings.PREDICTION_ENGINE
+        self.rng = np.random.default_rng(seed)
         self.analysis_range = analyze_range
         self.prediction_range = prediction_range
-        all_transactions = Transaction.objects.filter(
+        self.analyze_transactions = Transaction.objects.filter(
             budget__user=user,
             date__range=toNativeTimeRange(analyze_range),
             prediction=False,
+            income=False,
         )
 
-        self.analyze_transactions = all_transactions.filter(income=False)
-        self.income_transactions = all_transactions.filter(income=True)
-
         self.analysis_start, self.analysis_end = analyze_range
         self.days_in_analysis_period = daysBetween(self.analysis_range)
 
         self.prediction_start, self.prediction_end = prediction_range
         self.days_in_prediction_period = daysBetween(self.prediction_range)
+        self.income_schedule_start = income_schedule_start or self.prediction_start
 
-        self.transactions_in_analysis_period = self.analyze_transactions.count()
-        self.unique_budgets = self._get_unique_budgets()
+        self.distribution_rows = self._get_distribution_rows()
+        self.budget_counts = {
+            row["budget"]: row["budget_count"] for row in self.distribution_rows
+        }
+        self.transactions_in_analysis_period = sum(self.budget_counts.values())
         self.budget_odds_distribution = self._get_budget_odds_distribution()
 
         self.transaction_probability_distrobution = (
             self._get_transaction_probability_distrobution()
         )
 
-    def run(self) -> "QuerySet[Transaction]":
-        transactions: List[Transaction] = [
+    def run(self) -> List[Transaction]:
+        return [
             *self._generate_transactions(),
             *self._generate_income_transactions(),
         ]
 
-        ids = [trans.id for trans in transactions]
-        return Transaction.objects.filter(id__in=ids)
-
     def _generate_transactions(self) -> List[Transaction]:
-        transactions: List[Transaction] = []
+        return bulk_create_transactions(self._build_transactions())
+
+    def _generate_income_transactions(self) -> List[Transaction]:
+        return bulk_create_transactions(self._build_income_transactions())
+
+    def _build_transactions(self) -> List[TaggedTransaction]:
+        prediction_start = self.prediction_start.date()
+        transactions: List[TaggedTransaction] = []
+        for day_delta, budget, tag in self._sample_transactions():
+            predicted_transaction = Transaction(
+                budget=budget,
+                description=PREDICTION_TRANSACTION_DESCRIPTION,
+                amount=self.transaction_probability_distrobution[budget]["tags"][tag][
+                    "average_amount"
+                ],
+                date=prediction_start + timedelta(days=day_delta),
+                prediction=True,
+            )
+            transactions.append((predicted_transaction, [tag]))
+
+        return transactions
+
+    def _sample_transactions(self) -> List[Sample]:
+        if self.engine == PredictionEngineOption.NUMPY.value:
+            return sample_predictions(
+                self.transaction_probability_distrobution,
+                self.transactions_in_analysis_period / self.days_in_analysis_period,
+                self.days_in_prediction_period,
+                self.rng,
+            )
+
+        samples: List[Sample] = []
         for day_delta in range(self.days_in_prediction_period):
             num_transactions_to_create = self._get_transactions_to_create_per_day()
             for _ in range(num_transactions_to_create):
@@ -86,21 +147,25 @@ class Predictor:
                     if not roll(budget_prob["prob"]):
                         continue
                     tag = self._get_weighted_tag(budget_prob["tags"])
+                    samples.append((day_delta, budget, tag))
 
-                    predicted_transaction = Transaction.objects.create(
-                        budget=budget,
-                        description=PREDICTION_TRANSACTION_DESCRIPTION,
-                        amount=budget_prob["tags"][tag]["average_amount"],
-                        date=self.prediction_start.shift(days=day_delta).datetime,
-                        prediction=True,
-                    )
+        return samples
 
-                    predicted_transaction.tags.set([tag])
-                    transactions.append(predicted_transaction)
+    def _build_income_transactions(self) -> List[TaggedTransaction]:
+        transactions: List[TaggedTransaction] = []
+        for frequency_days, (template, tags) in self.get_income_schedule():
+            for day_delta in self._get_income_day_deltas(frequency_days):
+                transaction = copy(template)
+                transaction.date = self.prediction_start.shift(days=day_delta).date()
+                transactions.append((transaction, tags))
 
         return transactions
 
-    def _generate_income_transactions(self) -> List[Transaction]:
+    def get_income_schedule(self) -> List[IncomeScheduleEntry]:
+        """
+        Income transactions and the number of days between each of them,
+        dated income_schedule_start
+        """
         user_info = UserInfo.objects.get(user=self.user)
         root_budget = Budget.objects.get(user=self.user, name=ROOT_BUDGET_NAME)
         paycheque_tag = Tag.objects.get(name=DefaultTags.PAYCHEQUE, user=self.user)
@@ -109,34 +174,32 @@ class Predictor:
             (user_info.expected_monthly_net_income / 31)
             * user_info.income_frequency_days
         )
-        transactions = []
+        paycheque = Transaction(
+            prediction=True,
+            income=True,
+            transfer=False,
+            budget=root_budget,
+            amount=paycheque_amount,
+            date=self.income_schedule_start.date(),
+            description=PREDICTION_TRANSACTION_DESCRIPTION,
+        )
+        schedule: List[IncomeScheduleEntry] = [
+            (user_info.income_frequency_days, (paycheque, [paycheque_tag]))
+        ]
 
-        for day_delta in range(
-            0, self.days_in_prediction_period, user_info.income_frequency_days
+        for monthly_income in get_monthly_income_transactions(
+            user=self.user, date=self.income_schedule_start, prediction=True
         ):
-            date = self.prediction_start.shift(days=day_delta)
-            paycheque = Transaction.objects.create(
-                prediction=True,
-                income=True,
-                transfer=False,
-                budget=root_budget,
-                amount=paycheque_amount,
-                date=date.date(),
-                description=PREDICTION_TRANSACTION_DESCRIPTION,
-            )
-            paycheque.tags.set([paycheque_tag])
-            transactions.append(paycheque)
+            schedule.append((user_info.income_frequency_days * 2, monthly_income))
 
-        for day_delta in range(
-            0, self.days_in_prediction_period, user_info.income_frequency_days * 2
-        ):
-            date = self.prediction_start.shift(days=day_delta)
-            income_trans = add_monthly_income(
-                user=self.user, date=date, prediction=True
-            )
-            transactions = [*transactions, *income_trans]
+        return schedule
 
-        return transactions
+    def _get_income_day_deltas(self, frequency_days: int) -> range:
+        days_since_schedule_start = (
+            self.prediction_start.date() - self.income_schedule_start.date()
+        ).days
+        first_day_delta = -days_since_schedule_start % frequency_days
+        return range(first_day_delta, self.days_in_prediction_period, frequency_days)
 
     def _get_transactions_to_create_per_day(self) -> int:
         # There can be more than one transaction every day
@@ -171,62 +234,59 @@ class Predictor:
                   average_amount: -56
         """
         probability_distrobution: ProbabilityDistrobution = {}
-        budget_odds = self.budget_odds_distribution.items()
+        budgets = {budget.id: budget for budget in self.budget_odds_distribution}
+        tags = Tag.objects.in_bulk(
+            {row["tags"] for row in self.distribution_rows if row["tags"] is not None}
+        )
 
-        for budget, odds_of_trans_for_budget in budget_odds:
-            budget_prob_distro: BudgetProbDistro = {
+        for budget, odds_of_trans_for_budget in self.budget_odds_distribution.items():
+            probability_distrobution[budget] = {
                 "prob": odds_of_trans_for_budget,
                 "tags": {},
             }
-            transactions = self.analyze_transactions.filter(budget=budget)
 
-            tag_odds_distribution = self._get_tag_odds_distribution(transactions)
-            for tag, odds_of_tag in tag_odds_distribution.items():
-                transactions_with_tag = transactions.filter(tags=tag)
+        for row in self.distribution_rows:
+            if row["tags"] is None:
+                continue
 
-                tag_prob_distro: TagProbDistro = {
-                    "prob": odds_of_tag,
-                    "average_amount": self._get_average_amount(transactions_with_tag),
-                }
-                budget_prob_distro["tags"][tag] = tag_prob_distro
+            tag_prob_distro: TagProbDistro = {
+                "prob": row["tag_count"] / row["budget_count"],
+                "average_amount": round(row["average"]),
+            }
+            budget = budgets[row["budget"]]
+            probability_distrobution[budget]["tags"][
+                tags[row["tags"]]
+            ] = tag_prob_distro
 
-            probability_distrobution[budget] = budget_prob_distro
         return probability_distrobution
 
-    def _get_average_amount(self, transactions: "QuerySet[Transaction]") -> int:
-        return round(transactions.aggregate(avg=Avg("amount"))["avg"])
-
-    def _get_odds_of_transaction_occurence(
-        self, transactions: "QuerySet[Transaction]"
-    ) -> float:
-        return transactions.count() / self.days_in_analysis_period
-
-    def _get_unique_budgets(self) -> "QuerySet[Budget]":
-        return Budget.objects.filter(
-            pk__in=self.analyze_transactions.values_list("budget", flat=True)
+    def _get_distribution_rows(self) -> List[DistributionRow]:
+        """
+        Number of transactions and their average amount for each budget and tag
+        in one query, along with the number of transactions in the budget. Rows
+        with no tag count the transactions without tags
+        """
+        budget_counts = (
+            self.analyze_transactions.filter(budget=OuterRef("budget"))
+            .order_by()
+            .values("budget")
+            .annotate(total=Count("id"))
+            .values("total")
         )
-
-    def _get_unique_tags(
-        self, transactions: "QuerySet[Transaction]"
-    ) -> "QuerySet[Tag]":
-        return Tag.objects.filter(pk__in=transactions.values_list("tags", flat=True))
-
-    def _get_tag_odds_distribution(
-        self, transactions: "QuerySet[Transaction]"
-    ) -> Dict[Tag, float]:
-        tags = self._get_unique_tags(transactions)
-        total_transactions = transactions.count()
-
-        def odds_of_tag(tag: Tag) -> float:
-            return transactions.filter(tags=tag).count() / total_transactions
-
-        return {tag: odds_of_tag(tag) for tag in tags}
-
-    def _get_budget_odds_distribution(self) -> Dict[Budget, float]:
-        def odds_of_budget(budget: Budget) -> float:
-            return (
-                self.analyze_transactions.filter(budget=budget).count()
-                / self.transactions_in_analysis_period
+        return list(
+            self.analyze_transactions.order_by()
+            .values("budget", "tags")
+            .annotate(
+                tag_count=Count("id"),
+                average=Avg("amount"),
+                budget_count=Subquery(budget_counts),
             )
+            .order_by("budget", "tags")
+        )
 
-        return {budget: odds_of_budget(budget) for budget in self.unique_budgets}
+    def _get_budget_odds_distribution(self) -> Dict[Budget, float]:
+        budgets = Budget.objects.in_bulk(self.budget_counts)
+        return {
+            budgets[budget_id]: count / self.transactions_in_analysis_period
+            for budget_id, count in self.budget_counts.items()
+        }
@@ -0,0 +1,65 @@
+from typing import TYPE_CHECKING, List, Tuple
+
+import numpy as np
+
+from api2.models import Budget, Tag
+from reports.utils import roll_probability
+
+if TYPE_CHECKING:
+    from reports.predictor import ProbabilityDistrobution
+
+# (days after the start of the prediction range, budget, tag)
+Sample = Tuple[int, Budget, Tag]
+
+
+def sample_predictions(
+    distribution: "ProbabilityDistrobution",
+    transactions_per_day: float,
+    days: int,
+    rng: np.random.Generator,
+) -> List[Sample]:
+    """
+    Vectorized equivalent of the rolls made by Predictor for every day, draw
+    and budget, drawing the whole prediction range at once.
+
+    Each day gets the whole part of transactions_per_day draws, plus one more
+    with the probability of the fractional part. In each draw every budget
+    gets a transaction with its probability, with a tag chosen by the tag
+    probabilities of the budget. Samples are in the same order as Predictor
+    creates them. Budgets without tags can not be given a tag, so they are
+    left out
+    """
+    budgets = [
+        budget for budget, budget_prob in distribution.items() if budget_prob["tags"]
+    ]
+    if days <= 0 or not budgets:
+        return []
+
+    whole, extra = divmod(transactions_per_day, 1)
+    draws_per_day = int(whole) + (rng.random(days) < roll_probability(extra))
+    draw_days = np.repeat(np.arange(days), draws_per_day)
+
+    budget_odds = np.array(
+        [roll_probability(distribution[budget]["prob"]) for budget in budgets]
+    )
+    draws, budget_indexes = np.nonzero(
+        rng.random((len(draw_days), len(budgets))) < budget_odds
+    )
+
+    tag_choices = np.empty(len(budget_indexes), dtype=np.int64)
+    budget_tags = []
+    for i, budget in enumerate(budgets):
+        tags = distribution[budget]["tags"]
+        weights = np.array([tags[tag]["prob"] for tag in tags])
+        selected = budget_indexes == i
+        tag_choices[selected] = rng.choice(
+            len(tags), size=int(selected.sum()), p=weights / weights.sum()
+        )
+        budget_tags.append(list(tags))
+
+    return [
+        (day, budgets[budget_index], budget_tags[budget_index][tag_index])
+        for day, budget_index, tag_index in zip(
+            draw_days[draws].tolist(), budget_indexes.tolist(), tag_choices.tolist()
+        )
+    ]
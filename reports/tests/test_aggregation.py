@@ -0,0 +1,294 @@
+import arrow
+from django.db.models import Count, Q, Sum
+
+from api2.models import DailyBalanceSnapshot, MonthlyRollup, Transaction
+from budget.utils.test import BudgetTestCase
+from reports.aggregation import (
+    aggregate_buckets,
+    balance_series,
+    bucket_series,
+    roll_up_series,
+    rollup_bucket_series,
+    snapshot_balance_series,
+    split_into_months,
+)
+from reports.time_buckets import get_date_range, get_time_buckets
+from reports.types import TimeBucketAlignmentOption, TimeBucketSizeOption
+
+
+class TestBucketSeries(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.budget = cls.generate_budget()
+        cls.time_range = (arrow.get(2022, 1, 1), arrow.get(2022, 3, 1))
+
+        for day in range(0, 60, 3):
+            date = cls.time_range[0].shift(days=day)
+            cls.generate_transaction(cls.budget, date=date, amount=day)
+            cls.generate_transaction(cls.budget, date=date, amount=-1, income=True)
+
+        # Outside of the time range
+        cls.generate_transaction(cls.budget, date=arrow.get(2021, 1, 1), amount=1000)
+
+    def assertSameAsSeparateQueries(self, time_bucket_size: str):
+        queryset = Transaction.objects.filter(budget__user=self.user)
+        time_buckets = get_time_buckets(self.time_range, time_bucket_size)
+
+        with self.assertNumQueries(1):
+            series = bucket_series(queryset, time_buckets, Sum("amount"))
+
+        self.assertEqual(
+            series,
+            [
+                queryset.filter(date__range=get_date_range(time_range)).aggregate(
+                    total=Sum("amount")
+                )["total"]
+                or 0
+                for time_range in time_buckets
+            ],
+        )
+
+    def test_one_day(self):
+        self.assertSameAsSeparateQueries(TimeBucketSizeOption.ONE_DAY.value)
+
+    def test_one_week(self):
+        self.assertSameAsSeparateQueries(TimeBucketSizeOption.ONE_WEEK.value)
+
+    def test_one_month(self):
+        self.assertSameAsSeparateQueries(TimeBucketSizeOption.ONE_MONTH.value)
+
+    def test_one(self):
+        self.assertSameAsSeparateQueries(TimeBucketSizeOption.ONE.value)
+
+    def test_multiple_aggregates(self):
+        time_buckets = get_time_buckets(
+            self.time_range, TimeBucketSizeOption.ONE_MONTH.value
+        )
+        results = aggregate_buckets(
+            Transaction.objects.all(),
+            time_buckets,
+            {
+                "income": Sum("amount", filter=Q(income=True)),
+                "count": Count("id"),
+            },
+        )
+
+        self.assertEqual(results[()]["income"], [-11, -9])
+        self.assertEqual(results[()]["count"], [22, 18])
+
+    def test_no_transactions(self):
+        time_buckets = get_time_buckets(
+            (arrow.get(2000, 1, 1), arrow.get(2000, 3, 1)),
+            TimeBucketSizeOption.ONE_MONTH.value,
+        )
+        self.assertEqual(
+            bucket_series(Transaction.objects.all(), time_buckets, Sum("amount")),
+            [0, 0],
+        )
+
+    def test_distinct_queryset(self):
+        tags = [self.generate_tag(), self.generate_tag()]
+        self.generate_transaction(
+            self.budget, date=self.time_range[0], amount=7, tags=tags
+        )
+        queryset = Transaction.objects.filter(tags__in=tags).distinct()
+
+        series = bucket_series(
+            queryset, [(self.time_range[0], self.time_range[0])], Sum("amount")
+        )
+
+        self.assertEqual(series, [7])
+
+    def test_balance_series(self):
+        queryset = Transaction.objects.all()
+        for time_bucket_size in TimeBucketSizeOption.values():
+            time_buckets = get_time_buckets(self.time_range, time_bucket_size)
+
+            with self.assertNumQueries(2):
+                series = balance_series(queryset, time_buckets)
+
+            self.assertEqual(
+                series,
+                [
+                    queryset.filter(date__lte=end.date()).aggregate(
+                        total=Sum("amount")
+                    )["total"]
+                    for _, end in time_buckets
+                ],
+            )
+
+    def test_snapshot_balance_series(self):
+        other_budget = self.generate_budget()
+        self.generate_transaction(other_budget, date=arrow.get(2021, 6, 1), amount=5)
+        self.generate_transaction(
+            other_budget, date=self.time_range[0], amount=3, prediction=True
+        )
+        queryset = Transaction.objects.all()
+
+        for time_bucket_size in TimeBucketSizeOption.values():
+            time_buckets = get_time_buckets(self.time_range, time_bucket_size)
+
+            with self.assertNumQueries(2):
+                series = snapshot_balance_series(
+                    DailyBalanceSnapshot.objects.all(), time_buckets
+                )
+
+            self.assertEqual(series[()], balance_series(queryset, time_buckets))
+
+    def test_snapshot_balance_series_group_by(self):
+        other_budget = self.generate_budget()
+        self.generate_transaction(other_budget, date=self.time_range[0], amount=4)
+        time_buckets = get_time_buckets(
+            self.time_range, TimeBucketSizeOption.ONE_MONTH.value
+        )
+
+        series = snapshot_balance_series(
+            DailyBalanceSnapshot.objects.all(), time_buckets, group_by=("budget",)
+        )
+
+        self.assertEqual(series[(other_budget.id,)], [4, 4])
+        self.assertEqual(
+            series[(self.budget.id,)],
+            balance_series(
+                Transaction.objects.filter(budget=self.budget), time_buckets
+            ),
+        )
+
+
+class TestRollUpSeries(BudgetTestCase):
+    def test_roll_up_series(self):
+        time_buckets = get_time_buckets(
+            (arrow.get(2022, 1, 1), arrow.get(2022, 3, 1)),
+            TimeBucketSizeOption.ONE_MONTH.value,
+        )
+        #     1
+        #   2   3
+        #   4
+        parents = {1: None, 2: 1, 3: 1, 4: 2}
+        series = {1: [1, 0], 2: [10, 0], 3: [100, 1], 4: [1000, 2]}
+
+        self.assertEqual(
+            roll_up_series(series, parents, time_buckets),
+            {1: [1111, 3], 2: [1010, 2], 3: [100, 1], 4: [1000, 2]},
+        )
+
+    def test_parent_outside_of_tree(self):
+        time_buckets = [(arrow.get(2022, 1, 1), arrow.get(2022, 1, 1))]
+
+        self.assertEqual(
+            roll_up_series({2: [5]}, {2: 1, 3: 2}, time_buckets), {2: [5], 3: [0]}
+        )
+
+
+class TestRollupBucketSeries(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.budget = cls.generate_budget()
+        cls.tag = cls.generate_tag()
+        cls.time_range = (arrow.get(2021, 11, 17), arrow.get(2022, 8, 3))
+
+        for day in range(0, 300, 4):
+            date = arrow.get(2021, 11, 1).shift(days=day)
+            cls.generate_transaction(cls.budget, date=date, amount=day)
+            cls.generate_transaction(
+                cls.budget, date=date, amount=-1, income=True, tags=[cls.tag]
+            )
+
+    def test_split_into_months(self):
+        months, edges = split_into_months(
+            [(arrow.get(2022, 1, 15), arrow.get(2022, 4, 10))]
+        )
+
+        self.assertEqual(
+            months,
+            {arrow.get(2022, 2, 1).date(): 0, arrow.get(2022, 3, 1).date(): 0},
+        )
+        self.assertEqual(
+            edges,
+            [
+                (0, (arrow.get(2022, 1, 15).date(), arrow.get(2022, 1, 31).date())),
+                (0, (arrow.get(2022, 4, 1).date(), arrow.get(2022, 4, 10).date())),
+            ],
+        )
+
+    def assertSameAsTransactions(self, time_bucket_size: str, num_queries=2):
+        queryset = Transaction.objects.filter(budget__user=self.user)
+        rollups = MonthlyRollup.objects.filter(budget__user=self.user)
+        time_buckets = get_time_buckets(self.time_range, time_bucket_size)
+
+        expected = aggregate_buckets(
+            queryset, time_buckets, {"value": Sum("amount")}, ("income",)
+        )
+        with self.assertNumQueries(num_queries):
+            series = rollup_bucket_series(
+                queryset,
+                rollups.filter(tag__isnull=True),
+                time_buckets,
+                Sum("amount"),
+                Sum("amount"),
+                ("income",),
+            )
+
+        self.assertEqual(
+            series, {key: result["value"] for key, result in expected.items()}
+        )
+
+    def test_one_week(self):
+        # No week covers a whole month, so only the transactions are queried
+        self.assertSameAsTransactions(TimeBucketSizeOption.ONE_WEEK.value, 1)
+
+    def test_one_month(self):
+        # Months start on the day of the time range, so none is a calendar month
+        self.assertSameAsTransactions(TimeBucketSizeOption.ONE_MONTH.value, 1)
+
+    def test_calendar_months(self):
+        queryset = Transaction.objects.filter(budget__user=self.user)
+        time_buckets = get_time_buckets(
+            self.time_range,
+            TimeBucketSizeOption.ONE_MONTH.value,
+            TimeBucketAlignmentOption.CALENDAR.value,
+        )
+        months, edges = split_into_months(time_buckets)
+
+        # Only the first and last month are partial
+        self.assertEqual(len(months), len(time_buckets) - 2)
+        self.assertEqual([i for i, _ in edges], [0, len(time_buckets) - 1])
+        self.assertEqual(
+            rollup_bucket_series(
+                queryset,
+                MonthlyRollup.objects.filter(tag__isnull=True),
+                time_buckets,
+                Sum("amount"),
+                Sum("amount"),
+            )[()],
+            bucket_series(queryset, time_buckets, Sum("amount")),
+        )
+
+    def test_three_months(self):
+        self.assertSameAsTransactions(TimeBucketSizeOption.THREE_MONTHS.value)
+
+    def test_one(self):
+        self.assertSameAsTransactions(TimeBucketSizeOption.ONE.value)
+
+    def test_tags(self):
+        queryset = Transaction.objects.filter(budget__user=self.user)
+        time_buckets = get_time_buckets(
+            self.time_range, TimeBucketSizeOption.THREE_MONTHS.value
+        )
+
+        series = rollup_bucket_series(
+            queryset,
+            MonthlyRollup.objects.filter(tag=self.tag),
+            time_buckets,
+            Sum("amount"),
+            Sum("amount"),
+            ("tags",),
+            ("tag",),
+        )
+
+        self.assertEqual(
+            series[(self.tag.id,)],
+            bucket_series(queryset.filter(tags=self.tag), time_buckets, Sum("amount")),
+        )
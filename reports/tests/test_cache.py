@@ -0,0 +1,103 @@
+import arrow
+from django.http import QueryDict
+from rest_framework.reverse import reverse
+
+from budget.utils.test import BudgetTestCase
+from reports.cache import (
+    SizeBoundedLocMemCache,
+    get_report_cache_key,
+    report_cache_lookups,
+)
+from reports.types import TimeBucketSizeOption
+
+
+class TestReportCache(BudgetTestCase):
+    url = reverse("reports:income-list")
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.budget = cls.generate_budget()
+        cls.tag = cls.generate_tag()
+        cls.date = arrow.get(2022, 1, 5)
+        cls.generate_transaction(cls.budget, date=cls.date, amount=10, income=True)
+
+    def request_report(self, **kwargs):
+        r = self.get(
+            self.url,
+            query={
+                "date__gte": "2022-01-01",
+                "date__lte": "2022-02-01",
+                "time_bucket_size": TimeBucketSizeOption.ONE.value,
+                **kwargs,
+            },
+        )
+        self.assertEqual(r.status_code, 200)
+        return r.json()["data"]
+
+    def get_lookups(self, result: str) -> float:
+        return report_cache_lookups.labels(report="income", result=result)._value.get()
+
+    def test_hit(self):
+        hits, misses = self.get_lookups("hit"), self.get_lookups("miss")
+
+        self.assertEqual(self.request_report(), [10])
+        self.assertEqual(self.request_report(), [10])
+
+        self.assertEqual(self.get_lookups("hit"), hits + 1)
+        self.assertEqual(self.get_lookups("miss"), misses + 1)
+
+    def test_invalidated_by_transaction(self):
+        self.assertEqual(self.request_report(), [10])
+
+        trans = self.generate_transaction(
+            self.budget, date=self.date, amount=5, income=True
+        )
+        self.assertEqual(self.request_report(), [15])
+
+        trans.tags.set([self.tag])
+        self.assertEqual(self.request_report(tags__includes=self.tag.name), [5])
+        trans.tags.clear()
+        self.assertEqual(self.request_report(tags__includes=self.tag.name), [0])
+
+        trans.delete()
+        self.assertEqual(self.request_report(), [10])
+
+    def test_not_shared_between_users(self):
+        self.request_report()
+        other_user = self.generate_user()
+
+        r = self.get(
+            self.url,
+            query={
+                "date__gte": "2022-01-01",
+                "date__lte": "2022-02-01",
+                "time_bucket_size": TimeBucketSizeOption.ONE.value,
+            },
+            user=other_user,
+        )
+
+        self.assertEqual(r.json()["data"], [0])
+
+    def test_key_ignores_parameter_order(self):
+        self.assertEqual(
+            get_report_cache_key(
+                1, "income", QueryDict("a=1&b=2&b=3&backend=numpy"), 1
+            ),
+            get_report_cache_key(1, "income", QueryDict("b=3&b=2&a=1"), 1),
+        )
+        self.assertNotEqual(
+            get_report_cache_key(1, "income", QueryDict("a=1"), 1),
+            get_report_cache_key(1, "income", QueryDict("a=1"), 2),
+        )
+
+    def test_max_size(self):
+        cache = SizeBoundedLocMemCache("test_max_size", {"OPTIONS": {"MAX_SIZE": 2000}})
+        cache.set("a", "a" * 900)
+        cache.set("b", "b" * 900)
+        cache.get("a")
+        cache.set("c", "c" * 900)
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
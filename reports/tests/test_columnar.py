@@ -0,0 +1,107 @@
+import arrow
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.reverse import reverse
+
+from budget.utils.test import BudgetTestCase
+from reports.cache import REPORT_CACHE
+from reports.types import ReportBackendOption, TimeBucketSizeOption
+
+REPORTS = [
+    "transaction_counts",
+    "income",
+    "transfer",
+    "outcome",
+    "balance",
+    "budget_delta",
+    "budget_income",
+    "budget_outcome",
+    "budget_balance",
+    "tag_delta",
+    "tag_balance",
+]
+
+
+class TestColumnarBackend(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        root, nodes, leaves = cls.generate_budget_tree()
+        cls.tags = [cls.generate_tag(), cls.generate_tag()]
+        cls.time_range = (arrow.get(2022, 1, 1), arrow.get(2022, 7, 1))
+
+        budgets = [root, *nodes, *leaves]
+        for day in range(-40, 220, 3):
+            cls.generate_transaction(
+                budgets[day % len(budgets)],
+                date=cls.time_range[0].shift(days=day),
+                amount=(day % 17) - 8,
+                income=day % 5 == 0,
+                transfer=day % 7 == 0,
+                prediction=day % 11 == 0,
+                tags=cls.tags[: day % 3],
+            )
+
+    def request_report(self, report: str, backend: str, time_bucket_size: str):
+        # Both backends share cache entries
+        caches[REPORT_CACHE].clear()
+        r = self.get(
+            reverse(f"reports:{report}-list"),
+            query={
+                "date__gte": str(self.time_range[0].date()),
+                "date__lte": str(self.time_range[1].date()),
+                "time_bucket_size": time_bucket_size,
+                "backend": backend,
+            },
+        )
+        self.assertEqual(r.status_code, 200, r.content)
+        return r.json()
+
+    def test_same_as_database(self):
+        for report in REPORTS:
+            for time_bucket_size in TimeBucketSizeOption.values():
+                with self.subTest(report=report, time_bucket_size=time_bucket_size):
+                    self.assertEqual(
+                        self.request_report(
+                            report, ReportBackendOption.NUMPY.value, time_bucket_size
+                        ),
+                        self.request_report(
+                            report, ReportBackendOption.DATABASE.value, time_bucket_size
+                        ),
+                    )
+
+    def test_query_count_does_not_depend_on_buckets(self):
+        for report in REPORTS:
+            with CaptureQueriesContext(connection) as queries:
+                self.request_report(
+                    report,
+                    ReportBackendOption.NUMPY.value,
+                    TimeBucketSizeOption.ONE_DAY.value,
+                )
+            self.assertLess(len(queries), 10, report)
+
+    @override_settings(REPORT_BACKEND=ReportBackendOption.NUMPY.value)
+    def test_setting(self):
+        r = self.get(
+            reverse("reports:budget_delta-list"),
+            query={
+                "date__gte": str(self.time_range[0].date()),
+                "date__lte": str(self.time_range[1].date()),
+                "time_bucket_size": TimeBucketSizeOption.ONE_DAY.value,
+            },
+        )
+        self.assertEqual(r.status_code, 200)
+
+    def test_invalid_backend(self):
+        r = self.get(
+            reverse("reports:income-list"),
+            query={
+                "date__gte": str(self.time_range[0].date()),
+                "date__lte": str(self.time_range[1].date()),
+                "time_bucket_size": TimeBucketSizeOption.ONE_DAY.value,
+                "backend": "invalid",
+            },
+        )
+        self.assertEqual(r.status_code, 400)
+        self.assertIn(b"backend", r.content)
@@ -1,13 +1,16 @@
+import random
+from collections import Counter
 from unittest.mock import patch
 import arrow
 from django.contrib.auth.models import User
 from django.db.models import QuerySet
 
-from api2.constants import ROOT_BUDGET_NAME, DefaultTags
-from api2.models import Budget, Tag, Transaction
+from api2.constants import DefaultTags
+from api2.models import Budget, Transaction
 from budget.utils.test import BudgetTestCase
 from reports.predictor import Predictor
-from reports.utils import daysBetween
+from reports.types import PredictionEngineOption
+from reports.utils import roll_probability
 
 PREDICTOR_MODULE = "reports.predictor"
 
@@ -78,54 +81,64 @@ class TestPredictor(BudgetTestCase):
             prediction_range=(self.predict_start_date, self.predict_end_date),
         )
 
-    def test_average(self):
-        self.assertEqual(
-            self.predictor._get_average_amount(self.trans), (-300) / self.trans.count()
-        )
+    def test_distribution_rows(self):
+        self.generate_budget()
+        self.generate_tag()
 
-    def test_odds_of_transaciton_occurence(self):
         self.assertEqual(
-            self.predictor._get_odds_of_transaction_occurence(self.trans),
-            self.trans.count()
-            / daysBetween((self.analyze_start_date, self.analyze_end_date)),
+            sorted(
+                (row["budget"], row["tags"], row["tag_count"], row["budget_count"])
+                for row in self.predictor._get_distribution_rows()
+            ),
+            sorted(
+                [
+                    (self.housing.id, self.tag_rent.id, 1, 1),
+                    (self.doritos.id, self.tag_cool_ranch.id, 1, 1),
+                    (self.food.id, self.tag_groceries.id, 2, 3),
+                    (self.food.id, self.tag_skip.id, 1, 3),
+                ]
+            ),
         )
 
-    def test_get_unique_budgets(self):
-        not_included = self.generate_budget()
-        unique_budgets = self.predictor._get_unique_budgets()
-
-        expected_budgets = Budget.objects.exclude(pk=not_included.pk).exclude(
-            name=ROOT_BUDGET_NAME
-        )
-        self.assertLengthEqual(unique_budgets, len(expected_budgets))
-        for budget in expected_budgets:
-            self.assertIn(budget, unique_budgets)
+    def test_distribution_rows_average(self):
+        averages = {
+            (row["budget"], row["tags"]): row["average"]
+            for row in self.predictor._get_distribution_rows()
+        }
+        self.assertEqual(averages[(self.food.id, self.tag_groceries.id)], -37.5)
+        self.assertEqual(averages[(self.housing.id, self.tag_rent.id)], -100)
 
-    def test_get_unique_tags(self):
-        not_included = self.generate_tag()
-        unique_tags = self.predictor._get_unique_tags(self.trans)
+    def test_distribution_rows_untagged(self):
+        self.generate_transaction(self.food, amount=-10, date=self.analyze_end_date)
 
-        expected_tags = Tag.objects.exclude(pk=not_included.pk).exclude(
-            name__in=DefaultTags.values()
+        [untagged] = [
+            row
+            for row in self.predictor._get_distribution_rows()
+            if row["tags"] is None
+        ]
+        self.assertEqual(
+            (untagged["budget"], untagged["tag_count"], untagged["budget_count"]),
+            (self.food.id, 1, 4),
         )
-        self.assertLengthEqual(unique_tags, len(expected_tags))
-        for tag in expected_tags:
-            self.assertIn(tag, unique_tags)
-
-    def test_tag_odds_distribution(self):
-        total_trans = self.trans.count()
 
-        def get_odds(tag: Tag):
-            return self.trans.filter(tags=tag).count() / total_trans
+    def test_transactions_in_analysis_period(self):
+        self.generate_transaction(
+            self.food, amount=10, date=self.analyze_end_date, income=True
+        )
+        self.generate_transaction(
+            self.food, amount=-10, date=self.predict_start_date, tags=[self.tag_skip]
+        )
+        predictor = Predictor(
+            self.user,
+            analyze_range=(self.analyze_start_date, self.analyze_end_date),
+            prediction_range=(self.predict_start_date, self.predict_end_date),
+        )
 
+        # Income and transactions outside of the range are not analyzed
+        self.assertEqual(predictor.transactions_in_analysis_period, 5)
         self.assertEqual(
-            self.predictor._get_tag_odds_distribution(self.trans),
-            {
-                self.tag_cool_ranch: get_odds(self.tag_cool_ranch),
-                self.tag_groceries: get_odds(self.tag_groceries),
-                self.tag_skip: get_odds(self.tag_skip),
-                self.tag_rent: get_odds(self.tag_rent),
-            },
+            predictor.budget_counts,
+            {self.housing.id: 1, self.doritos.id: 1, self.food.id: 3},
         )
 
     def test_budget_odds_distribution(self):
@@ -166,6 +179,35 @@ class TestPredictor(BudgetTestCase):
             self.predictor.transaction_probability_distrobution,
         )
 
+    def test_query_count_does_not_depend_on_budgets_or_tags(self):
+        for _ in range(3):
+            budget = self.generate_budget()
+            tags = [self.generate_tag(), self.generate_tag()]
+            self.generate_transaction(
+                budget, amount=-10, date=self.analyze_start_date, tags=tags
+            )
+            self.generate_transaction(budget, amount=-30, date=self.analyze_end_date)
+
+        # Distribution, budgets and tags
+        with self.assertNumQueries(3):
+            predictor = Predictor(
+                self.user,
+                analyze_range=(self.analyze_start_date, self.analyze_end_date),
+                prediction_range=(self.predict_start_date, self.predict_end_date),
+            )
+
+        self.assertEqual(predictor.transactions_in_analysis_period, 11)
+        self.assertEqual(
+            predictor.transaction_probability_distrobution[budget],
+            {
+                "prob": 2 / 11,
+                "tags": {
+                    tags[0]: {"prob": 0.5, "average_amount": -10},
+                    tags[1]: {"prob": 0.5, "average_amount": -10},
+                },
+            },
+        )
+
     def test_get_transactions_to_create_per_day(self):
         # The ratio of transactions created per day will be less than one by default
         with patch(f"{PREDICTOR_MODULE}.roll", return_value=True):
@@ -198,9 +240,125 @@ class TestPredictor(BudgetTestCase):
                 <= self.predict_end_date
             )
 
+    def test_run(self):
+        self.user_info.expected_monthly_net_income = 1000
+        self.user_info.save()
+        self.housing.monthly_allocation = 50
+        self.housing.save()
+
+        with patch(f"{PREDICTOR_MODULE}.roll", return_value=True):
+            predictions = self.predictor.run()
+
+        self.assertEqual(
+            sorted(trans.id for trans in predictions),
+            list(
+                Transaction.objects.filter(prediction=True)
+                .order_by("id")
+                .values_list("id", flat=True)
+            ),
+        )
+        self.assertTrue(any(trans.income for trans in predictions))
+        for trans in predictions:
+            self.assertIsNotNone(trans.pk)
+            self.assertTrue(trans.prediction)
+            self.assertEqual(trans.tags.count(), 1)
+
+    def test_engines_sample_the_same_distribution(self):
+        def get_frequencies(engine: str):
+            predictor = Predictor(
+                self.user,
+                analyze_range=(self.analyze_start_date, self.analyze_end_date),
+                prediction_range=(self.predict_start_date, self.predict_end_date),
+                engine=engine,
+                seed=1,
+            )
+            predictor.days_in_prediction_period = days
+            frequencies = Counter(
+                (budget, tag) for _, budget, tag in predictor._sample_transactions()
+            )
+            return {key: count / days for key, count in frequencies.items()}
+
+        days = 5000
+        random.seed(1)
+        python_frequencies = get_frequencies(PredictionEngineOption.PYTHON.value)
+        numpy_frequencies = get_frequencies(PredictionEngineOption.NUMPY.value)
+
+        draws_per_day = roll_probability(5 / 6)
+        self.assertEqual(set(python_frequencies), set(numpy_frequencies))
+        for (budget, tag), frequency in numpy_frequencies.items():
+            budget_prob = self.predictor.transaction_probability_distrobution[budget]
+            expected = (
+                draws_per_day
+                * roll_probability(budget_prob["prob"])
+                * budget_prob["tags"][tag]["prob"]
+            )
+            self.assertAlmostEqual(frequency / expected, 1, delta=0.1)
+            self.assertAlmostEqual(
+                python_frequencies[(budget, tag)] / expected, 1, delta=0.1
+            )
+
+    def test_numpy_engine_is_seeded(self):
+        def sample(seed: int):
+            return Predictor(
+                self.user,
+                analyze_range=(self.analyze_start_date, self.analyze_end_date),
+                prediction_range=(self.predict_start_date, self.predict_end_date),
+                engine=PredictionEngineOption.NUMPY.value,
+                seed=seed,
+            )._sample_transactions()
+
+        self.assertEqual(sample(1), sample(1))
+        self.assertNotEqual(sample(1), sample(2))
+
+    def test_numpy_engine_run(self):
+        predictor = Predictor(
+            self.user,
+            analyze_range=(self.analyze_start_date, self.analyze_end_date),
+            prediction_range=(self.predict_start_date, self.predict_end_date),
+            engine=PredictionEngineOption.NUMPY.value,
+            seed=1,
+        )
+
+        for trans in predictor._generate_transactions():
+            self.assertTrue(trans.prediction)
+            self.assertEqual(
+                trans.amount,
+                predictor.transaction_probability_distrobution[trans.budget]["tags"][
+                    trans.tags.get()
+                ]["average_amount"],
+            )
+            self.assertTrue(
+                self.predict_start_date.date()
+                <= trans.date
+                < self.predict_end_date.date()
+            )
+
     def test_generate_income_transactions(self):
         predicted_income = self.predictor._generate_income_transactions()
         for trans in predicted_income:
             self.assertTrue(trans.income)
             self.assertTrue(trans.prediction)
             self.assertFalse(trans.transfer)
+
+    def test_income_schedule_start(self):
+        self.user_info.expected_monthly_net_income = 1000
+        self.user_info.income_frequency_days = 3
+        self.user_info.save()
+
+        predictor = Predictor(
+            self.user,
+            analyze_range=(self.analyze_start_date, self.analyze_end_date),
+            prediction_range=(self.predict_start_date, self.predict_end_date),
+            income_schedule_start=self.predict_start_date.shift(days=-4),
+        )
+        paycheque_dates = [
+            trans.date
+            for trans, tags in predictor._build_income_transactions()
+            if tags[0].name == DefaultTags.PAYCHEQUE
+        ]
+
+        # The 14th is the end of the prediction range, so it is not included
+        self.assertEqual(
+            paycheque_dates,
+            [arrow.get(2022, 1, day).date() for day in (10, 13)],
+        )
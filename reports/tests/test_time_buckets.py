@@ -1,7 +1,13 @@
 import arrow
 
 from budget.utils.test import BudgetTestCase
-from reports.time_buckets import one_day, one, get_time_buckets_by_day_delta
+from reports.time_buckets import (
+    get_time_buckets,
+    get_time_buckets_by_day_delta,
+    one,
+    one_day,
+)
+from reports.types import TimeBucketAlignmentOption, TimeBucketSizeOption
 
 
 class TestTimeBuckets(BudgetTestCase):
@@ -60,3 +66,108 @@ class TestTimeBuckets(BudgetTestCase):
         ]
 
         self.assertEqual(ranges, expected_ranges)
+
+    def test_time_range_multiple_of_delta(self):
+        # The last bucket is left out, as it always has been
+        start_date = arrow.get(2022, 1, 1)
+        end_date = arrow.get(2022, 1, 15)
+
+        ranges = get_time_buckets_by_day_delta(start_date, end_date, 7)
+
+        self.assertEqual(ranges, [(start_date, arrow.get(2022, 1, 8))])
+
+
+class TestCalendarTimeBuckets(BudgetTestCase):
+    def get_buckets(self, start_date, end_date, time_bucket_size):
+        return get_time_buckets(
+            (start_date, end_date),
+            time_bucket_size,
+            TimeBucketAlignmentOption.CALENDAR.value,
+        )
+
+    def test_one_day(self):
+        start_date = arrow.get(2022, 1, 1)
+        end_date = arrow.get(2022, 2, 1)
+
+        ranges = self.get_buckets(
+            start_date, end_date, TimeBucketSizeOption.ONE_DAY.value
+        )
+
+        self.assertEqual(ranges, one_day(start_date, end_date))
+
+    def test_one_week(self):
+        # Saturday to Thursday
+        start_date = arrow.get(2022, 1, 15)
+        end_date = arrow.get(2022, 2, 3)
+
+        ranges = self.get_buckets(
+            start_date, end_date, TimeBucketSizeOption.ONE_WEEK.value
+        )
+
+        expected_ranges = [
+            (start_date, arrow.get(2022, 1, 16)),
+            (arrow.get(2022, 1, 17), arrow.get(2022, 1, 23)),
+            (arrow.get(2022, 1, 24), arrow.get(2022, 1, 30)),
+            (arrow.get(2022, 1, 31), end_date),
+        ]
+
+        self.assertEqual(ranges, expected_ranges)
+
+    def test_one_month(self):
+        start_date = arrow.get(2022, 1, 15)
+        end_date = arrow.get(2022, 3, 20)
+
+        ranges = self.get_buckets(
+            start_date, end_date, TimeBucketSizeOption.ONE_MONTH.value
+        )
+
+        expected_ranges = [
+            (start_date, arrow.get(2022, 1, 31)),
+            (arrow.get(2022, 2, 1), arrow.get(2022, 2, 28)),
+            (arrow.get(2022, 3, 1), end_date),
+        ]
+
+        self.assertEqual(ranges, expected_ranges)
+
+    def test_three_months(self):
+        start_date = arrow.get(2021, 11, 1)
+        end_date = arrow.get(2022, 4, 30)
+
+        ranges = self.get_buckets(
+            start_date, end_date, TimeBucketSizeOption.THREE_MONTHS.value
+        )
+
+        expected_ranges = [
+            (start_date, arrow.get(2021, 12, 31)),
+            (arrow.get(2022, 1, 1), arrow.get(2022, 3, 31)),
+            (arrow.get(2022, 4, 1), end_date),
+        ]
+
+        self.assertEqual(ranges, expected_ranges)
+
+    def test_one_year(self):
+        start_date = arrow.get(2021, 1, 1)
+        end_date = arrow.get(2022, 1, 1)
+
+        ranges = self.get_buckets(
+            start_date, end_date, TimeBucketSizeOption.ONE_YEAR.value
+        )
+
+        expected_ranges = [
+            (start_date, arrow.get(2021, 12, 31)),
+            (end_date, end_date),
+        ]
+
+        self.assertEqual(ranges, expected_ranges)
+
+    def test_covers_every_day_once(self):
+        start_date = arrow.get(2021, 2, 13)
+        end_date = arrow.get(2024, 3, 2)
+
+        for time_bucket_size in TimeBucketSizeOption.values():
+            ranges = self.get_buckets(start_date, end_date, time_bucket_size)
+
+            self.assertEqual(ranges[0][0], start_date)
+            self.assertEqual(ranges[-1][1], end_date)
+            for (_, end), (next_start, _) in zip(ranges, ranges[1:]):
+                self.assertEqual(end.shift(days=1), next_start)
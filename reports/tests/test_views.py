@@ -1,13 +1,15 @@
+import json
 from typing import List
 
 import arrow
+from rest_framework.authtoken.models import Token
 from rest_framework.reverse import reverse
 
 from api2.constants import ROOT_BUDGET_NAME
 from api2.models import Transaction, Budget
 from budget.utils.test import BudgetTestCase
 from reports.time_buckets import get_time_buckets, get_report_dates
-from reports.types import TimeBucketSizeOption, TimeRange
+from reports.types import TimeBucketAlignmentOption, TimeBucketSizeOption, TimeRange
 
 """
 Dear Isaac:
@@ -122,6 +124,44 @@ class TestTransactionCounts(TestReportViewMixin, BudgetTestCase):
 
         self.assertEqual(data, expected_data)
 
+    def test_transaction_counts_calendar_quarters(self):
+        qp = self.get_query_params(
+            time_bucket_size=TimeBucketSizeOption.THREE_MONTHS.value,
+            time_bucket_alignment=TimeBucketAlignmentOption.CALENDAR.value,
+        )
+        r = self.get(self.url, query=qp)
+        self.assertEqual(r.status_code, 200)
+        data = r.json()
+
+        expected_data = {
+            "dates": [
+                "2022-01-01",
+                "2022-04-01",
+                "2022-07-01",
+                "2022-10-01",
+                "2023-01-01",
+            ],
+            "data": [90, 91, 92, 92, 1],
+        }
+
+        self.assertEqual(data, expected_data)
+
+    def test_streaming(self):
+        r = self.get(self.url, query=self.get_query_params(stream="1"))
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r.streaming)
+
+        self.assertEqual(
+            json.loads(b"".join(r.streaming_content)),
+            self.get(self.url, query=self.get_query_params()).json(),
+        )
+
+    def test_invalid_time_bucket_alignment_query_param(self):
+        qp = self.get_query_params(time_bucket_alignment="invalid")
+        r = self.get(self.url, query=qp)
+        self.assertEqual(r.status_code, 400)
+        self.assertIn(b"time_bucket_alignment", r.content)
+
     def test_transaction_counts_one(self):
         qp = self.get_query_params(time_bucket_size=TimeBucketSizeOption.ONE.value)
 
@@ -168,7 +208,7 @@ class TestBudgetDelta(TestReportViewMixin, BudgetTestCase):
         for budget in self.budgets:
             self.assertEqual(data[str(budget.id)], [-50, -50, -50, -50, -50, -50])
 
-    def a_test_include_child_budgets(self):
+    def test_include_child_budgets(self):
         user = self.generate_user()
         root_budget = Budget.objects.get(user=user, name=ROOT_BUDGET_NAME)
         children = [
@@ -186,6 +226,13 @@ class TestBudgetDelta(TestReportViewMixin, BudgetTestCase):
         root_budget_report_data = data[str(root_budget.id)]
         self.assertEqual(root_budget_report_data, [200, 200, 200, 200, 200, 200])
 
+    def test_query_count_does_not_depend_on_budgets(self):
+        Token.objects.get_or_create(user=self.user)
+        # Token, authentication, data version, budgets, the budget tree, monthly
+        # rollups and the grouped query for the partial months
+        with self.assertNumQueries(7):
+            self.request_report(self.user)
+
 
 class TestTagDelta(TestReportViewMixin, BudgetTestCase):
     url = reverse("reports:tag_delta-list")
@@ -217,6 +264,24 @@ class TestTagDelta(TestReportViewMixin, BudgetTestCase):
         for tag in self.tags:
             self.assertEqual(data[str(tag.id)], [-50, -50, -50, -50, -50, -50])
 
+    def test_transaction_with_several_tags(self):
+        self.generate_transaction(
+            self.budget, tags=self.tags[:2], date=self.time_range[0], amount=7
+        )
+
+        data = self.request_report()
+
+        self.assertEqual(data[str(self.tags[0].id)][0], -43)
+        self.assertEqual(data[str(self.tags[1].id)][0], -43)
+        self.assertEqual(data[str(self.tags[2].id)][0], -50)
+
+    def test_query_count_does_not_depend_on_tags(self):
+        Token.objects.get_or_create(user=self.user)
+        # Token, authentication, data version, tags, monthly rollups and the
+        # grouped query for the partial months
+        with self.assertNumQueries(6):
+            self.request_report()
+
 
 class TestIncome(TestReportViewMixin, BudgetTestCase):
     url = reverse("reports:income-list")
@@ -479,3 +544,95 @@ class TestTagBalanceReport(TestReportViewMixin, BudgetTestCase):
 
         for tag in self.tags:
             self.assertEqual(data[str(tag.id)], [550, 500, 450, 400, 350, 300])
+
+    def test_query_count_does_not_depend_on_tags(self):
+        Token.objects.get_or_create(user=self.user)
+        # Token, authentication, data version, tags, opening balances and the
+        # grouped query
+        with self.assertNumQueries(6):
+            self.request_report()
+
+
+class TestBalanceReport(TestReportViewMixin, BudgetTestCase):
+    url = reverse("reports:balance-list")
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.time_bucket_size = TimeBucketSizeOption.ONE_MONTH.value
+        cls.time_range = (arrow.get(2022, 1, 1), arrow.get(2022, 7, 1))
+        cls.buckets = get_time_buckets(cls.time_range, cls.time_bucket_size)
+
+        # Initial Transactions outside time range
+        cls.generate_transaction(cls.budget, date=arrow.get(2020, 1, 1), amount=1000)
+
+        for bucket in cls.buckets:
+            cls.generate_transaction(cls.budget, date=bucket[0], amount=-100)
+            cls.generate_transaction(cls.budget, date=bucket[1], amount=50)
+
+        # Other users transactions are not included
+        other_budget = cls.generate_budget(user=cls.generate_user())
+        cls.generate_transaction(other_budget, date=arrow.get(2022, 1, 1), amount=5)
+
+    def test(self):
+        data = self.request_report()
+        self.assertEqual(data, [950, 900, 850, 800, 750, 700])
+
+
+class TestBatchReport(TestReportViewMixin, BudgetTestCase):
+    url = reverse("reports:batch-list")
+    report_names = ["income", "outcome", "transfer", "balance", "transaction_counts"]
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.generate_transaction(cls.budget, date=arrow.get(2021, 6, 1), amount=1000)
+        for day in range(0, 180, 4):
+            cls.generate_transaction(
+                cls.budget,
+                date=cls.time_range[0].shift(days=day),
+                amount=day - 90,
+                income=day % 3 == 0,
+                transfer=day % 5 == 0,
+            )
+
+    def get_query_params(self, **kwargs):
+        return super().get_query_params(**{"reports": self.report_names, **kwargs})
+
+    def request_report(self, qp=None, user=None):
+        r = self.get(self.url, query=qp or self.get_query_params(), user=user)
+        self.assertEqual(r.status_code, 200)
+        return r.json()
+
+    def test_same_as_separate_reports(self):
+        batch = self.request_report()
+
+        for name in self.report_names:
+            r = self.get(
+                reverse(f"reports:{name}-list"),
+                query=super().get_query_params(),
+            )
+            self.assertEqual(batch["dates"], r.json()["dates"])
+            self.assertEqual(batch["data"][name], r.json()["data"], name)
+
+    def test_same_with_numpy_backend(self):
+        self.assertEqual(
+            self.request_report(self.get_query_params(backend="numpy")),
+            self.request_report(self.get_query_params(backend="database")),
+        )
+
+    def test_one_scan(self):
+        qp = self.get_query_params(reports=["income", "outcome", "transfer"])
+        Token.objects.get_or_create(user=self.user)
+        # Token, authentication, data version and the aggregate query
+        with self.assertNumQueries(4):
+            self.request_report(qp)
+
+    def test_invalid_reports(self):
+        r = self.get(self.url, query=super().get_query_params())
+        self.assertEqual(r.status_code, 400)
+        self.assertIn(b"reports", r.content)
+
+        r = self.get(self.url, query=self.get_query_params(reports=["invalid"]))
+        self.assertEqual(r.status_code, 400)
+        self.assertIn(b"invalid", r.content)
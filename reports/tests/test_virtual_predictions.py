@@ -0,0 +1,221 @@
+from datetime import date
+
+import arrow
+from django.core.cache import caches
+from django.test import override_settings
+from rest_framework.reverse import reverse
+
+from api2.constants import DefaultTags
+from api2.models import Tag, Transaction
+from api2.utils.bulk_transactions import bulk_create_transactions
+from budget.utils.test import BudgetTestCase
+from reports.cache import REPORT_CACHE
+from reports.predictor import Predictor
+from reports.types import PredictionEngineOption
+from reports.virtual_predictions import (
+    save_prediction_distribution,
+    synthesize_predictions,
+)
+
+VIRTUAL_STORAGE = override_settings(PREDICTION_STORAGE="virtual")
+
+
+class TestVirtualPredictions(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.food = cls.generate_budget(
+            name="food", parent=cls.budget_root, monthly_allocation=25
+        )
+        cls.housing = cls.generate_budget(name="housing", parent=cls.budget_root)
+        cls.groceries = cls.generate_tag(name="groceries")
+        cls.rent = cls.generate_tag(name="rent")
+
+        for day in range(1, 31):
+            cls.generate_transaction(
+                cls.food,
+                amount=-day,
+                date=arrow.get(2022, 1, day),
+                tags=[cls.groceries],
+            )
+        for day in (1, 15):
+            cls.generate_transaction(
+                cls.housing, amount=-500, date=arrow.get(2022, 1, day), tags=[cls.rent]
+            )
+
+        cls.user_info.expected_monthly_net_income = 3100
+        cls.user_info.income_frequency_days = 14
+        cls.user_info.save()
+
+    def setUp(self) -> None:
+        super().setUp()
+        predictor = Predictor(
+            self.user,
+            (arrow.get(2022, 1, 1), arrow.get(2022, 2, 1)),
+            (arrow.get(2022, 2, 1), arrow.get(2022, 5, 1)),
+            engine=PredictionEngineOption.NUMPY.value,
+        )
+        self.prediction_distribution = save_prediction_distribution(predictor, seed=1)
+
+    @staticmethod
+    def get_predictions(*args, **kwargs):
+        """
+        Synthesized predictions without their ids, with their tags
+        """
+        rows, tags = synthesize_predictions(*args, **kwargs)
+        return [
+            (*row[1:], sorted(tag_id for index, tag_id in tags if index == i))
+            for i, row in enumerate(rows)
+        ]
+
+    def test_save(self):
+        self.assertEqual(self.prediction_distribution.start, date(2022, 2, 1))
+        self.assertEqual(self.prediction_distribution.schedule_start, date(2022, 2, 1))
+        self.assertEqual(self.prediction_distribution.end, date(2022, 5, 1))
+
+        budgets = self.prediction_distribution.distribution["budgets"]
+        self.assertEqual(
+            {budget["budget"] for budget in budgets}, {self.food.id, self.housing.id}
+        )
+
+    def test_synthesize(self):
+        predictions = self.get_predictions(self.prediction_distribution)
+        self.assertTrue(predictions)
+        self.assertEqual(
+            predictions, self.get_predictions(self.prediction_distribution)
+        )
+
+        for day, amount, budget_id, income, transfer, prediction, tags in predictions:
+            self.assertTrue(date(2022, 2, 1) <= day < date(2022, 5, 1))
+            self.assertTrue(prediction)
+            if budget_id == self.food.id and not income:
+                self.assertEqual(tags, [self.groceries.id])
+                self.assertEqual(amount, -16)
+
+        rows, _ = synthesize_predictions(self.prediction_distribution)
+        ids = [row[0] for row in rows]
+        self.assertEqual(ids, sorted(ids))
+        self.assertTrue(all(row_id < 0 for row_id in ids))
+
+    def test_days_do_not_depend_on_the_range(self):
+        predictions = self.get_predictions(self.prediction_distribution)
+
+        self.assertEqual(
+            self.get_predictions(self.prediction_distribution, date(2022, 3, 10)),
+            [row for row in predictions if row[0] < date(2022, 3, 10)],
+        )
+
+        self.prediction_distribution.start = date(2022, 2, 20)
+        self.assertEqual(
+            self.get_predictions(self.prediction_distribution),
+            [row for row in predictions if row[0] >= date(2022, 2, 20)],
+        )
+
+    def test_income_schedule(self):
+        paycheque = Tag.objects.get(user=self.user, name=DefaultTags.PAYCHEQUE)
+
+        def paycheque_days():
+            return [
+                row[0]
+                for row in self.get_predictions(self.prediction_distribution)
+                if row[-1] == [paycheque.id]
+            ]
+
+        self.assertEqual(
+            paycheque_days()[:3],
+            [date(2022, 2, d) for d in (1, 15)] + [date(2022, 3, 1)],
+        )
+
+        # The schedule is kept when the window moves
+        self.prediction_distribution.start = date(2022, 2, 10)
+        self.assertEqual(paycheque_days()[0], date(2022, 2, 15))
+
+    def store_predictions(self):
+        """
+        Replaces the distribution with its predictions stored as transactions
+        """
+        tags = Tag.objects.in_bulk()
+        bulk_create_transactions(
+            [
+                (
+                    Transaction(
+                        date=day,
+                        amount=amount,
+                        budget_id=budget_id,
+                        income=income,
+                        transfer=transfer,
+                        prediction=prediction,
+                    ),
+                    [tags[tag_id] for tag_id in tag_ids],
+                )
+                for day, amount, budget_id, income, transfer, prediction, tag_ids in self.get_predictions(
+                    self.prediction_distribution
+                )
+            ]
+        )
+        self.prediction_distribution.delete()
+
+    def test_reports_same_as_stored_predictions(self):
+        names = [
+            "transaction_counts",
+            "income",
+            "outcome",
+            "transfer",
+            "balance",
+            "budget_delta",
+            "budget_income",
+            "budget_outcome",
+            "budget_balance",
+            "tag_delta",
+            "tag_balance",
+        ]
+        query = {
+            "date__gte": "2022-01-15",
+            "date__lte": "2022-06-01",
+            "time_bucket_size": "one_month",
+        }
+
+        def request_reports(backend: str):
+            # The backend is not part of the cache key
+            caches[REPORT_CACHE].clear()
+            reports = {}
+            for name in names:
+                r = self.get(
+                    reverse(f"reports:{name}-list"), query={**query, "backend": backend}
+                )
+                self.assertEqual(r.status_code, 200)
+                reports[name] = r.json()
+            r = self.get(
+                reverse("reports:batch-list"),
+                query={**query, "backend": backend, "reports": ["income", "balance"]},
+            )
+            reports["batch"] = r.json()
+            return reports
+
+        with VIRTUAL_STORAGE:
+            virtual = {
+                backend: request_reports(backend) for backend in ("database", "numpy")
+            }
+
+        self.store_predictions()
+        for backend in ("database", "numpy"):
+            stored = request_reports(backend)
+            for name, report in stored.items():
+                self.assertEqual(virtual[backend][name], report, (backend, name))
+
+    def test_not_synthesized_for_stored_predictions(self):
+        query = {
+            "date__gte": "2022-02-01",
+            "date__lte": "2022-06-01",
+            "time_bucket_size": "one",
+        }
+        r = self.get(reverse("reports:transaction_counts-list"), query=query)
+        self.assertEqual(r.json()["data"], [0])
+
+        caches[REPORT_CACHE].clear()
+        with VIRTUAL_STORAGE:
+            r = self.get(reverse("reports:transaction_counts-list"), query=query)
+        self.assertEqual(
+            r.json()["data"],
+            [len(synthesize_predictions(self.prediction_distribution)[0])],
+        )
@@ -1,12 +1,33 @@
 from datetime import date
-from typing import List, Optional, Tuple
+from typing import Iterable, List, Optional, Tuple
 
 import arrow
 from django.db.models import QuerySet
 
 from api2.models import Transaction
 
-from .types import TimeRange, TimeBucketSizeOption
+from .types import (
+    NativeTimeRange,
+    TimeBucketAlignmentOption,
+    TimeBucketSizeOption,
+    TimeRange,
+)
+
+# Length of the time buckets that drift from the calendar
+DRIFT_DAY_DELTAS = {
+    TimeBucketSizeOption.ONE_WEEK.value: 7,
+    TimeBucketSizeOption.ONE_MONTH.value: 31,
+    TimeBucketSizeOption.THREE_MONTHS.value: 365 // 4,
+    TimeBucketSizeOption.SIX_MONTHS.value: 365 // 2,
+    TimeBucketSizeOption.ONE_YEAR.value: 365,
+}
+# Length of the time buckets that are aligned with calendar months
+CALENDAR_MONTHS = {
+    TimeBucketSizeOption.ONE_MONTH.value: 1,
+    TimeBucketSizeOption.THREE_MONTHS.value: 3,
+    TimeBucketSizeOption.SIX_MONTHS.value: 6,
+    TimeBucketSizeOption.ONE_YEAR.value: 12,
+}
 
 
 def get_time_range(transactions: QuerySet[Transaction]) -> Optional[TimeRange]:
@@ -33,30 +54,119 @@ def get_report_dates(time_buckets: List[TimeRange]) -> List[str]:
 
 
 def get_time_buckets(
-    time_range: Optional[TimeRange], time_bucket_size: str
+    time_range: Optional[TimeRange],
+    time_bucket_size: str,
+    alignment: str = TimeBucketAlignmentOption.DRIFT.value,
 ) -> List[TimeRange]:
     if not time_range:
         return []
 
-    start_date = time_range[0]
-    end_date = time_range[1]
+    if time_bucket_size == TimeBucketSizeOption.ONE.value:
+        return one(*time_range)
 
+    return to_time_buckets(
+        get_date_buckets(*get_date_range(time_range), time_bucket_size, alignment)
+    )
+
+
+def get_date_buckets(
+    start: date,
+    end: date,
+    time_bucket_size: str,
+    alignment: str = TimeBucketAlignmentOption.DRIFT.value,
+) -> List[NativeTimeRange]:
+    """
+    Same as get_time_buckets with plain dates, which are much cheaper to
+    create than Arrow objects for reports with many buckets
+    """
     if time_bucket_size == TimeBucketSizeOption.ONE_DAY.value:
-        return one_day(start_date, end_date)
-    if time_bucket_size == TimeBucketSizeOption.ONE_WEEK.value:
-        delta = 7
-    elif time_bucket_size == TimeBucketSizeOption.ONE_MONTH.value:
-        delta = 31
-    elif time_bucket_size == TimeBucketSizeOption.THREE_MONTHS.value:
-        delta = 365 // 4
-    elif time_bucket_size == TimeBucketSizeOption.SIX_MONTHS.value:
-        delta = 365 // 2
-    elif time_bucket_size == TimeBucketSizeOption.ONE_YEAR.value:
-        delta = 365
-    else:
-        return one(start_date, end_date)
-
-    return get_time_buckets_by_day_delta(start_date, end_date, delta)
+        return day_buckets(start, end)
+
+    if alignment == TimeBucketAlignmentOption.CALENDAR.value:
+        if time_bucket_size == TimeBucketSizeOption.ONE_WEEK.value:
+            return week_buckets(start, end)
+        if time_bucket_size in CALENDAR_MONTHS:
+            return month_buckets(start, end, CALENDAR_MONTHS[time_bucket_size])
+    elif time_bucket_size in DRIFT_DAY_DELTAS:
+        return day_delta_buckets(start, end, DRIFT_DAY_DELTAS[time_bucket_size])
+
+    return [(start, end)]
+
+
+def to_time_buckets(date_buckets: List[NativeTimeRange]) -> List[TimeRange]:
+    arrows = {}
+
+    def to_arrow(day: date) -> arrow.Arrow:
+        if day not in arrows:
+            arrows[day] = arrow.Arrow(day.year, day.month, day.day)
+        return arrows[day]
+
+    return [(to_arrow(start), to_arrow(end)) for start, end in date_buckets]
+
+
+def split_at(first: int, last: int, starts: Iterable[int]) -> List[NativeTimeRange]:
+    """
+    Splits the days between the first and last ordinal (inclusive) into buckets
+    beginning at each of the starts, which must be after first
+    """
+    if first > last:
+        return []
+
+    bucket_starts = [first, *starts]
+    bucket_ends = [start - 1 for start in bucket_starts[1:]] + [last]
+    return [
+        (date.fromordinal(start), date.fromordinal(end))
+        for start, end in zip(bucket_starts, bucket_ends)
+    ]
+
+
+def day_buckets(start: date, end: date) -> List[NativeTimeRange]:
+    days = [
+        date.fromordinal(ordinal)
+        for ordinal in range(start.toordinal(), end.toordinal() + 1)
+    ]
+    return list(zip(days, days))
+
+
+def day_delta_buckets(start: date, end: date, day_delta: int) -> List[NativeTimeRange]:
+    """
+    Buckets of day_delta days starting from start. The first bucket is one day
+    longer than the others and the last one is cut short at end, or left out
+    when the time range is a multiple of day_delta
+    """
+    first, diff = start.toordinal(), (end - start).days
+    ends = list(range(first + day_delta, first + diff, day_delta))
+    if diff % day_delta != 0:
+        ends.append(end.toordinal())
+
+    starts = [first, *(ordinal + 1 for ordinal in ends[:-1])]
+    return [
+        (date.fromordinal(bucket_start), date.fromordinal(bucket_end))
+        for bucket_start, bucket_end in zip(starts, ends)
+    ]
+
+
+def week_buckets(start: date, end: date) -> List[NativeTimeRange]:
+    first, last = start.toordinal(), end.toordinal()
+    # The ordinal of a monday is 1 modulo 7, day 1 being monday January 1st of year 1
+    next_monday = first + 7 - (first - 1) % 7
+    return split_at(first, last, range(next_monday, last + 1, 7))
+
+
+def month_buckets(start: date, end: date, months: int) -> List[NativeTimeRange]:
+    """
+    Buckets of a number of calendar months, aligned with January so that
+    quarters and half years start in the same months every year
+    """
+    starts = []
+    month_index = (start.year * 12 + start.month - 1) // months * months + months
+    bucket_start = date(month_index // 12, month_index % 12 + 1, 1)
+    while bucket_start <= end:
+        starts.append(bucket_start.toordinal())
+        month_index += months
+        bucket_start = date(month_index // 12, month_index % 12 + 1, 1)
+
+    return split_at(start.toordinal(), end.toordinal(), starts)
 
 
 def one(start_date: arrow.Arrow, end_date: arrow.Arrow) -> List[TimeRange]:
@@ -64,29 +174,12 @@ def one(start_date: arrow.Arrow, end_date: arrow.Arrow) -> List[TimeRange]:
 
 
 def one_day(start_date: arrow.Arrow, end_date: arrow.Arrow) -> List[TimeRange]:
-    diff = end_date - start_date
-    ranges: List[TimeRange] = []
-
-    for day in range(diff.days + 1):
-        ranges.append((start_date.shift(days=day), start_date.shift(days=day)))
-
-    return ranges
+    return to_time_buckets(day_buckets(start_date.date(), end_date.date()))
 
 
 def get_time_buckets_by_day_delta(
     start_date: arrow.Arrow, end_date: arrow.Arrow, day_delta: int
 ) -> List[TimeRange]:
-    diff = end_date - start_date
-    ranges: List[TimeRange] = []
-    for day in range(day_delta, diff.days, day_delta):
-        start = ranges[-1][1].shift(days=1) if len(ranges) > 0 else start_date
-        end = start_date.shift(days=day)
-
-        ranges.append((start, end))
-
-    mod = diff.days % day_delta
-    if mod != 0:
-        start = ranges[-1][1].shift(days=1) if len(ranges) > 0 else start_date
-        ranges.append((start, end_date))
-
-    return ranges
+    return to_time_buckets(
+        day_delta_buckets(start_date.date(), end_date.date(), day_delta)
+    )
@@ -18,6 +18,32 @@ class TimeBucketSizeOption(ChoiceEnum):
     ONE = "one"
 
 
+class TimeBucketAlignmentOption(ChoiceEnum):
+    # Buckets are a fixed number of days from the start of the time range
+    DRIFT = "drift"
+    # Buckets start on mondays, or on the first day of a month, quarter,
+    # half year or year
+    CALENDAR = "calendar"
+
+
+class ReportBackendOption(ChoiceEnum):
+    DATABASE = "database"
+    NUMPY = "numpy"
+
+
+class PredictionEngineOption(ChoiceEnum):
+    PYTHON = "python"
+    NUMPY = "numpy"
+
+
+class PredictionStorageOption(ChoiceEnum):
+    # Predicted transactions are created by cron
+    TRANSACTIONS = "transactions"
+    # Only the distribution of the predictor is stored by cron, reports
+    # synthesize the predicted transactions from it
+    VIRTUAL = "virtual"
+
+
 TimeRange = Tuple[arrow.Arrow, arrow.Arrow]
 NativeTimeRange = Tuple[date, date]
 ReportGenerator = Callable[[QuerySet[Transaction], TimeRange], List[int]]
@@ -11,6 +11,7 @@ router.register("income", views.IncomeReport, "income")
 router.register("transfer", views.TransferReport, "transfer")
 router.register("outcome", views.OutcomeReport, "outcome")
 router.register("balance", views.BalanceReport, "balance")
+router.register("batch", views.BatchReport, "batch")
 router.register(
     "budget_delta",
     views.BudgetDeltaReport,
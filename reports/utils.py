@@ -1,3 +1,4 @@
+import math
 import random
 from reports.types import NativeTimeRange, TimeRange
 
@@ -15,3 +16,14 @@ def roll(probability: float) -> bool:
 
     i = random.randint(0, 100) / 100
     return i <= probability
+
+
+def roll_probability(probability: float) -> float:
+    """
+    Probability that roll(probability) is True. roll draws one of 101 evenly
+    spaced values between 0 and 1, so this is slightly off from probability
+    """
+    if probability <= 0:
+        return 0.0
+
+    return (math.floor(min(probability, 1) * 100 + 1e-9) + 1) / 101
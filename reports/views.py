@@ -1,8 +1,11 @@
-from typing import Any, List
+from typing import Dict, List, Optional, Set, Type
 
 import arrow
-from django.db.models import QuerySet, Sum, Q
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Aggregate, Count, QuerySet, Sum, Q
 from django.http import QueryDict
+from django.http.response import HttpResponseBase
 from rest_framework.exceptions import ValidationError
 from rest_framework.mixins import ListModelMixin
 from rest_framework.request import Request
@@ -10,20 +13,43 @@ from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
 from api2.filters import TransactionFilterset
-from api2.models import Transaction, Budget, Tag
-from api2.queries import get_all_children
+from api2.models import DailyBalanceSnapshot, MonthlyRollup, Transaction, Budget, Tag
+from api2.queries import get_subtree_ids, get_subtree_parents
+from api2.utils.streaming import StreamingJSONResponse, is_streaming_requested
+from api2.views.ConditionalGetMixin import ConditionalGetMixin
+from reports.aggregation import (
+    add_report_data,
+    aggregate_buckets,
+    grouped_balance_series,
+    roll_up_series,
+    rollup_bucket_series,
+    bucket_series,
+    empty_series,
+    snapshot_balance_series,
+)
+from reports.cache import cache_report, get_cached_report, get_report_cache_key
+from reports.columnar import ColumnarLedger
 from reports.time_buckets import (
     get_time_buckets,
-    get_date_range,
     get_report_dates,
 )
-from reports.types import TimeBucketSizeOption, ReportGenerator, TimeRange
+from reports.types import (
+    ReportBackendOption,
+    TimeBucketAlignmentOption,
+    TimeBucketSizeOption,
+    TimeRange,
+)
+from reports.virtual_predictions import get_prediction_ledger
 
 
-class ReportViewSet(ListModelMixin, GenericViewSet):
+class ReportViewSet(ConditionalGetMixin, ListModelMixin, GenericViewSet):
     model = Transaction
     filterset_class = TransactionFilterset
-    report_generator: ReportGenerator
+    # Whether the columnar backend needs transactions before the report range
+    include_history = False
+    # Filters that do not prevent reading whole months from MonthlyRollup,
+    # the time buckets never go outside of them
+    rollup_compatible_filters = {"date__gte", "date__lte"}
 
     def get_queryset(self):
         return self.model.objects.filter(budget__user=self.request.user)
@@ -46,6 +72,16 @@ class ReportViewSet(ListModelMixin, GenericViewSet):
 
         return query_params["time_bucket_size"]
 
+    @staticmethod
+    def get_time_bucket_alignment(query_params: QueryDict) -> str:
+        alignment = query_params.get(
+            "time_bucket_alignment", settings.REPORT_TIME_BUCKET_ALIGNMENT
+        )
+        if alignment not in TimeBucketAlignmentOption.values():
+            raise ValidationError('Invalid "time_bucket_alignment" query parameter')
+
+        return alignment
+
     @staticmethod
     def get_date(query_params: QueryDict, field_name: str) -> arrow.Arrow:
         try:
@@ -55,11 +91,19 @@ class ReportViewSet(ListModelMixin, GenericViewSet):
 
         return date
 
+    @staticmethod
+    def get_backend(query_params: QueryDict) -> str:
+        backend = query_params.get("backend", settings.REPORT_BACKEND)
+        if backend not in ReportBackendOption.values():
+            raise ValidationError('Invalid "backend" query parameter')
+
+        return backend
+
     def get_budgets(self):
         budget_ids = self.request.GET.getlist("budget__includes")
         if budget_ids:
-            return Budget.objects.filter(pk__in=budget_ids)
-        return Budget.objects.filter()
+            return Budget.objects.filter(pk__in=budget_ids, user=self.request.user)
+        return Budget.objects.filter(user=self.request.user)
 
     def get_tags(self):
         tag_ids = self.request.GET.getlist("tag__includes")
@@ -68,189 +112,393 @@ class ReportViewSet(ListModelMixin, GenericViewSet):
         return Tag.objects.filter(user=self.request.user)
 
     @staticmethod
-    def generate_report_bucket(
-        transactions: QuerySet[Transaction], time_bucket: TimeRange
-    ):
+    def get_aggregate() -> Aggregate:
+        """
+        Aggregate calculated over the transactions in each time bucket
+        """
         raise NotImplementedError()
 
     @staticmethod
-    def sum_transactions(transactions: QuerySet[Transaction], query: Q) -> int:
-        return transactions.filter(query).aggregate(Sum("amount"))["amount__sum"] or 0
+    def get_rollup_aggregate() -> Optional[Aggregate]:
+        """
+        Equivalent of get_aggregate over MonthlyRollup rows, None when the
+        report can not be calculated from them
+        """
+        return None
+
+    def is_filtered(self) -> bool:
+        return any(
+            name in self.request.GET and name not in self.rollup_compatible_filters
+            for name in self.filterset_class.base_filters
+        )
+
+    def get_rollups(self) -> QuerySet[MonthlyRollup]:
+        return MonthlyRollup.objects.filter(
+            budget__user=self.request.user, tag__isnull=True
+        )
 
     def get_report_data(
         self, queryset: QuerySet[Transaction], time_buckets: List[TimeRange]
     ):
-        return [
-            self.generate_report_bucket(
-                queryset.filter(date__range=get_date_range(time_range)), time_range
-            )
-            for time_range in time_buckets
-        ]
+        rollup_aggregate = self.get_rollup_aggregate()
+        if rollup_aggregate is None or self.is_filtered():
+            return bucket_series(queryset, time_buckets, self.get_aggregate())
+
+        results = rollup_bucket_series(
+            queryset,
+            self.get_rollups(),
+            time_buckets,
+            self.get_aggregate(),
+            rollup_aggregate,
+        )
+        return results.get((), empty_series(time_buckets))
+
+    def get_columnar_report_data(self, ledger: ColumnarLedger):
+        raise NotImplementedError()
+
+    def get_prediction_report_data(self, ledger: ColumnarLedger):
+        """
+        Report of only the predictions synthesized in the ledger, which is
+        added to the report of the stored transactions
+        """
+        return self.get_columnar_report_data(ledger)
 
     def list(self, request: Request, *args, **kwargs) -> Response:
+        return self.conditional_get(self.report, request, *args, **kwargs)
+
+    def report(self, request: Request, *args, **kwargs) -> Response:
         self.validate(request.GET)
         time_bucket_size = self.get_time_bucket_size(request.GET)
-        queryset = self.filter_queryset(self.get_queryset())
+        alignment = self.get_time_bucket_alignment(request.GET)
         time_range = (
             self.get_date(request.GET, "date__gte"),
             self.get_date(request.GET, "date__lte"),
         )
-        time_buckets = get_time_buckets(time_range, time_bucket_size)
+        backend = self.get_backend(request.GET)
 
-        return Response(
-            {
-                "dates": get_report_dates(time_buckets),
-                "data": self.get_report_data(queryset, time_buckets),
-            }
+        data_version, _ = self.get_data_version_info()
+        cache_key = get_report_cache_key(
+            request.user.id, self.basename, request.GET, data_version
         )
+        report = get_cached_report(cache_key, self.basename)
+        if report is not None:
+            return self.render_report(request, report)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        time_buckets = get_time_buckets(time_range, time_bucket_size, alignment)
+
+        if backend == ReportBackendOption.NUMPY.value:
+            data = self.get_columnar_report_data(
+                ColumnarLedger(queryset, time_buckets, self.include_history)
+            )
+        else:
+            data = self.get_report_data(queryset, time_buckets)
+
+        # Predictions can not be filtered like transactions in the database
+        if not self.is_filtered():
+            predictions = get_prediction_ledger(request.user, time_buckets)
+            if predictions is not None:
+                data = add_report_data(
+                    data, self.get_prediction_report_data(predictions)
+                )
+
+        report = {"dates": get_report_dates(time_buckets), "data": data}
+        cache_report(cache_key, report)
+        return self.render_report(request, report)
+
+    @staticmethod
+    def render_report(request: Request, report: dict) -> HttpResponseBase:
+        if is_streaming_requested(request.GET):
+            # Each series is encoded and sent separately
+            return StreamingJSONResponse(report)
+        return Response(report)
 
 
 class MultiValuedReport(ReportViewSet):
-    @classmethod
-    def generate_report_bucket(cls, transactions, time_bucket) -> Any:
-        return cls.sum_transactions(transactions, Q())
+    @staticmethod
+    def get_aggregate() -> Aggregate:
+        return Sum("amount")
+
+    @staticmethod
+    def get_rollup_aggregate() -> Optional[Aggregate]:
+        return Sum("amount")
 
     def filter_queryset(self, queryset) -> QuerySet[Transaction]:
         return queryset
 
+    def is_filtered(self) -> bool:
+        return False
+
+    def get_columnar_report_data(self, ledger: ColumnarLedger):
+        return ledger.sum_series()
+
 
 class TransactionCountReport(ReportViewSet):
     @staticmethod
-    def generate_report_bucket(transactions: QuerySet[Transaction], time_bucket) -> Any:
-        return transactions.count()
+    def get_aggregate() -> Aggregate:
+        return Count("id")
+
+    @staticmethod
+    def get_rollup_aggregate() -> Optional[Aggregate]:
+        return Sum("count")
+
+    def get_columnar_report_data(self, ledger: ColumnarLedger):
+        return ledger.count_series()
 
 
 class IncomeReport(ReportViewSet):
-    @classmethod
-    def generate_report_bucket(cls, transactions, time_bucket) -> Any:
-        return cls.sum_transactions(transactions, Q(income=True))
+    @staticmethod
+    def get_aggregate() -> Aggregate:
+        return Sum("amount", filter=Q(income=True))
+
+    @staticmethod
+    def get_rollup_aggregate() -> Optional[Aggregate]:
+        return Sum("amount", filter=Q(income=True))
+
+    def get_columnar_report_data(self, ledger: ColumnarLedger):
+        return ledger.sum_series(ledger.income)
 
 
 class BalanceReport(ReportViewSet):
+    include_history = True
+
     def filter_queryset(self, queryset) -> QuerySet[Transaction]:
         return queryset
 
-    @classmethod
-    def generate_report_bucket(cls, _, time_bucket) -> Any:
-        return cls.sum_transactions(
-            Transaction.objects.all(), Q(date__lte=time_bucket[1].datetime)
-        )
+    def is_filtered(self) -> bool:
+        return False
+
+    @staticmethod
+    def get_balance_series(user: User, time_buckets: List[TimeRange]):
+        snapshots = DailyBalanceSnapshot.objects.filter(budget__user=user)
+        balances = snapshot_balance_series(snapshots, time_buckets)
+        return balances.get((), empty_series(time_buckets))
+
+    def get_report_data(
+        self, queryset: QuerySet[Transaction], time_buckets: List[TimeRange]
+    ):
+        return self.get_balance_series(self.request.user, time_buckets)
+
+    def get_columnar_report_data(self, ledger: ColumnarLedger):
+        return ledger.balance_series()
 
 
 class TransferReport(ReportViewSet):
-    @classmethod
-    def generate_report_bucket(cls, transactions, time_bucket) -> Any:
-        return cls.sum_transactions(transactions, Q(transfer=True))
+    @staticmethod
+    def get_aggregate() -> Aggregate:
+        return Sum("amount", filter=Q(transfer=True))
+
+    @staticmethod
+    def get_rollup_aggregate() -> Optional[Aggregate]:
+        return Sum("amount", filter=Q(transfer=True))
+
+    def get_columnar_report_data(self, ledger: ColumnarLedger):
+        return ledger.sum_series(ledger.transfer)
 
 
 class OutcomeReport(ReportViewSet):
-    @classmethod
-    def generate_report_bucket(cls, transactions, time_bucket) -> Any:
-        return cls.sum_transactions(transactions, Q(transfer=False, income=False))
+    @staticmethod
+    def get_aggregate() -> Aggregate:
+        return Sum("amount", filter=Q(transfer=False, income=False))
+
+    @staticmethod
+    def get_rollup_aggregate() -> Optional[Aggregate]:
+        return Sum("amount", filter=Q(transfer=False, income=False))
+
+    def get_columnar_report_data(self, ledger: ColumnarLedger):
+        return ledger.sum_series(~ledger.transfer & ~ledger.income)
+
+
+class BatchReport(ReportViewSet):
+    """
+    Several single series reports sharing the same query parameters, with
+    every aggregate calculated in one query
+    """
+
+    reports: Dict[str, Type[ReportViewSet]] = {
+        "transaction_counts": TransactionCountReport,
+        "income": IncomeReport,
+        "transfer": TransferReport,
+        "outcome": OutcomeReport,
+        "balance": BalanceReport,
+    }
+
+    def get_report_names(self) -> List[str]:
+        names = self.request.GET.getlist("reports")
+        if not names:
+            raise ValidationError('Missing "reports" query parameter')
+
+        for name in names:
+            if name not in self.reports:
+                raise ValidationError(f'Invalid report "{name}" in "reports"')
+
+        return list(dict.fromkeys(names))
+
+    def get_report_data(
+        self, queryset: QuerySet[Transaction], time_buckets: List[TimeRange]
+    ):
+        names = self.get_report_names()
+        # Aggregates cannot be named after fields of the model
+        aggregates = {
+            f"{name}_series": self.reports[name].get_aggregate()
+            for name in names
+            if name != "balance"
+        }
+        results = aggregate_buckets(queryset, time_buckets, aggregates).get((), {})
+
+        return {
+            name: self.get_balance(time_buckets)
+            if name == "balance"
+            else results.get(f"{name}_series", empty_series(time_buckets))
+            for name in names
+        }
+
+    def get_columnar_report_data(self, ledger: ColumnarLedger):
+        return {
+            name: self.get_balance(ledger.time_buckets)
+            if name == "balance"
+            else self.reports[name]().get_columnar_report_data(ledger)
+            for name in self.get_report_names()
+        }
+
+    def get_prediction_report_data(self, ledger: ColumnarLedger):
+        # The ledger holds every prediction, so balances need no history
+        return {
+            name: ledger.balance_series()
+            if name == "balance"
+            else self.reports[name]().get_columnar_report_data(ledger)
+            for name in self.get_report_names()
+        }
+
+    def get_balance(self, time_buckets: List[TimeRange]):
+        # Balance reports are never filtered, see BalanceReport
+        return BalanceReport.get_balance_series(self.request.user, time_buckets)
 
 
 class BudgetReport(ReportViewSet):
-    @classmethod
-    def generate_report_bucket(cls, transactions, *args) -> Any:
-        return cls.sum_transactions(transactions, Q())
+    # Only transactions matching this are included in the report
+    transaction_filter = Q()
+
+    @staticmethod
+    def get_aggregate() -> Aggregate:
+        return Sum("amount")
+
+    @staticmethod
+    def get_columnar_filter(ledger: ColumnarLedger):
+        """
+        Same as transaction_filter for the columnar backend
+        """
+        return None
+
+    @staticmethod
+    def get_rollup_aggregate() -> Optional[Aggregate]:
+        return Sum("amount")
 
     def filter_queryset(self, queryset) -> QuerySet[Transaction]:
         return queryset
 
-    def get_bucket_data(
-        self,
-        budget: Budget,
-        children: List[Budget],
-        queryset: QuerySet[Transaction],
-        time_range: TimeRange,
-    ):
-        raise NotImplementedError()
+    def is_filtered(self) -> bool:
+        return False
 
-    def get_buckets_for_budget(
-        self,
-        budget: Budget,
-        queryset: QuerySet[Transaction],
-        time_buckets: List[TimeRange],
-    ):
-        children = get_all_children(budget)
-        return [
-            self.get_bucket_data(budget, children, queryset, time_range)
-            for time_range in time_buckets
-        ]
+    @staticmethod
+    def get_subtrees(budgets: QuerySet[Budget]) -> Dict[int, Set[int]]:
+        subtrees = get_subtree_ids(budget.id for budget in budgets)
+        return {budget.id: subtrees[budget.id] or {budget.id} for budget in budgets}
 
     def get_report_data(
         self, queryset: QuerySet[Transaction], time_buckets: List[TimeRange]
     ):
         budgets = self.get_budgets()
+        parents = get_subtree_parents(budgets)
+        queryset = queryset.filter(self.transaction_filter, budget__in=list(parents))
+
+        rollup_aggregate = self.get_rollup_aggregate()
+        if rollup_aggregate is None:
+            results = aggregate_buckets(
+                queryset,
+                time_buckets,
+                {"value": self.get_aggregate()},
+                group_by=("budget",),
+            )
+            series = {key[0]: result["value"] for key, result in results.items()}
+        else:
+            results = rollup_bucket_series(
+                queryset,
+                self.get_rollups().filter(budget__in=list(parents)),
+                time_buckets,
+                self.get_aggregate(),
+                rollup_aggregate,
+                group_by=("budget",),
+            )
+            series = {key[0]: result for key, result in results.items()}
+
+        totals = roll_up_series(series, parents, time_buckets)
         return {
-            budget.id: self.get_buckets_for_budget(budget, queryset, time_buckets)
+            budget.id: totals.get(budget.id, empty_series(time_buckets))
             for budget in budgets
         }
 
+    def get_columnar_report_data(self, ledger: ColumnarLedger):
+        return ledger.budget_series(
+            self.get_subtrees(self.get_budgets()), self.get_columnar_filter(ledger)
+        )
+
 
 class BudgetDeltaReport(BudgetReport):
-    def get_bucket_data(
-        self,
-        budget: Budget,
-        children: List[Budget],
-        queryset: QuerySet[Transaction],
-        time_range: TimeRange,
-    ):
-        return self.generate_report_bucket(
-            queryset.filter(
-                budget__in=[budget, *children],
-                date__range=get_date_range(time_range),
-            )
-        )
+    pass
 
 
 class BudgetBalanceReport(BudgetReport):
-    def get_bucket_data(
-        self,
-        budget: Budget,
-        children: List[Budget],
-        queryset: QuerySet[Transaction],
-        time_range: TimeRange,
+    include_history = True
+
+    def get_report_data(
+        self, queryset: QuerySet[Transaction], time_buckets: List[TimeRange]
     ):
-        return self.generate_report_bucket(
-            queryset.filter(
-                budget__in=[budget, *children], date__lte=time_range[1].datetime
-            ),
+        budgets = self.get_budgets()
+        parents = get_subtree_parents(budgets)
+        balances = snapshot_balance_series(
+            DailyBalanceSnapshot.objects.filter(budget__in=list(parents)),
+            time_buckets,
+            group_by=("budget",),
+        )
+        totals = roll_up_series(
+            {key[0]: series for key, series in balances.items()},
+            parents,
+            time_buckets,
         )
+        return {
+            budget.id: totals.get(budget.id, empty_series(time_buckets))
+            for budget in budgets
+        }
+
+    def get_columnar_report_data(self, ledger: ColumnarLedger):
+        return ledger.budget_series(self.get_subtrees(self.get_budgets()), balance=True)
 
 
 class BudgetIncomeReport(BudgetReport):
-    def get_bucket_data(
-        self,
-        budget: Budget,
-        children: List[Budget],
-        queryset: QuerySet[Transaction],
-        time_range: TimeRange,
-    ):
-        return self.generate_report_bucket(
-            queryset.filter(
-                budget__in=[budget, *children],
-                date__range=get_date_range(time_range),
-                amount__gt=0,
-            ),
-        )
+    transaction_filter = Q(amount__gt=0)
+
+    @staticmethod
+    def get_rollup_aggregate() -> Optional[Aggregate]:
+        # Rollups are not split by the sign of the amount
+        return None
+
+    @staticmethod
+    def get_columnar_filter(ledger: ColumnarLedger):
+        return ledger.amount > 0
 
 
 class BudgetOutcomeReport(BudgetReport):
-    def get_bucket_data(
-        self,
-        budget: Budget,
-        children: List[Budget],
-        queryset: QuerySet[Transaction],
-        time_range: TimeRange,
-    ):
-        return self.generate_report_bucket(
-            queryset.filter(
-                budget__in=[budget, *children],
-                date__range=get_date_range(time_range),
-                amount__lt=0,
-            ),
-        )
+    transaction_filter = Q(amount__lt=0)
+
+    @staticmethod
+    def get_rollup_aggregate() -> Optional[Aggregate]:
+        # Rollups are not split by the sign of the amount
+        return None
+
+    @staticmethod
+    def get_columnar_filter(ledger: ColumnarLedger):
+        return ledger.amount < 0
 
 
 class TagDeltaReport(MultiValuedReport):
@@ -258,30 +506,40 @@ class TagDeltaReport(MultiValuedReport):
         self, queryset: QuerySet[Transaction], time_buckets: List[TimeRange]
     ):
         tags = self.get_tags()
+        results = rollup_bucket_series(
+            queryset.filter(tags__in=tags),
+            MonthlyRollup.objects.filter(budget__user=self.request.user, tag__in=tags),
+            time_buckets,
+            self.get_aggregate(),
+            self.get_rollup_aggregate(),
+            group_by=("tags",),
+            rollup_group_by=("tag",),
+        )
         return {
-            tag.id: [
-                self.generate_report_bucket(
-                    queryset.filter(tags=tag, date__range=get_date_range(time_range)),
-                    time_range,
-                )
-                for time_range in time_buckets
-            ]
-            for tag in tags
+            tag.id: results.get((tag.id,), empty_series(time_buckets)) for tag in tags
         }
 
+    def get_columnar_report_data(self, ledger: ColumnarLedger):
+        tag_ids = [tag.id for tag in self.get_tags()]
+        series = ledger.tag_series(tag_ids)
+        return {tag_id: series[tag_id] for tag_id in tag_ids}
+
 
 class TagBalanceReport(MultiValuedReport):
+    include_history = True
+
     def get_report_data(
         self, queryset: QuerySet[Transaction], time_buckets: List[TimeRange]
     ):
         tags = self.get_tags()
+        balances = grouped_balance_series(
+            queryset.filter(tags__in=tags), time_buckets, group_by=("tags",)
+        )
         return {
-            tag.id: [
-                self.generate_report_bucket(
-                    queryset.filter(tags=tag, date__lte=time_range[1].datetime),
-                    time_range,
-                )
-                for time_range in time_buckets
-            ]
-            for tag in tags
+            tag.id: balances.get((tag.id,), empty_series(time_buckets)) for tag in tags
         }
+
+    def get_columnar_report_data(self, ledger: ColumnarLedger):
+        tag_ids = [tag.id for tag in self.get_tags()]
+        series = ledger.tag_series(tag_ids, balance=True)
+        return {tag_id: series[tag_id] for tag_id in tag_ids}
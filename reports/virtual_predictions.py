@@ -0,0 +1,176 @@
+import random
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from api2.models import PredictionDistribution
+from reports.columnar import ColumnarLedger, LedgerRow
+from reports.predictor import Predictor
+from reports.sampling import sample_predictions
+from reports.types import PredictionStorageOption, TimeRange
+
+# Predictions are sampled in blocks of days from the start of the schedule,
+# each with its own generator, so a day is always synthesized the same way no
+# matter which range a report asks for
+SAMPLE_BLOCK_DAYS = 28
+
+
+def is_virtual_storage() -> bool:
+    return settings.PREDICTION_STORAGE == PredictionStorageOption.VIRTUAL.value
+
+
+def save_prediction_distribution(
+    predictor: Predictor, seed: Optional[int] = None
+) -> PredictionDistribution:
+    """
+    Stores the distribution of the predictor instead of the transactions it
+    would create. Predictions are synthesized from the start until the end of
+    its prediction range
+    """
+    distribution = {
+        "transactions_per_day": predictor.transactions_in_analysis_period
+        / predictor.days_in_analysis_period,
+        "budgets": [
+            {
+                "budget": budget.id,
+                "prob": budget_prob["prob"],
+                "tags": [
+                    {"tag": tag.id, **tag_prob}
+                    for tag, tag_prob in budget_prob["tags"].items()
+                ],
+            }
+            for budget, budget_prob in predictor.transaction_probability_distrobution.items()
+        ],
+    }
+    income_schedule = [
+        {
+            "frequency_days": frequency_days,
+            "budget": transaction.budget_id,
+            "amount": transaction.amount,
+            "income": transaction.income,
+            "transfer": transaction.transfer,
+            "tags": [tag.id for tag in tags],
+        }
+        for frequency_days, (transaction, tags) in predictor.get_income_schedule()
+    ]
+
+    prediction_distribution, _ = PredictionDistribution.objects.update_or_create(
+        user=predictor.user,
+        defaults={
+            "distribution": distribution,
+            "income_schedule": income_schedule,
+            "seed": random.randrange(2**31) if seed is None else seed,
+            "schedule_start": predictor.income_schedule_start.date(),
+            "start": predictor.prediction_start.date(),
+            "end": predictor.prediction_start.date()
+            + timedelta(days=predictor.days_in_prediction_period),
+        },
+    )
+    return prediction_distribution
+
+
+def synthesize_predictions(
+    prediction_distribution: PredictionDistribution, end: Optional[date] = None
+) -> Tuple[List[LedgerRow], List[Tuple[int, int]]]:
+    """
+    Predicted transactions from the start of the distribution until end, or
+    the end of the distribution, as ledger rows and (row index, tag id) pairs.
+    Rows have negative ids in ascending order, so they never match a
+    transaction
+    """
+    start = prediction_distribution.start
+    end = (
+        prediction_distribution.end
+        if end is None
+        else min(end, prediction_distribution.end)
+    )
+    schedule_start = prediction_distribution.schedule_start
+    # Rows without their id
+    predictions: List[Tuple[date, int, int, bool, bool]] = []
+    tags: List[Tuple[int, int]] = []
+
+    def add(
+        day: date,
+        budget_id: int,
+        amount: int,
+        income: bool,
+        transfer: bool,
+        tag_ids: List[int],
+    ):
+        if start <= day < end:
+            tags.extend((len(predictions), tag_id) for tag_id in tag_ids)
+            predictions.append((day, amount, budget_id, income, transfer))
+
+    # Keyed by ids instead of budgets and tags
+    distribution = {
+        budget["budget"]: {
+            "prob": budget["prob"],
+            "tags": {tag["tag"]: tag for tag in budget["tags"]},
+        }
+        for budget in prediction_distribution.distribution["budgets"]
+    }
+    first_block = max((start - schedule_start).days, 0) // SAMPLE_BLOCK_DAYS
+    last_block = ((end - schedule_start).days - 1) // SAMPLE_BLOCK_DAYS
+    for block in range(first_block, last_block + 1):
+        block_start = schedule_start + timedelta(days=block * SAMPLE_BLOCK_DAYS)
+        samples = sample_predictions(
+            distribution,  # type: ignore
+            prediction_distribution.distribution["transactions_per_day"],
+            SAMPLE_BLOCK_DAYS,
+            np.random.default_rng([prediction_distribution.seed, block]),
+        )
+        for day_delta, budget_id, tag_id in samples:
+            add(
+                block_start + timedelta(days=day_delta),
+                budget_id,
+                distribution[budget_id]["tags"][tag_id]["average_amount"],
+                False,
+                False,
+                [tag_id],
+            )
+
+    for entry in prediction_distribution.income_schedule:
+        first_day_delta = max((start - schedule_start).days, 0)
+        first_day_delta += -first_day_delta % entry["frequency_days"]
+        for day_delta in range(
+            first_day_delta, (end - schedule_start).days, entry["frequency_days"]
+        ):
+            add(
+                schedule_start + timedelta(days=day_delta),
+                entry["budget"],
+                entry["amount"],
+                entry["income"],
+                entry["transfer"],
+                entry["tags"],
+            )
+
+    rows: List[LedgerRow] = [
+        (index - len(predictions), day, amount, budget_id, income, transfer, True)
+        for index, (day, amount, budget_id, income, transfer) in enumerate(predictions)
+    ]
+    return rows, tags
+
+
+def get_prediction_ledger(
+    user: User, time_buckets: List[TimeRange]
+) -> Optional[ColumnarLedger]:
+    """
+    Ledger of the predictions synthesized for the report, None when there
+    are none
+    """
+    if not time_buckets or not is_virtual_storage():
+        return None
+
+    prediction_distribution = PredictionDistribution.objects.filter(user=user).first()
+    if prediction_distribution is None:
+        return None
+
+    rows, tags = synthesize_predictions(
+        prediction_distribution, time_buckets[-1][1].date() + timedelta(days=1)
+    )
+    if not rows:
+        return None
+    return ColumnarLedger.from_rows(rows, tags, time_buckets)